@@ -0,0 +1,34 @@
+"""Add interaction indexes
+
+Revision ID: b7e2c4f91d06
+Revises: 3165d5c2a401
+Create Date: 2026-10-19 10:12:43.518204
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2c4f91d06'
+down_revision = '3165d5c2a401'
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    'ix_interactions_session_id_timestamp': ['session_id', 'timestamp', 'id'],
+    'ix_interactions_user_id_timestamp': ['user_id', 'timestamp'],
+}
+
+
+def upgrade() -> None:
+    # Build the indexes without blocking writes to the table on Postgres. CONCURRENTLY
+    # can't run in a transaction.
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES.items():
+            op.create_index(name, 'interactions', columns, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.drop_index(name, table_name='interactions', postgresql_concurrently=True)
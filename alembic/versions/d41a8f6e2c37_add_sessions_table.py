@@ -0,0 +1,52 @@
+"""Add sessions table
+
+Revision ID: d41a8f6e2c37
+Revises: b7e2c4f91d06
+Create Date: 2026-10-19 14:37:05.204917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41a8f6e2c37'
+down_revision = 'b7e2c4f91d06'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'sessions',
+        sa.Column('session_id', sa.String(50), primary_key=True),
+        sa.Column('user_id', sa.String(50), nullable=True),
+        sa.Column('character_id', sa.String(100), nullable=True),
+        sa.Column('last_message_preview', sa.Unicode(255), nullable=True),
+        sa.Column('last_timestamp', sa.DateTime(), nullable=False),
+        sa.Column('turn_count', sa.Integer(), nullable=False),
+    )
+    op.create_index('ix_sessions_user_id_last_timestamp', 'sessions',
+                    ['user_id', 'last_timestamp', 'session_id'])
+    # Backfill from the interactions written so far, the server keeps it up to date from
+    # then on.
+    op.execute("""
+        INSERT INTO sessions (session_id, user_id, character_id, last_message_preview,
+                              last_timestamp, turn_count)
+        SELECT session_id, user_id, character_id, substr(client_message_unicode, 1, 255),
+               timestamp, turn_count
+        FROM (
+            SELECT session_id, user_id, character_id, client_message_unicode, timestamp,
+                   row_number() OVER (PARTITION BY session_id
+                                      ORDER BY timestamp DESC, id DESC) AS rn,
+                   count(*) OVER (PARTITION BY session_id) AS turn_count
+            FROM interactions
+            WHERE session_id IS NOT NULL AND timestamp IS NOT NULL
+        ) AS latest
+        WHERE rn = 1
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sessions_user_id_last_timestamp', table_name='sessions')
+    op.drop_table('sessions')
@@ -71,6 +71,14 @@ def run_uvicorn(args):
                     "--timeout-keep-alive", "60"] + list(args))
 
 
+@click.command(context_settings={"ignore_unknown_options": True})
+@click.argument('args', nargs=-1, type=click.UNPROCESSED)
+def run_prefork(args):
+    """Load models and catalog once, then fork workers sharing them copy-on-write."""
+    click.secho("Running preload-and-fork server...", fg='green')
+    subprocess.run([sys.executable, "-m", "realtime_ai_character.prefork"] + list(args))
+
+
 @click.command()
 def web_build():
     # Build the web app to be served by FastAPI
@@ -119,6 +127,7 @@ cli.add_command(docker_build)
 cli.add_command(docker_run)
 cli.add_command(docker_delete)
 cli.add_command(run_uvicorn)
+cli.add_command(run_prefork)
 cli.add_command(web_build)
 cli.add_command(docker_next_web_build)
 
@@ -0,0 +1,157 @@
+"""Admission control of new websocket sessions.
+
+A worker admits a new session only while it has room for it: fewer active sessions than
+ADMISSION_MAX_SESSIONS, fewer transcriptions pending than ADMISSION_MAX_STT_QUEUE and an
+event loop lagging less than ADMISSION_MAX_LOOP_LAG_MS. Otherwise the connection is closed
+with 1013 (try again later), or, with ADMISSION_QUEUE_SIZE set, waits in a short queue and
+is sent its position, `[queue=<position>]`, on every check until there is room. Sessions
+already admitted keep their latency instead of every session slowing down.
+"""
+import asyncio
+import os
+import threading
+import types
+from contextlib import contextmanager
+from time import monotonic
+from typing import Optional
+
+from starlette.websockets import WebSocket, WebSocketState
+
+from realtime_ai_character.logger import get_logger
+from realtime_ai_character.utils import Singleton
+
+logger = get_logger(__name__)
+
+config = types.SimpleNamespace(**{
+    # 0 disables a threshold.
+    'max_sessions': int(os.getenv('ADMISSION_MAX_SESSIONS', 200)),
+    'max_stt_queue': int(os.getenv('ADMISSION_MAX_STT_QUEUE', 16)),
+    'max_loop_lag': float(os.getenv('ADMISSION_MAX_LOOP_LAG_MS', 250)) / 1000,
+    # Connections allowed to wait for room, 0 refuses them right away.
+    'queue_size': int(os.getenv('ADMISSION_QUEUE_SIZE', 0)),
+    'queue_timeout': float(os.getenv('ADMISSION_QUEUE_TIMEOUT', 15)),
+})
+
+# Interval of the event loop lag probe, and how fast a lag spike is forgotten.
+LAG_PROBE_INTERVAL = 0.1
+LAG_DECAY = 0.8
+# Interval of the admission checks of queued connections.
+QUEUE_POLL_INTERVAL = 0.5
+
+
+class AdmissionController(Singleton):
+    def __init__(self):
+        self.active_sessions = 0
+        self.stt_pending = 0
+        self.loop_lag = 0.0
+        self.queue: list = []
+        self.lag_task: Optional[asyncio.Task] = None
+        self.lock = threading.Lock()
+        # Metrics
+        self.admitted = 0
+        self.refused = 0
+        self.queued = 0
+        self.queue_timeouts = 0
+
+    def start(self):
+        """Start probing the event loop lag, on the loop to probe."""
+        if self.lag_task is None:
+            self.lag_task = asyncio.create_task(self._probe_loop_lag())
+
+    def stop(self):
+        if self.lag_task:
+            self.lag_task.cancel()
+            self.lag_task = None
+
+    async def _probe_loop_lag(self):
+        while True:
+            start = monotonic()
+            await asyncio.sleep(LAG_PROBE_INTERVAL)
+            lag = monotonic() - start - LAG_PROBE_INTERVAL
+            self.loop_lag = max(lag, self.loop_lag * LAG_DECAY)
+
+    @contextmanager
+    def transcribing(self):
+        """Count a transcription as pending, from the time it is requested until done."""
+        with self.lock:
+            self.stt_pending += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.stt_pending -= 1
+
+    def overloaded(self) -> Optional[str]:
+        """The reason not to admit another session, if any."""
+        if config.max_sessions and self.active_sessions >= config.max_sessions:
+            return f'{self.active_sessions} active sessions'
+        if config.max_stt_queue and self.stt_pending >= config.max_stt_queue:
+            return f'{self.stt_pending} transcriptions pending'
+        if config.max_loop_lag and self.loop_lag >= config.max_loop_lag:
+            return f'event loop lagging {self.loop_lag * 1000:.0f}ms'
+        return None
+
+    def try_admit(self) -> Optional[str]:
+        """Admit a session if there is room and nobody is queued before it.
+
+        Returns None when admitted, the reason otherwise.
+        """
+        reason = 'sessions queued' if self.queue else self.overloaded()
+        if reason is None:
+            self.active_sessions += 1
+            self.admitted += 1
+        return reason
+
+    def can_queue(self) -> bool:
+        return len(self.queue) < config.queue_size
+
+    async def wait_in_queue(self, websocket: WebSocket) -> bool:
+        """Wait on an accepted websocket until the session is admitted.
+
+        Returns False if it timed out or the client went away.
+        """
+        ticket = object()
+        self.queue.append(ticket)
+        self.queued += 1
+        deadline = monotonic() + config.queue_timeout
+        try:
+            while monotonic() < deadline:
+                if self.queue[0] is ticket and self.overloaded() is None:
+                    self.active_sessions += 1
+                    self.admitted += 1
+                    return True
+                if websocket.application_state != WebSocketState.CONNECTED:
+                    return False
+                # Also a heartbeat: sending is what notices a client that went away.
+                await websocket.send_text(f'[queue={self.queue.index(ticket) + 1}]')
+                await asyncio.sleep(QUEUE_POLL_INTERVAL)
+            self.queue_timeouts += 1
+            return False
+        except Exception as e:
+            logger.info(f'Queued connection went away: {e!r}')
+            return False
+        finally:
+            self.queue.remove(ticket)
+
+    def refuse(self, reason: str):
+        self.refused += 1
+        logger.warning(f'Refusing a new session: {reason}')
+
+    def leave(self):
+        self.active_sessions -= 1
+
+    def report(self) -> dict:
+        return {
+            'active_sessions': self.active_sessions,
+            'stt_pending': self.stt_pending,
+            'loop_lag_ms': round(self.loop_lag * 1000, 1),
+            'queue_length': len(self.queue),
+            'admitted': self.admitted,
+            'refused': self.refused,
+            'queued': self.queued,
+            'queue_timeouts': self.queue_timeouts,
+        }
+
+
+def get_admission_controller() -> AdmissionController:
+    return AdmissionController.get_instance()
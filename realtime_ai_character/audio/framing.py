@@ -0,0 +1,110 @@
+"""Versioned binary framing of outbound audio.
+
+Clients opt in with the `audio_framing` query parameter of the websocket, the highest
+version they understand. The server answers with `[audio_framing=<version>]` before the
+greeting, and from then on every binary message is a frame:
+
+    version   u8   framing version, 1
+    flags     u8   bit 0: end of utterance, the last frame of the message
+    codec     u8   see CODECS
+    reserved  u8
+    sequence  u32  position of the frame in its message, from 0
+    message   8s   id of the reply the audio belongs to, as in [end=<id>]
+
+followed by the audio payload, all big-endian. The end of utterance frame has no payload.
+When the user interrupts a reply, clients drop the frames of its message id right away
+instead of draining buffered audio. Clients that don't ask keep getting untagged audio.
+"""
+import struct
+import uuid
+from typing import NamedTuple
+
+AUDIO_FRAMING_VERSIONS = (1,)
+
+HEADER = struct.Struct('!BBBxI8s')
+FLAG_END_OF_UTTERANCE = 0x01
+
+CODECS = {
+    'audio/mpeg': 1,
+    'audio/wav': 2,
+    'audio/pcm': 3,
+    'audio/ogg': 4,
+}
+
+
+class AudioFrame(NamedTuple):
+    version: int
+    end_of_utterance: bool
+    codec: int
+    sequence: int
+    message_id: str
+    payload: bytes
+
+
+def negotiate_audio_framing(requested: int) -> int:
+    """The framing version to use with a client asking for `requested`, 0 for none."""
+    return max((version for version in AUDIO_FRAMING_VERSIONS if version <= requested),
+               default=0)
+
+
+def new_message_id() -> str:
+    return str(uuid.uuid4().hex)[:16]
+
+
+def pack_frame(message_id: str, sequence: int, codec: str, payload: bytes = b'',
+               end_of_utterance: bool = False, version: int = 1) -> bytes:
+    flags = FLAG_END_OF_UTTERANCE if end_of_utterance else 0
+    return HEADER.pack(version, flags, CODECS.get(codec, 0), sequence,
+                       bytes.fromhex(message_id)) + payload
+
+
+def unpack_frame(data: bytes) -> AudioFrame:
+    version, flags, codec, sequence, message_id = HEADER.unpack_from(data)
+    return AudioFrame(version, bool(flags & FLAG_END_OF_UTTERANCE), codec, sequence,
+                      message_id.hex(), data[HEADER.size:])
+
+
+class FramedAudioOutput:
+    """Stands in for the websocket of one message's audio.
+
+    Audio is framed with the message id when the client negotiated a framing version, and
+    passed through untagged otherwise. Once cancelled, audio that was not sent yet is
+    dropped, whatever the version.
+    """
+
+    def __init__(self, websocket, message_id: str, codec: str = 'audio/mpeg',
+                 version: int = 0):
+        self.websocket = websocket
+        self.message_id = message_id
+        self.codec = codec
+        self.version = version
+        self.sequence = 0
+        self.cancelled = False
+        self.dropped = 0
+
+    @property
+    def application_state(self):
+        return self.websocket.application_state
+
+    async def send_text(self, data: str):
+        await self.websocket.send_text(data)
+
+    async def send_bytes(self, data: bytes):
+        if self.cancelled:
+            self.dropped += 1
+            return
+        if self.version:
+            data = pack_frame(self.message_id, self.sequence, self.codec, data,
+                              version=self.version)
+        self.sequence += 1
+        await self.websocket.send_bytes(data)
+
+    async def end(self):
+        """Mark the end of the message's audio."""
+        if self.version and not self.cancelled:
+            await self.websocket.send_bytes(pack_frame(
+                self.message_id, self.sequence, self.codec, end_of_utterance=True,
+                version=self.version))
+
+    def cancel(self):
+        self.cancelled = True
@@ -1,8 +1,16 @@
+import asyncio
 from abc import ABC, abstractmethod
+from typing import Optional
+
+from realtime_ai_character.admission import get_admission_controller
+from realtime_ai_character.provider_limiter import provider_slot
 from realtime_ai_character.utils import timed
 
 
 class SpeechToText(ABC):
+    # Name of the limiter transcriptions go through, None for local models.
+    provider: Optional[str] = None
+
     @abstractmethod
     @timed
     def transcribe(
@@ -10,3 +18,13 @@ class SpeechToText(ABC):
     ) -> str:
         # platform: 'web' | 'mobile' | 'terminal'
         pass
+
+    async def atranscribe(self, *args, **kwargs) -> str:
+        """transcribe() in a worker thread, within the limits of the provider."""
+        with get_admission_controller().transcribing():
+            async with provider_slot(self.provider):
+                return await asyncio.to_thread(self.transcribe, *args, **kwargs)
+
+    def warm_up(self):
+        """Run one throwaway inference, so the first user doesn't pay for lazy init."""
+        pass
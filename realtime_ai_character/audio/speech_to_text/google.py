@@ -26,6 +26,8 @@ config = types.SimpleNamespace(**{
 
 
 class Google(Singleton, SpeechToText):
+    provider = 'google_stt'
+
     def __init__(self):
         super().__init__()
         logger.info("Setting up [Google Speech to Text]...")
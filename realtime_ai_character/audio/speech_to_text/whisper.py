@@ -3,10 +3,10 @@ import os
 import types
 import wave
 
+import numpy as np
 import speech_recognition as sr
 from faster_whisper import WhisperModel
 from pydub import AudioSegment
-from torch.cuda import is_available as is_cuda_available
 
 from realtime_ai_character.audio.speech_to_text.base import SpeechToText
 from realtime_ai_character.logger import get_logger
@@ -39,6 +39,12 @@ WHISPER_LANGUAGE_CODE_MAPPING = {
 }
 
 
+def is_cuda_available() -> bool:
+    # Ask CTranslate2, which faster-whisper runs on, instead of importing torch.
+    import ctranslate2
+    return ctranslate2.get_cuda_device_count() > 0
+
+
 class Whisper(Singleton, SpeechToText):
     def __init__(self, use="local"):
         super().__init__()
@@ -52,12 +58,22 @@ class Whisper(Singleton, SpeechToText):
             )
         self.recognizer = sr.Recognizer()
         self.use = use
+        if use == "api":
+            self.provider = 'openai_whisper'
         if DEBUG:
             self.wf = wave.open("output.wav", "wb")
             self.wf.setnchannels(1)  # Assuming mono audio
             self.wf.setsampwidth(2)  # Assuming 16-bit audio
             self.wf.setframerate(44100)  # Assuming 44100Hz sample rate
 
+    def warm_up(self):
+        if self.use != "local":
+            return
+        # One second of silence at 16kHz. Skip VAD so that the model actually runs.
+        segs, _ = self.model.transcribe(np.zeros(16000, dtype=np.float32),
+                                        language=config.language, vad_filter=False)
+        list(segs)
+
     @timed
     def transcribe(self, audio_bytes, platform, prompt="", language="en-US", suppress_tokens=[-1]):
         logger.info("Transcribing audio...")
@@ -3,6 +3,9 @@ from realtime_ai_character.utils import timed
 
 
 class TextToSpeech(ABC):
+    # Format of the audio sent by stream().
+    codec = 'audio/mpeg'
+
     @abstractmethod
     @timed
     async def stream(self, *args, **kwargs):
@@ -3,6 +3,7 @@ import edge_tts
 from edge_tts import VoicesManager
 
 from realtime_ai_character.logger import get_logger
+from realtime_ai_character.provider_limiter import get_provider_limiter
 from realtime_ai_character.utils import Singleton, timed
 from realtime_ai_character.audio.text_to_speech.base import TextToSpeech
 
@@ -10,6 +11,8 @@ logger = get_logger(__name__)
 DEBUG = False
 
 class EdgeTTS(Singleton, TextToSpeech):
+    provider = 'edge_tts'
+
     def __init__(self):
         super().__init__()
         logger.info("Initializing [EdgeTTS] voices...")
@@ -23,11 +26,12 @@ class EdgeTTS(Singleton, TextToSpeech):
         voice = voices.find(Gender="Male", Language="en")[0]
         communicate = edge_tts.Communicate(text, voice["Name"])
         messages = []
-        async for message in communicate.stream():
-            if message["type"] == "audio":
-                # Choose to accmulate the audio data because
-                # the stream packets are broken when playback.
-                messages.extend(message["data"])
+        async with get_provider_limiter(self.provider).slot():
+            async for message in communicate.stream():
+                if message["type"] == "audio":
+                    # Choose to accmulate the audio data because
+                    # the stream packets are broken when playback.
+                    messages.extend(message["data"])
         await websocket.send_bytes(bytes(messages))
 
 
@@ -36,8 +40,9 @@ class EdgeTTS(Singleton, TextToSpeech):
         voice = voices.find(Gender="Male", Language="en")[0]
         communicate = edge_tts.Communicate(text, voice["Name"])
         messages = []
-        async for message in communicate.stream():
-            if message["type"] == "audio":
-                messages.extend(message["data"])
+        async with get_provider_limiter(self.provider).slot():
+            async for message in communicate.stream():
+                if message["type"] == "audio":
+                    messages.extend(message["data"])
         return bytes(messages)
 
@@ -4,6 +4,7 @@ import types
 import httpx
 
 from realtime_ai_character.logger import get_logger
+from realtime_ai_character.provider_limiter import get_provider_limiter
 from realtime_ai_character.utils import Singleton, timed
 from realtime_ai_character.audio.text_to_speech.base import TextToSpeech
 
@@ -34,6 +35,8 @@ config = types.SimpleNamespace(**{
 
 
 class ElevenLabs(Singleton, TextToSpeech):
+    provider = 'elevenlabs'
+
     def __init__(self):
         super().__init__()
         logger.info("Initializing [ElevenLabs Text To Speech] voices...")
@@ -57,11 +60,14 @@ class ElevenLabs(Singleton, TextToSpeech):
         url = config.url.format(voice_id=voice_id)
         if first_sentence:
             url = url + '?optimize_streaming_latency=4'
-        async with httpx.AsyncClient() as client:
+        async with get_provider_limiter(self.provider).slot() as limiter, \
+                httpx.AsyncClient() as client:
             response = await client.post(url, json=data, headers=headers)
             if response.status_code != 200:
                 logger.error(
                     f"ElevenLabs returns response {response.status_code}")
+                if response.status_code == 429:
+                    limiter.backoff(response.headers.get('Retry-After'))
             async for chunk in response.aiter_bytes():
                 await asyncio.sleep(0.1)
                 if tts_event.is_set():
@@ -84,9 +90,12 @@ class ElevenLabs(Singleton, TextToSpeech):
         }
         # Change to non-streaming endpoint
         url = config.url.format(voice_id=voice_id).replace('/stream', '')
-        async with httpx.AsyncClient() as client:
+        async with get_provider_limiter(self.provider).slot() as limiter, \
+                httpx.AsyncClient() as client:
             response = await client.post(url, json=data, headers=headers)
             if response.status_code != 200:
                 logger.error(f"ElevenLabs returns response {response.status_code}")
+                if response.status_code == 429:
+                    limiter.backoff(response.headers.get('Retry-After'))
             # Get audio/mpeg from the response and return it
             return response.content
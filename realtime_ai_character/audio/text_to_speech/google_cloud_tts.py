@@ -7,6 +7,7 @@ from google.oauth2 import service_account
 import google.auth.transport.requests
 
 from realtime_ai_character.logger import get_logger
+from realtime_ai_character.provider_limiter import get_provider_limiter
 from realtime_ai_character.utils import Singleton, timed
 from realtime_ai_character.audio.text_to_speech.base import TextToSpeech
 
@@ -34,6 +35,8 @@ config = types.SimpleNamespace(**{
 
 
 class GoogleCloudTTS(Singleton, TextToSpeech):
+    provider = 'google_tts'
+
     def __init__(self):
         super().__init__()
         logger.info("Initializing [Google Cloud Text To Speech] voices...")
@@ -77,11 +80,14 @@ class GoogleCloudTTS(Singleton, TextToSpeech):
             if voice_id == "en-US-Studio-O":
                 data["voice"]["ssmlGender"] = 'FEMALE'
         url = config.url
-        async with httpx.AsyncClient() as client:
+        async with get_provider_limiter(self.provider).slot() as limiter, \
+                httpx.AsyncClient() as client:
             response = await client.post(url, json=data, headers=headers)
             # Google Cloud TTS API does not support streaming, we send the whole content at once
             if response.status_code != 200:
                 logger.error(f"Google Cloud TTS returns response {response.status_code}")
+                if response.status_code == 429:
+                    limiter.backoff(response.headers.get('Retry-After'))
             else:
                 audio_content = response.content
                 # Decode the base64-encoded audio content
@@ -107,10 +113,13 @@ class GoogleCloudTTS(Singleton, TextToSpeech):
             data["voice"]["name"] = voice_id
             if voice_id == "en-US-Studio-O":
                 data["voice"]["ssmlGender"] = 'FEMALE'
-        async with httpx.AsyncClient() as client:
+        async with get_provider_limiter(self.provider).slot() as limiter, \
+                httpx.AsyncClient() as client:
             response = await client.post(url, json=data, headers=headers)
             if response.status_code != 200:
                 logger.error(f"Google Cloud TTS returns response {response.status_code}")
+                if response.status_code == 429:
+                    limiter.backoff(response.headers.get('Retry-After'))
             else:
                 audio_content = response.content
                 # Decode the base64-encoded audio content
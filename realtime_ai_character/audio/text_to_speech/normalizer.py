@@ -0,0 +1,169 @@
+import re
+
+# A reply starts with the character's name followed by '>', e.g. "Elon> Hi!". The name is
+# one word, so that "1 > 0" or "Sure thing my friend 1 > 0" is not taken for a prefix.
+MAX_PREFIX_CHARS = 40
+PREFIX_PATTERN = re.compile(r'\s*[^\W\d_][\w-]*\s?>')
+# What a prefix looks like until its '>' arrives.
+PARTIAL_PREFIX_PATTERN = re.compile(r'\s*(?:[^\W\d_][\w-]*\s?)?')
+# Longer bracketed text is not a stage direction, and is spoken.
+MAX_DIRECTION_CHARS = 80
+
+ABBREVIATIONS = {
+    'Mr.': 'Mister', 'Mrs.': 'Missus', 'Ms.': 'Miss', 'Dr.': 'Doctor', 'Prof.': 'Professor',
+    'Jr.': 'Junior', 'Sr.': 'Senior', 'vs.': 'versus', 'etc.': 'et cetera',
+    'e.g.': 'for example', 'i.e.': 'that is', 'approx.': 'approximately', 'a.m.': 'A M',
+    'p.m.': 'P M',
+}
+ABBREVIATION_PATTERN = re.compile(
+    r'(?<!\w)(' + '|'.join(re.escape(abbreviation) for abbreviation in ABBREVIATIONS) + r')',
+    re.IGNORECASE)
+
+ONES = ['zero', 'one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight', 'nine', 'ten',
+        'eleven', 'twelve', 'thirteen', 'fourteen', 'fifteen', 'sixteen', 'seventeen',
+        'eighteen', 'nineteen']
+TENS = ['', '', 'twenty', 'thirty', 'forty', 'fifty', 'sixty', 'seventy', 'eighty', 'ninety']
+SCALES = [(10 ** 12, 'trillion'), (10 ** 9, 'billion'), (10 ** 6, 'million'),
+          (1000, 'thousand'), (100, 'hundred')]
+ORDINALS = {'one': 'first', 'two': 'second', 'three': 'third', 'five': 'fifth',
+            'eight': 'eighth', 'nine': 'ninth', 'twelve': 'twelfth'}
+CURRENCIES = {'$': 'dollars', '€': 'euros', '£': 'pounds'}
+MAGNITUDES = ('thousand', 'million', 'billion', 'trillion')
+
+NUMBER_PATTERN = re.compile(
+    r'(?P<currency>[$€£])?(?P<number>\d{1,3}(?:,\d{3})+|\d+)(?:\.(?P<fraction>\d+))?'
+    r'(?P<ordinal>st|nd|rd|th)?(?P<percent>\s?%)?'
+    r'(?P<magnitude>\s(?:' + '|'.join(MAGNITUDES) + r'))?(?!\w)')
+
+MARKUP_PATTERNS = [
+    (re.compile(r'https?://\S+'), ''),
+    (re.compile(r'`{1,3}'), ''),
+    (re.compile(r'(\*\*|__|~~|\*)'), ''),
+    (re.compile(r'^\s*#{1,6}\s+', re.MULTILINE), ''),
+    (re.compile(r'^\s*[-+•]\s+', re.MULTILINE), ''),
+    (re.compile(r'\(\s*\)'), ''),
+]
+
+
+def number_to_words(n: int) -> str:
+    if n < 20:
+        return ONES[n]
+    if n < 100:
+        return TENS[n // 10] + ('-' + ONES[n % 10] if n % 10 else '')
+    for scale, name in SCALES:
+        if n >= scale:
+            words = f'{number_to_words(n // scale)} {name}'
+            return words + (f' {number_to_words(n % scale)}' if n % scale else '')
+    return str(n)
+
+
+def year_to_words(n: int) -> str:
+    if 2000 <= n < 2010:
+        return number_to_words(n)
+    high, low = divmod(n, 100)
+    if low == 0:
+        return f'{number_to_words(high)} hundred'
+    return f'{number_to_words(high)} {"oh " if low < 10 else ""}{number_to_words(low)}'
+
+
+def ordinal_to_words(n: int) -> str:
+    words = number_to_words(n)
+    head, _, last = words.rpartition(' ')
+    if '-' in last:
+        head_part, _, last = last.rpartition('-')
+        head = f'{head} {head_part}-'.strip() if head else f'{head_part}-'
+    if last in ORDINALS:
+        last = ORDINALS[last]
+    elif last.endswith('y'):
+        last = last[:-1] + 'ieth'
+    else:
+        last += 'th'
+    if head.endswith('-'):
+        return head + last
+    return f'{head} {last}' if head else last
+
+
+def expand_number(match: re.Match) -> str:
+    number = int(match['number'].replace(',', ''))
+    if match['ordinal']:
+        return ordinal_to_words(number)
+    if not (match['currency'] or match['fraction'] or match['percent'] or match['magnitude']) \
+            and len(match['number']) == 4 and 1100 <= number < 2100:
+        return year_to_words(number)
+    words = number_to_words(number)
+    if match['fraction']:
+        words += ' point ' + ' '.join(ONES[int(digit)] for digit in match['fraction'])
+    if match['magnitude']:
+        words += match['magnitude']
+    if match['percent']:
+        words += ' percent'
+    if match['currency']:
+        words += ' ' + CURRENCIES[match['currency']]
+    return words
+
+
+class SpeechNormalizer:
+    """Turns a streamed reply into the text worth synthesizing.
+
+    feed() works on the raw token stream: it drops the "Name>" prefix of the reply and
+    bracketed stage directions such as [blushes], holding back text only until it can
+    tell. normalize() then cleans each chunk before it goes to text to speech: markup is
+    removed and, for English, abbreviations and numbers are spelled out. Chunks with
+    nothing left to say come back empty.
+    """
+
+    def __init__(self, language: str = 'en-US'):
+        self.expand = language.startswith('en')
+        self.pending = ''
+        self.in_prefix = True
+
+    def feed(self, token: str) -> str:
+        self.pending += token
+        return self._drain(final=False)
+
+    def flush(self) -> str:
+        return self._drain(final=True)
+
+    def _drain(self, final: bool) -> str:
+        if self.in_prefix:
+            prefix = PREFIX_PATTERN.match(self.pending)
+            if prefix and prefix.end() <= MAX_PREFIX_CHARS:
+                self.pending = self.pending[prefix.end():]
+                self.in_prefix = False
+            elif final or len(self.pending) > MAX_PREFIX_CHARS or \
+                    not PARTIAL_PREFIX_PATTERN.fullmatch(self.pending):
+                # The model didn't prefix its reply.
+                self.in_prefix = False
+            else:
+                return ''
+        text = []
+        while True:
+            start = self.pending.find('[')
+            if start < 0:
+                text.append(self.pending)
+                self.pending = ''
+                break
+            text.append(self.pending[:start])
+            end = self.pending.find(']', start)
+            if end >= 0:
+                self.pending = self.pending[end + 1:]
+            elif final or len(self.pending) - start > MAX_DIRECTION_CHARS:
+                text.append('[')
+                self.pending = self.pending[start + 1:]
+            else:
+                self.pending = self.pending[start:]
+                break
+        return ''.join(text)
+
+    def normalize(self, text: str) -> str:
+        for pattern, replacement in MARKUP_PATTERNS:
+            text = pattern.sub(replacement, text)
+        if self.expand:
+            text = ABBREVIATION_PATTERN.sub(
+                lambda match: next(expansion for abbreviation, expansion in ABBREVIATIONS.items()
+                                   if abbreviation.lower() == match[0].lower()), text)
+            text = NUMBER_PATTERN.sub(expand_number, text)
+        text = ' '.join(text.split())
+        if not any(ch.isalnum() for ch in text):
+            return ''
+        return text
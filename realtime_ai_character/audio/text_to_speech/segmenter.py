@@ -0,0 +1,123 @@
+import os
+from typing import List, Optional
+
+# Sentence terminators that need whitespace after them to end a sentence, so that "3.5",
+# "e.g." inside a word or "..." followed by more text don't split.
+TERMINATORS = '.!?…'
+# Full-width terminators end a sentence right away, CJK text has no spaces.
+CJK_TERMINATORS = '。！？'
+CLAUSE_SEPARATORS = ',;:—'
+CJK_CLAUSE_SEPARATORS = '，、；：'
+# Closing quotes and brackets stay with the sentence they end.
+CLOSERS = '"\')]}”’»」』）'
+OPENERS = '"\'([{“‘«「『（'
+
+ABBREVIATIONS = {
+    'mr', 'mrs', 'ms', 'dr', 'prof', 'sr', 'jr', 'st', 'mt', 'vs', 'etc', 'e.g', 'i.e',
+    'inc', 'ltd', 'co', 'corp', 'no', 'approx', 'dept', 'est', 'fig', 'u.s', 'a.m', 'p.m',
+}
+
+# Languages written without spaces carry more speech per character.
+CJK_LANGUAGES = ('zh', 'ja')
+
+MIN_CHARS = int(os.getenv('TTS_SEGMENT_MIN_CHARS', 20))
+MAX_CHARS = int(os.getenv('TTS_SEGMENT_MAX_CHARS', 250))
+FIRST_MIN_CHARS = int(os.getenv('TTS_SEGMENT_FIRST_MIN_CHARS', 12))
+
+
+class SentenceSegmenter:
+    """Splits streamed LLM tokens into chunks for text to speech.
+
+    Chunks end at sentence boundaries and are at least min_chars long, shorter sentences
+    are merged with the next one. Text without a boundary is cut at max_chars, at a clause
+    boundary or space if there is one. The first chunk may also end at a clause boundary
+    once it has first_min_chars, so that the first audio starts as early as possible.
+    """
+
+    def __init__(self, language: str = 'en-US', min_chars: int = MIN_CHARS,
+                 max_chars: int = MAX_CHARS, first_min_chars: int = FIRST_MIN_CHARS):
+        if language[:2] in CJK_LANGUAGES:
+            min_chars, max_chars, first_min_chars = (
+                max(1, min_chars // 3), max(1, max_chars // 3), max(1, first_min_chars // 3))
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self.first_min_chars = first_min_chars
+        self.buffer = ''
+        self.is_first = True
+
+    def feed(self, text: str) -> List[str]:
+        """Add streamed text, return the chunks it completed."""
+        self.buffer += text
+        chunks = []
+        while True:
+            end = self._find_end()
+            if end is None:
+                break
+            self._emit(self.buffer[:end], chunks)
+            self.buffer = self.buffer[end:]
+        return chunks
+
+    def flush(self) -> List[str]:
+        """Return whatever is left at the end of the stream."""
+        chunks = []
+        self._emit(self.buffer, chunks)
+        self.buffer = ''
+        return chunks
+
+    def _emit(self, chunk: str, chunks: List[str]):
+        chunk = chunk.strip()
+        if chunk:
+            chunks.append(chunk)
+            self.is_first = False
+
+    def _find_end(self) -> Optional[int]:
+        buffer = self.buffer
+        min_chars = self.first_min_chars if self.is_first else self.min_chars
+        i = 0
+        while i < len(buffer):
+            end = None
+            ch = buffer[i]
+            if ch in CJK_TERMINATORS or (self.is_first and ch in CJK_CLAUSE_SEPARATORS):
+                end = self._skip(buffer, i + 1, CJK_TERMINATORS + CLOSERS)
+            elif ch in TERMINATORS or (self.is_first and ch in CLAUSE_SEPARATORS):
+                end = self._skip(buffer, i + 1, TERMINATORS + CLOSERS)
+                if end == len(buffer):
+                    # Can't tell "3." from "3.5" or "Hello." from "Hello.\"" yet.
+                    break
+                if not buffer[end].isspace() or (
+                        ch == '.' and end == i + 1 and self._is_abbreviation(buffer, i)):
+                    end = None
+            elif ch == '\n':
+                end = i + 1
+            if end is not None:
+                if len(buffer[:end].strip()) >= min_chars:
+                    return end
+                i = end
+            else:
+                i += 1
+        if len(buffer) > self.max_chars:
+            return self._cut(buffer[:self.max_chars])
+        return None
+
+    @staticmethod
+    def _skip(buffer: str, i: int, chars: str) -> int:
+        while i < len(buffer) and buffer[i] in chars:
+            i += 1
+        return i
+
+    @staticmethod
+    def _is_abbreviation(buffer: str, i: int) -> bool:
+        start = i
+        while start > 0 and not buffer[start - 1].isspace():
+            start -= 1
+        word = buffer[start:i].lstrip(OPENERS).lower()
+        # Single letters are initials, as in "J. R. R. Tolkien".
+        return word in ABBREVIATIONS or (len(word) == 1 and word.isalpha())
+
+    @staticmethod
+    def _cut(text: str) -> int:
+        for separators in (CLAUSE_SEPARATORS + CJK_CLAUSE_SEPARATORS, ' '):
+            end = max(text.rfind(separator) for separator in separators)
+            if end > 0:
+                return end + 1
+        return len(text)
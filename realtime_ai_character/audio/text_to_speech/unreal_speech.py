@@ -3,6 +3,7 @@ import types
 import httpx
 
 from realtime_ai_character.logger import get_logger
+from realtime_ai_character.provider_limiter import get_provider_limiter
 from realtime_ai_character.utils import Singleton, timed
 from realtime_ai_character.audio.text_to_speech.base import TextToSpeech
 
@@ -24,6 +25,8 @@ config = types.SimpleNamespace(**{
 
 
 class UnrealSpeech(Singleton, TextToSpeech):
+    provider = 'unreal_speech'
+
     def __init__(self):
         super().__init__()
         logger.info("Initializing [Unreal Speech] voices...")
@@ -39,11 +42,14 @@ class UnrealSpeech(Singleton, TextToSpeech):
             **config.data,
         }
 
-        async with httpx.AsyncClient() as client:
+        async with get_provider_limiter(self.provider).slot() as limiter, \
+                httpx.AsyncClient() as client:
             response = await client.get(config.url, params=params)
             if response.status_code != 200:
                 logger.error(
                     f"Unreal Speech returns response {response.status_code}")
+                if response.status_code == 429:
+                    limiter.backoff(response.headers.get('Retry-After'))
             async for chunk in response.aiter_bytes():
                 await asyncio.sleep(0.1)
                 if tts_event.is_set():
@@ -58,10 +64,13 @@ class UnrealSpeech(Singleton, TextToSpeech):
             **config.data,
         }
 
-        async with httpx.AsyncClient() as client:
+        async with get_provider_limiter(self.provider).slot() as limiter, \
+                httpx.AsyncClient() as client:
             response = await client.get(config.url, params=params)
             if response.status_code != 200:
                 logger.error(
                     f"Unreal Speech returns response {response.status_code}")
+                if response.status_code == 429:
+                    limiter.backoff(response.headers.get('Retry-After'))
             audio_bytes = await response.aread()
             return audio_bytes
@@ -1,66 +1,148 @@
 import os
 import threading
-import time
 import yaml
+from dataclasses import dataclass
 from pathlib import Path
 from contextlib import ExitStack
+from types import MappingProxyType
+from typing import Callable, Dict, Mapping, Optional, Tuple
 
 from dotenv import load_dotenv
-from firebase_admin import auth
-from llama_index import SimpleDirectoryReader
-from langchain.text_splitter import CharacterTextSplitter
 
 from realtime_ai_character.logger import get_logger
-from realtime_ai_character.utils import Singleton, Character
+from realtime_ai_character.utils import Singleton, Character, TTLCache
 from realtime_ai_character.database.chroma import get_chroma
-from readerwriterlock import rwlock
-from realtime_ai_character.database.connection import get_db
+from realtime_ai_character.database.connection import SessionLocal
+from realtime_ai_character.character_catalog.change_bus import (CatalogChange, LocalChangeBus,
+                                                                get_change_bus)
+from realtime_ai_character.character_catalog.user_directory import (ANONYMOUS_AUTHOR,
+                                                                    get_user_directory)
 from realtime_ai_character.models.character import Character as CharacterModel
 
 load_dotenv()
 logger = get_logger(__name__)
 
+# Attempts at a consistency check that concurrent changes keep outdating.
+SQL_LOAD_ATTEMPTS = 3
+# Seconds between full loads of the character table, by default. With the LOCAL change bus
+# they are the only way changes reach other workers, as before the bus.
+CONSISTENCY_CHECK_INTERVAL = 600
+LOCAL_BUS_LOAD_INTERVAL = 30
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """Immutable view of the catalog. Never mutate a published snapshot or its characters."""
+    version: int
+    characters: Mapping[str, Character]
+    by_visibility: Mapping[str, Tuple[Character, ...]]
+    by_author: Mapping[str, Tuple[Character, ...]]
+
+    @classmethod
+    def build(cls, version: int, characters: Dict[str, Character]) -> 'CatalogSnapshot':
+        by_visibility, by_author = {}, {}
+        for character in characters.values():
+            by_visibility.setdefault(character.visibility, []).append(character)
+            if character.author_id:
+                by_author.setdefault(character.author_id, []).append(character)
+
+        def freeze(index):
+            return MappingProxyType({key: tuple(value) for key, value in index.items()})
+
+        return cls(version=version,
+                   characters=MappingProxyType(dict(characters)),
+                   by_visibility=freeze(by_visibility),
+                   by_author=freeze(by_author))
+
 
 class CatalogManager(Singleton):
     def __init__(self, overwrite=True):
         super().__init__()
         self.db = get_chroma()
-        self.sql_db = next(get_db())
-        self.sql_load_interval = 30
-        self.sql_load_lock = rwlock.RWLockFair()
+        self.change_bus = get_change_bus()
+        # Changes are applied write-through and broadcast over the change bus, the periodic
+        # full load is only a consistency check. The LOCAL bus doesn't reach other worker
+        # processes, there the full load is how they learn about changes.
+        if isinstance(self.change_bus, LocalChangeBus):
+            logger.warning('The LOCAL catalog change bus only reaches this process. With '
+                           'several workers, set CATALOG_CHANGE_BUS to SQLITE or POSTGRES.')
+        self.sql_load_interval = int(os.getenv(
+            'CATALOG_CONSISTENCY_CHECK_INTERVAL',
+            LOCAL_BUS_LOAD_INTERVAL if isinstance(self.change_bus, LocalChangeBus)
+            else CONSISTENCY_CHECK_INTERVAL))
+        # Only writers take this lock. Readers use the current snapshot, which is swapped
+        # in with a single reference assignment.
+        self.write_lock = threading.Lock()
 
         if overwrite:
             logger.info('Overwriting existing data in the chroma.')
             self.db.delete_collection()
             self.db = get_chroma()
 
-        self.characters = {}
-        self.author_name_cache = {}
-        self.load_characters_from_community(overwrite)
-        self.load_characters(overwrite)
+        self.user_directory = get_user_directory()
+        self.author_name_cache = TTLCache(
+            maxsize=int(os.getenv('AUTHOR_NAME_CACHE_SIZE', 10000)),
+            ttl=float(os.getenv('AUTHOR_NAME_CACHE_TTL', 3600)))
+        characters = {}
+        self.load_characters_from_community(characters, overwrite)
+        self.load_characters(characters, overwrite)
+        self._snapshot = CatalogSnapshot.build(0, characters)
         if overwrite:
             logger.info('Persisting data in the chroma.')
             self.db.persist()
         logger.info(
             f"Total document load: {self.db._client.get_collection('llm').count()}")
-        self.run_load_sql_db_thread = True
+        self.stop_load_sql_db_event = threading.Event()
+        self.load_sql_db_thread = None
+        self.start_load_sql_db_loop()
+
+    def start_load_sql_db_loop(self):
+        """Start background syncing. Threads don't survive fork, forked workers call this."""
+        self.change_bus.subscribe(self.on_remote_change)
+        self.stop_load_sql_db_event.clear()
         self.load_sql_db_thread = threading.Thread(target=self.load_sql_db_loop)
         self.load_sql_db_thread.daemon = True
         self.load_sql_db_thread.start()
 
     def load_sql_db_loop(self):
-        while self.run_load_sql_db_thread:
+        while not self.stop_load_sql_db_event.is_set():
             self.load_character_from_sql_database()
-            time.sleep(self.sql_load_interval)
+            self.stop_load_sql_db_event.wait(self.sql_load_interval)
 
-    def stop_load_sql_db_loop(self):
-        self.run_load_sql_db_thread = False
+    def stop_load_sql_db_loop(self, timeout=None):
+        """Stop the loader and the change bus listener, their threads and connections."""
+        self.stop_load_sql_db_event.set()
+        self.change_bus.close(timeout)
+        if self.load_sql_db_thread is not None:
+            self.load_sql_db_thread.join(timeout)
+
+    @property
+    def snapshot(self) -> CatalogSnapshot:
+        return self._snapshot
+
+    @property
+    def characters(self) -> Mapping[str, Character]:
+        return self._snapshot.characters
 
     def get_character(self, name) -> Character:
-        with self.sql_load_lock.gen_rlock():
-            return self.characters.get(name)
+        return self._snapshot.characters.get(name)
+
+    def update_snapshot(self, mutate: Callable[[Dict[str, Character]], None],
+                        expected_version: Optional[int] = None) -> bool:
+        """Build the next snapshot from a copy of the current characters and swap it in.
 
-    def load_character(self, directory):
+        With expected_version, only if no other write swapped a snapshot in since that
+        version. Returns whether the snapshot was swapped.
+        """
+        with self.write_lock:
+            if expected_version is not None and self._snapshot.version != expected_version:
+                return False
+            characters = dict(self._snapshot.characters)
+            mutate(characters)
+            self._snapshot = CatalogSnapshot.build(self._snapshot.version + 1, characters)
+            return True
+
+    def load_character(self, directory, characters):
         with ExitStack() as stack:
             f_yaml = stack.enter_context(open(directory / 'config.yaml'))
             yaml_content = yaml.safe_load(f_yaml)
@@ -70,7 +152,7 @@ class CatalogManager(Singleton):
         voice_id = str(yaml_content['voice_id'])
         if (os.getenv(character_id.upper() + "_VOICE_ID", "")):
             voice_id = os.getenv(character_id.upper() + "_VOICE_ID")
-        self.characters[character_id] = Character(
+        characters[character_id] = Character(
             character_id=character_id,
             name=character_name,
             llm_system_prompt=yaml_content["system"],
@@ -83,13 +165,13 @@ class CatalogManager(Singleton):
         )
 
         if "avatar_id" in yaml_content:
-            self.characters[character_id].avatar_id = yaml_content["avatar_id"]
+            characters[character_id].avatar_id = yaml_content["avatar_id"]
         if "author_name" in yaml_content:
-            self.characters[character_id].author_name = yaml_content["author_name"],
+            characters[character_id].author_name = yaml_content["author_name"]
 
         return character_name
 
-    def load_characters(self, overwrite):
+    def load_characters(self, characters, overwrite):
         """
         Load characters from the character_catalog directory. Use /data to create
         documents and add them to the chroma.
@@ -103,14 +185,14 @@ class CatalogManager(Singleton):
                        and d.name not in excluded_dirs]
 
         for directory in directories:
-            character_name = self.load_character(directory)
+            character_name = self.load_character(directory, characters)
             if overwrite:
                 self.load_data(character_name, directory / 'data')
                 logger.info('Loaded data for character: ' + character_name)
         logger.info(
-            f'Loaded {len(self.characters)} characters: IDs {list(self.characters.keys())}')
+            f'Loaded {len(characters)} characters: IDs {list(characters.keys())}')
 
-    def load_characters_from_community(self, overwrite):
+    def load_characters_from_community(self, characters, overwrite):
         path = Path(__file__).parent / 'community'
         excluded_dirs = {'__pycache__', 'archive'}
 
@@ -122,7 +204,7 @@ class CatalogManager(Singleton):
                 yaml_content = yaml.safe_load(f_yaml)
             character_id = yaml_content['character_id']
             character_name = yaml_content['character_name']
-            self.characters[character_id] = Character(
+            characters[character_id] = Character(
                 character_id=character_id,
                 name=character_name,
                 llm_system_prompt=yaml_content["system"],
@@ -136,13 +218,16 @@ class CatalogManager(Singleton):
             )
 
             if "avatar_id" in yaml_content:
-                self.characters[character_id].avatar_id = yaml_content["avatar_id"]
+                characters[character_id].avatar_id = yaml_content["avatar_id"]
 
             if overwrite:
                 self.load_data(character_name, directory / 'data')
                 logger.info('Loaded data for character: ' + character_name)
 
     def load_data(self, character_name: str, data_path: str):
+        from llama_index import SimpleDirectoryReader
+        from langchain.text_splitter import CharacterTextSplitter
+
         loader = SimpleDirectoryReader(Path(data_path))
         documents = loader.load_data()
         text_splitter = CharacterTextSplitter(
@@ -158,48 +243,120 @@ class CatalogManager(Singleton):
         self.db.add_documents(docs)
 
 
+    def resolve_author_names(self, author_ids) -> dict:
+        """Resolve author names, looking up all cache misses in one batched call.
+
+        Never call this while holding write_lock, it may wait on the network.
+        """
+        author_names = {}
+        missing = set()
+        for author_id in set(author_ids):
+            if not author_id:
+                continue
+            author_name = self.author_name_cache.get(author_id)
+            if author_name is None:
+                missing.add(author_id)
+            else:
+                author_names[author_id] = author_name
+        if missing:
+            fetched = self.user_directory.get_display_names(missing)
+            for author_id, author_name in fetched.items():
+                self.author_name_cache.set(author_id, author_name)
+            author_names.update(fetched)
+        return author_names
+
+    def character_from_model(self, character_model: CharacterModel,
+                             author_name: str = ANONYMOUS_AUTHOR) -> Character:
+        return Character(
+            character_id=character_model.id,
+            name=character_model.name,
+            llm_system_prompt=character_model.system_prompt,
+            llm_user_prompt=character_model.user_prompt,
+            voice_id=character_model.voice_id,
+            source='community',
+            location='database',
+            author_id=character_model.author_id,
+            author_name=author_name,
+            visibility=character_model.visibility,
+            tts=character_model.tts,
+            data=character_model.data,
+            avatar_id=character_model.avatar_id if character_model.avatar_id else None
+        )
+
+    def upsert_character(self, character_model: CharacterModel, publish=True):
+        """Apply a created or edited database character to the local catalog."""
+        author_names = self.resolve_author_names([character_model.author_id])
+        character = self.character_from_model(
+            character_model, author_names.get(character_model.author_id, ANONYMOUS_AUTHOR))
+        def mutate(characters):
+            characters[character.character_id] = character
+        self.update_snapshot(mutate)
+        if publish:
+            self.change_bus.publish('upsert', character.character_id)
+
+    def remove_character(self, character_id: str, publish=True):
+        """Remove a deleted database character from the local catalog."""
+        def mutate(characters):
+            character = characters.get(character_id)
+            if character and character.location == 'database':
+                del characters[character_id]
+        self.update_snapshot(mutate)
+        if publish:
+            self.change_bus.publish('delete', character_id)
+
+    def on_remote_change(self, change: CatalogChange):
+        logger.info(f'Received catalog change {change.op} for character {change.character_id}')
+        if change.op == 'delete':
+            self.remove_character(change.character_id, publish=False)
+        elif change.op == 'upsert':
+            with SessionLocal() as sql_db:
+                character_model = sql_db.get(CharacterModel, change.character_id)
+                if character_model:
+                    self.upsert_character(character_model, publish=False)
+                else:
+                    self.remove_character(change.character_id, publish=False)
+
     def load_character_from_sql_database(self):
         logger.info('Started loading characters from SQL database')
-        character_models = self.sql_db.query(CharacterModel).all()
+        for _ in range(SQL_LOAD_ATTEMPTS):
+            if self._load_character_from_sql_database():
+                return
+            # A write-through change raced the read, whose result may predate it.
+            logger.info('Catalog changed while loading from the SQL database, reloading')
+        logger.warning('Catalog kept changing while loading from the SQL database, skipped '
+                       'the consistency check')
 
-        with self.sql_load_lock.gen_wlock():
+    def _load_character_from_sql_database(self) -> bool:
+        version = self._snapshot.version
+        # The models keep their loaded columns once the session is closed, the connection
+        # goes back to the pool before the author names are looked up.
+        with SessionLocal() as sql_db:
+            character_models = sql_db.query(CharacterModel).all()
+        author_names = self.resolve_author_names(
+            [character_model.author_id for character_model in character_models])
+        characters = [self.character_from_model(
+            character_model,
+            author_names.get(character_model.author_id, ANONYMOUS_AUTHOR))
+            for character_model in character_models]
+
+        def mutate(catalog_characters):
             # delete all characters with location == 'database'
             keys_to_delete = []
-            for character_id in self.characters.keys():
-                if self.characters[character_id].location == 'database':
+            for character_id in catalog_characters.keys():
+                if catalog_characters[character_id].location == 'database':
                     keys_to_delete.append(character_id)
             for key in keys_to_delete:
-                del self.characters[key]
+                del catalog_characters[key]
 
             # add all characters from sql database
-            for character_model in character_models:
-                if character_model.author_id not in self.author_name_cache:
-                    author_name = auth.get_user(
-                        character_model.author_id).display_name if os.getenv(
-                            'USE_AUTH', '') else "anonymous author"
-                    self.author_name_cache[character_model.author_id] = author_name
-                else:
-                    author_name = self.author_name_cache[character_model.author_id]
-                character = Character(
-                    character_id=character_model.id,
-                    name=character_model.name,
-                    llm_system_prompt=character_model.system_prompt,
-                    llm_user_prompt=character_model.user_prompt,
-                    voice_id=character_model.voice_id,
-                    source='community',
-                    location='database',
-                    author_id=character_model.author_id,
-                    author_name=author_name,
-                    visibility=character_model.visibility,
-                    tts=character_model.tts,
-                    data=character_model.data,
-                    avatar_id=character_model.avatar_id if character_model.avatar_id else None
-                )
-                self.characters[character_model.id] = character
+            for character in characters:
+                catalog_characters[character.character_id] = character
                 # TODO: load context data from storage
+        if not self.update_snapshot(mutate, expected_version=version):
+            return False
         logger.info(
             f'Loaded {len(character_models)} characters from sql database')
-
+        return True
 
 def get_catalog_manager():
     return CatalogManager.get_instance()
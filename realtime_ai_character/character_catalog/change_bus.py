@@ -0,0 +1,231 @@
+import json
+import os
+import select
+import socket
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Callable, List, Optional
+
+from dotenv import load_dotenv
+
+from realtime_ai_character.logger import get_logger
+
+load_dotenv()
+logger = get_logger(__name__)
+
+# How often the Postgres listener checks whether it was closed.
+LISTEN_POLL_INTERVAL = 1.0
+
+
+@dataclass
+class CatalogChange:
+    # 'upsert' or 'delete'
+    op: str
+    character_id: str
+    origin: str = ''
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self))
+
+    @classmethod
+    def from_json(cls, payload: str) -> 'CatalogChange':
+        return cls(**json.loads(payload))
+
+
+class ChangeBus(ABC):
+    """Broadcasts catalog changes to the other workers and nodes."""
+
+    @property
+    def origin(self) -> str:
+        # Includes the pid so that forked workers get distinct origins.
+        return f'{socket.gethostname()}:{os.getpid()}:{id(self)}'
+
+    def publish(self, op: str, character_id: str):
+        change = CatalogChange(op=op, character_id=character_id, origin=self.origin)
+        try:
+            self._publish(change)
+        except Exception as e:
+            # The periodic consistency check picks the change up eventually.
+            logger.error(f'Failed to publish catalog change {change}: {e}')
+
+    @abstractmethod
+    def _publish(self, change: CatalogChange):
+        pass
+
+    @abstractmethod
+    def subscribe(self, callback: Callable[[CatalogChange], None]):
+        """Deliver changes published by other origins to callback."""
+        pass
+
+    def close(self, timeout: Optional[float] = None):
+        """Stop delivering changes, and wait up to timeout for the listener to stop."""
+        pass
+
+
+class LocalChangeBus(ChangeBus):
+    """In-process bus. Bus instances in the same process act as separate workers."""
+    _subscribers: List['LocalChangeBus'] = []
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self.callback: Optional[Callable[[CatalogChange], None]] = None
+
+    def _publish(self, change: CatalogChange):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for bus in subscribers:
+            if bus is not self:
+                bus.callback(change)
+
+    def subscribe(self, callback: Callable[[CatalogChange], None]):
+        self.callback = callback
+        with self._lock:
+            self._subscribers.append(self)
+
+    def close(self, timeout: Optional[float] = None):
+        with self._lock:
+            if self in self._subscribers:
+                self._subscribers.remove(self)
+
+
+class SqliteChangeBus(ChangeBus):
+    """Polls a shared SQLite file. Works across worker processes on a single host."""
+
+    def __init__(self, path: str, poll_interval: float = 0.5, retention: float = 3600):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.stop_event = threading.Event()
+        self.poll_thread: Optional[threading.Thread] = None
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS catalog_changes ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, origin TEXT, payload TEXT, '
+                'created_at REAL)')
+
+    @contextmanager
+    def _connect(self):
+        # sqlite3's own context manager only commits, it doesn't close the connection.
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _publish(self, change: CatalogChange):
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO catalog_changes (origin, payload, created_at) VALUES (?, ?, ?)',
+                (change.origin, change.to_json(), time.time()))
+            conn.execute('DELETE FROM catalog_changes WHERE created_at < ?',
+                         (time.time() - self.retention,))
+
+    def subscribe(self, callback: Callable[[CatalogChange], None]):
+        with self._connect() as conn:
+            last_id = conn.execute('SELECT MAX(id) FROM catalog_changes').fetchone()[0] or 0
+        self.stop_event.clear()
+        self.poll_thread = threading.Thread(target=self._poll_loop, args=(callback, last_id))
+        self.poll_thread.daemon = True
+        self.poll_thread.start()
+
+    def _poll_loop(self, callback: Callable[[CatalogChange], None], last_id: int):
+        while not self.stop_event.is_set():
+            try:
+                with self._connect() as conn:
+                    rows = conn.execute(
+                        'SELECT id, origin, payload FROM catalog_changes WHERE id > ? '
+                        'ORDER BY id', (last_id,)).fetchall()
+                for row_id, origin, payload in rows:
+                    last_id = row_id
+                    if origin != self.origin:
+                        callback(CatalogChange.from_json(payload))
+            except Exception as e:
+                logger.error(f'Failed to poll catalog changes: {e}')
+            self.stop_event.wait(self.poll_interval)
+
+    def close(self, timeout: Optional[float] = None):
+        self.stop_event.set()
+        if self.poll_thread is not None:
+            self.poll_thread.join(timeout)
+            self.poll_thread = None
+
+
+class PostgresChangeBus(ChangeBus):
+    """Uses Postgres LISTEN/NOTIFY. Works across nodes sharing the database."""
+    channel = 'catalog_changes'
+
+    def __init__(self, database_url: str):
+        from sqlalchemy.engine import make_url
+
+        # psycopg2 takes a libpq URL, without the SQLAlchemy driver, e.g. +asyncpg.
+        self.database_url = make_url(database_url).set(
+            drivername='postgresql').render_as_string(hide_password=False)
+        self.stop_event = threading.Event()
+        self.listen_thread: Optional[threading.Thread] = None
+
+    def _connect(self):
+        import psycopg2
+        conn = psycopg2.connect(self.database_url)
+        conn.autocommit = True
+        return conn
+
+    def _publish(self, change: CatalogChange):
+        conn = self._connect()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT pg_notify(%s, %s)', (self.channel, change.to_json()))
+        finally:
+            conn.close()
+
+    def subscribe(self, callback: Callable[[CatalogChange], None]):
+        self.stop_event.clear()
+        self.listen_thread = threading.Thread(target=self._listen_loop, args=(callback,))
+        self.listen_thread.daemon = True
+        self.listen_thread.start()
+
+    def _listen_loop(self, callback: Callable[[CatalogChange], None]):
+        while not self.stop_event.is_set():
+            conn = None
+            try:
+                conn = self._connect()
+                with conn.cursor() as cursor:
+                    cursor.execute(f'LISTEN {self.channel}')
+                while not self.stop_event.is_set():
+                    if select.select([conn], [], [], LISTEN_POLL_INTERVAL) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        change = CatalogChange.from_json(conn.notifies.pop(0).payload)
+                        if change.origin != self.origin:
+                            callback(change)
+            except Exception as e:
+                logger.error(f'Catalog change listener failed, reconnecting: {e}')
+                self.stop_event.wait(1)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def close(self, timeout: Optional[float] = None):
+        self.stop_event.set()
+        if self.listen_thread is not None:
+            self.listen_thread.join(timeout)
+            self.listen_thread = None
+
+
+def get_change_bus(use: str = None) -> ChangeBus:
+    if not use:
+        # SQLITE by default: forked or uvicorn --workers processes share one host.
+        use = os.getenv('CATALOG_CHANGE_BUS', 'SQLITE')
+    if use == 'LOCAL':
+        return LocalChangeBus()
+    elif use == 'SQLITE':
+        return SqliteChangeBus(os.getenv('CATALOG_CHANGE_BUS_PATH', './catalog_changes.db'))
+    elif use == 'POSTGRES':
+        return PostgresChangeBus(os.getenv('DATABASE_URL'))
+    else:
+        raise NotImplementedError(f'Unknown catalog change bus: {use}')
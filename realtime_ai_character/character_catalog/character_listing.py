@@ -0,0 +1,81 @@
+import hashlib
+import json
+import threading
+from typing import Dict, Optional, Tuple
+
+from realtime_ai_character.character_catalog.catalog_manager import CatalogSnapshot
+from realtime_ai_character.utils import Character
+
+GCS_PATH = 'https://storage.googleapis.com/assistly'
+
+
+def get_image_url(character: Character) -> str:
+    if character.data and 'avatar_filename' in character.data:
+        return f'{GCS_PATH}/{character.data["avatar_filename"]}'
+    else:
+        return f'{GCS_PATH}/static/realchar/{character.character_id}.jpg'
+
+
+def serialize_character(character: Character, is_author: bool) -> bytes:
+    # Same encoding as fastapi's JSONResponse.
+    return json.dumps({
+        "character_id": character.character_id,
+        "name": character.name,
+        "source": character.source,
+        "voice_id": character.voice_id,
+        "author_name": character.author_name,
+        "image_url": get_image_url(character),
+        "avatar_id": character.avatar_id,
+        "tts": character.tts,
+        'is_author': is_author,
+    }, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode('utf-8')
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+class CharacterListing:
+    """Pre-serialized /characters response for one catalog snapshot."""
+
+    def __init__(self, snapshot: CatalogSnapshot):
+        self.snapshot = snapshot
+        # Serialized entries with is_author=false, in catalog order.
+        self.fragments: Dict[str, bytes] = {
+            character.character_id: serialize_character(character, is_author=False)
+            for character in snapshot.characters.values()
+        }
+        self.public_body = b'[' + b','.join(
+            self.fragments[character.character_id]
+            for character in snapshot.characters.values()
+            if character.visibility == 'public') + b']'
+        self.public_etag = make_etag(self.public_body)
+
+    def render(self, uid: Optional[str]) -> Tuple[bytes, str]:
+        """Return the response body and its ETag for the given user."""
+        if not uid or uid not in self.snapshot.by_author:
+            return self.public_body, self.public_etag
+        parts = []
+        for character in self.snapshot.characters.values():
+            if character.author_id == uid:
+                parts.append(serialize_character(character, is_author=True))
+            elif character.visibility == 'public':
+                parts.append(self.fragments[character.character_id])
+        body = b'[' + b','.join(parts) + b']'
+        return body, make_etag(body)
+
+
+_listing: Optional[CharacterListing] = None
+_listing_lock = threading.Lock()
+
+
+def get_character_listing(snapshot: CatalogSnapshot) -> CharacterListing:
+    """Return the listing for the snapshot, building it once per catalog version."""
+    global _listing
+    listing = _listing
+    if listing is not None and listing.snapshot is snapshot:
+        return listing
+    with _listing_lock:
+        if _listing is None or _listing.snapshot is not snapshot:
+            _listing = CharacterListing(snapshot)
+        return _listing
@@ -0,0 +1,58 @@
+import os
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, Optional
+
+from realtime_ai_character.logger import get_logger
+
+logger = get_logger(__name__)
+
+ANONYMOUS_AUTHOR = "anonymous author"
+
+
+class UserDirectory(ABC):
+    """Resolves user ids to display names."""
+
+    @abstractmethod
+    def get_display_names(self, user_ids: Iterable[str]) -> Dict[str, str]:
+        pass
+
+
+class FirebaseUserDirectory(UserDirectory):
+    # Firebase accepts at most 100 identifiers per get_users call.
+    batch_size = 100
+
+    def get_display_names(self, user_ids: Iterable[str]) -> Dict[str, str]:
+        from firebase_admin import auth
+
+        user_ids = list(user_ids)
+        display_names = {}
+        for i in range(0, len(user_ids), self.batch_size):
+            batch = user_ids[i:i + self.batch_size]
+            try:
+                result = auth.get_users([auth.UidIdentifier(uid) for uid in batch])
+            except Exception as e:
+                logger.error(f'Failed to look up {len(batch)} authors: {e}')
+                continue
+            for user in result.users:
+                display_names[user.uid] = user.display_name or ANONYMOUS_AUTHOR
+            for identifier in result.not_found:
+                display_names[identifier.uid] = ANONYMOUS_AUTHOR
+        return display_names
+
+
+class LocalUserDirectory(UserDirectory):
+    """Stand-in used when auth is disabled, and in tests."""
+
+    def __init__(self, display_names: Optional[Dict[str, str]] = None):
+        self.display_names = display_names or {}
+        self.lookups = 0
+
+    def get_display_names(self, user_ids: Iterable[str]) -> Dict[str, str]:
+        self.lookups += 1
+        return {uid: self.display_names.get(uid, ANONYMOUS_AUTHOR) for uid in user_ids}
+
+
+def get_user_directory() -> UserDirectory:
+    if os.getenv('USE_AUTH', ''):
+        return FirebaseUserDirectory()
+    return LocalUserDirectory()
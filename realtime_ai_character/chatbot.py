@@ -6,6 +6,7 @@ from typing import Callable
 from realtime_ai_character.character_catalog.catalog_manager import get_catalog_manager, CatalogManager
 from realtime_ai_character.llm import get_llm, LLM
 from realtime_ai_character.llm.base import AsyncCallbackTextHandler, AsyncCallbackAudioHandler
+from realtime_ai_character.llm.history_summarizer import HistorySummarizer
 from realtime_ai_character.utils import ConversationHistory, build_history, Character
 
 
@@ -62,8 +63,9 @@ class Conversation:
     ):
         self.conversation_id = _conversation_id
         self.listener_name = _listener_name
-        self.conversation_history = ConversationHistory()
         self.llm = get_llm(model=os.getenv('LLM_MODEL_USE', 'gpt-3.5-turbo-16k'))
+        self.conversation_history = ConversationHistory(model=self.llm.get_config()['model'])
+        self.history_summarizer = HistorySummarizer(self.conversation_history, self.llm)
 
         # init character
         global default_character
@@ -97,8 +99,8 @@ class Conversation:
             useMultiOn=False,
             metadata={'message_id': message_id})
 
-        self.conversation_history.user.append(message)
-        self.conversation_history.ai.append(response)
+        self.conversation_history.append(message, response)
+        self.history_summarizer.schedule()
 
         callback(response)
 
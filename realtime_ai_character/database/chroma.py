@@ -1,22 +1,45 @@
 import os
+from functools import cache
+
 from dotenv import load_dotenv
-from langchain.vectorstores import Chroma
-from langchain.embeddings import OpenAIEmbeddings
 from realtime_ai_character.logger import get_logger
+from realtime_ai_character.provider_limiter import (get_provider_limiter,
+                                                    retry_rate_limited_sync)
 
 load_dotenv()
 logger = get_logger(__name__)
 
-embedding = OpenAIEmbeddings(openai_api_key=os.getenv("OPENAI_API_KEY"))
-if os.getenv('OPENAI_API_TYPE') == 'azure':
-    embedding = OpenAIEmbeddings(openai_api_key=os.getenv("OPENAI_API_KEY"), deployment=os.getenv(
-        "OPENAI_API_EMBEDDING_DEPLOYMENT_NAME", "text-embedding-ada-002"), chunk_size=1)
+
+@cache
+def get_embedding():
+    from langchain.embeddings import OpenAIEmbeddings
+
+    class LimitedOpenAIEmbeddings(OpenAIEmbeddings):
+        """Embedding calls, made from worker threads, go through the provider limiter."""
+
+        def embed_documents(self, texts, chunk_size=0):
+            # embed_query() embeds through here as well.
+            def call():
+                with get_provider_limiter('openai_embedding').sync_slot():
+                    return super(LimitedOpenAIEmbeddings, self).embed_documents(
+                        texts, chunk_size)
+
+            return retry_rate_limited_sync(call)
+
+    if os.getenv('OPENAI_API_TYPE') == 'azure':
+        return LimitedOpenAIEmbeddings(
+            openai_api_key=os.getenv("OPENAI_API_KEY"), deployment=os.getenv(
+                "OPENAI_API_EMBEDDING_DEPLOYMENT_NAME", "text-embedding-ada-002"), chunk_size=1,
+            max_retries=0)
+    return LimitedOpenAIEmbeddings(openai_api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
 
 
 def get_chroma():
+    from langchain.vectorstores import Chroma
+
     chroma = Chroma(
         collection_name='llm',
-        embedding_function=embedding,
+        embedding_function=get_embedding(),
         persist_directory='./chroma.db'
     )
     return chroma
@@ -1,3 +1,5 @@
+from functools import cache
+
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
@@ -10,8 +12,18 @@ SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
 connect_args = {"check_same_thread": False} if SQLALCHEMY_DATABASE_URL.startswith(
     "sqlite") else {}
 
+# Connections kept per engine and process, with DATABASE_MAX_OVERFLOW more under load.
+# SQLite doesn't pool connections.
+pool_args = {} if SQLALCHEMY_DATABASE_URL.startswith("sqlite") else {
+    "pool_size": int(os.getenv("DATABASE_POOL_SIZE", 10)),
+    "max_overflow": int(os.getenv("DATABASE_MAX_OVERFLOW", 10)),
+    "pool_timeout": float(os.getenv("DATABASE_POOL_TIMEOUT", 10)),
+    "pool_recycle": int(os.getenv("DATABASE_POOL_RECYCLE", 1800)),
+    "pool_pre_ping": True,
+}
+
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args=connect_args
+    SQLALCHEMY_DATABASE_URL, connect_args=connect_args, **pool_args
 )
 
 SessionLocal = sessionmaker(
@@ -26,6 +38,42 @@ def get_db():
         db.close()
 
 
+def async_database_url(url: str) -> str:
+    """The URL of the same database with an asyncio driver, asyncpg or aiosqlite."""
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    for scheme in ("postgresql+psycopg2:", "postgresql:", "postgres:"):
+        if url.startswith(scheme):
+            # asyncpg calls libpq's sslmode ssl.
+            return "postgresql+asyncpg:" + url[len(scheme):].replace("sslmode=", "ssl=")
+    return url
+
+
+@cache
+def get_async_engine():
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    return create_async_engine(async_database_url(SQLALCHEMY_DATABASE_URL), **pool_args)
+
+
+@cache
+def get_async_sessionmaker():
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    # Objects stay usable after commit, e.g. to hand them to the catalog.
+    return async_sessionmaker(get_async_engine(), autoflush=False, expire_on_commit=False)
+
+
+def async_session():
+    """A short-lived session for one unit of work: `async with async_session() as db:`."""
+    return get_async_sessionmaker()()
+
+
+async def get_async_db():
+    async with async_session() as db:
+        yield db
+
+
 if __name__ == "__main__":
     print(SQLALCHEMY_DATABASE_URL)
     from realtime_ai_character.models.user import User
@@ -0,0 +1,185 @@
+"""Write-behind persistence of Interaction rows.
+
+Turns hand their Interaction to the process' InteractionWriter and move on. A background
+task inserts queued rows in bulk, one transaction per batch of up to INTERACTION_BATCH_SIZE
+rows or every INTERACTION_FLUSH_INTERVAL_MS, instead of one commit per message. Sessions
+flush when they disconnect and the server flushes on shutdown, so that a client coming back
+finds its history. When the database falls behind and INTERACTION_QUEUE_SIZE rows are
+waiting, turns wait for room instead of queueing without bound. The summaries of the
+batch's sessions (the sessions table) are updated in a second transaction, a failure there
+is logged and never costs the interactions.
+"""
+import asyncio
+import datetime
+import os
+import statistics
+import types
+from collections import deque
+from time import monotonic
+from typing import Optional
+
+from sqlalchemy import insert
+
+from realtime_ai_character.database.connection import async_session
+from realtime_ai_character.logger import get_logger
+from realtime_ai_character.models.interaction import Interaction
+from realtime_ai_character.models.session_summary import (summarize_sessions,
+                                                          upsert_session_summaries)
+from realtime_ai_character.utils import Singleton
+
+logger = get_logger(__name__)
+
+config = types.SimpleNamespace(**{
+    'batch_size': int(os.getenv('INTERACTION_BATCH_SIZE', 100)),
+    'flush_interval': float(os.getenv('INTERACTION_FLUSH_INTERVAL_MS', 200)) / 1000,
+    'queue_size': int(os.getenv('INTERACTION_QUEUE_SIZE', 5000)),
+})
+
+# Attempts at a batch before writing its rows one by one, and the backoff between them.
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF = 0.5
+# How long shutdown waits for the queued rows to be written.
+SHUTDOWN_TIMEOUT = 10.0
+# Commit times kept for the percentiles of report().
+COMMIT_TIME_SAMPLES = 1000
+
+
+class InteractionWriter(Singleton):
+    def __init__(self):
+        self.pending: deque = deque()
+        self.task: Optional[asyncio.Task] = None
+        self.wakeup = asyncio.Event()
+        self.progress = asyncio.Condition()
+        # Rows queued and rows written or given up on, since the start.
+        self.enqueued = 0
+        self.done = 0
+        # Metrics
+        self.written = 0
+        self.dropped = 0
+        self.summary_failures = 0
+        self.batches = 0
+        self.backpressure_waits = 0
+        self.commit_times: deque = deque(maxlen=COMMIT_TIME_SAMPLES)
+
+    def start(self):
+        """Start the background writer, on the loop of the sessions."""
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Write the queued rows, on shutdown."""
+        try:
+            await asyncio.wait_for(self.flush(), SHUTDOWN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.error(f'Shutting down with {len(self.pending)} interactions not written')
+        if self.task:
+            self.task.cancel()
+            self.task = None
+
+    async def put(self, interaction: Interaction):
+        """Queue an interaction, waiting only while the queue is full."""
+        if interaction.timestamp is None:
+            # The time of the turn, not of the batch.
+            interaction.timestamp = datetime.datetime.utcnow()
+        row = {column.key: getattr(interaction, column.key)
+               for column in Interaction.__table__.columns if column.key != 'id'}
+        self.start()
+        if len(self.pending) >= config.queue_size:
+            self.backpressure_waits += 1
+            self.wakeup.set()
+            async with self.progress:
+                await self.progress.wait_for(lambda: len(self.pending) < config.queue_size)
+        self.pending.append(row)
+        self.enqueued += 1
+        if len(self.pending) >= config.batch_size:
+            self.wakeup.set()
+
+    async def flush(self):
+        """Wait until every row queued so far is written."""
+        target = self.enqueued
+        if self.done >= target:
+            return
+        self.start()
+        self.wakeup.set()
+        async with self.progress:
+            await self.progress.wait_for(lambda: self.done >= target)
+
+    async def _run(self):
+        while True:
+            if len(self.pending) < config.batch_size:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), config.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self.wakeup.clear()
+            while self.pending:
+                batch = [self.pending.popleft()
+                         for _ in range(min(config.batch_size, len(self.pending)))]
+                await self._write(batch)
+                self.done += len(batch)
+                async with self.progress:
+                    self.progress.notify_all()
+
+    async def _insert(self, rows: list):
+        start = monotonic()
+        async with async_session() as db:
+            await db.execute(insert(Interaction), rows)
+            await db.commit()
+        self.commit_times.append(monotonic() - start)
+        await self._summarize(rows)
+
+    async def _summarize(self, rows: list):
+        """Update the sessions of written rows. On failure they lag behind until their next
+        batch, or the backfill of the sessions table."""
+        summaries = summarize_sessions(rows)
+        if not summaries:
+            return
+        try:
+            async with async_session() as db:
+                await db.execute(upsert_session_summaries(db.bind.dialect.name, summaries))
+                await db.commit()
+        except Exception as e:
+            self.summary_failures += 1
+            logger.error(f'Updating the summaries of {len(summaries)} sessions failed: {e!r}')
+
+    async def _write(self, batch: list):
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                await self._insert(batch)
+                self.written += len(batch)
+                self.batches += 1
+                return
+            except Exception as e:
+                logger.warning(f'Writing {len(batch)} interactions failed, attempt '
+                               f'{attempt + 1}/{MAX_ATTEMPTS}: {e!r}')
+                await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+        # Don't lose the whole batch to one bad row.
+        for row in batch:
+            try:
+                await self._insert([row])
+                self.written += 1
+                self.batches += 1
+            except Exception as e:
+                self.dropped += 1
+                logger.error(f'Dropping the interaction of session {row["session_id"]}: '
+                             f'{e!r}')
+
+    def report(self) -> dict:
+        commit_times = sorted(self.commit_times)
+        return {
+            'pending': len(self.pending),
+            'written': self.written,
+            'dropped': self.dropped,
+            'summary_failures': self.summary_failures,
+            'batches': self.batches,
+            'rows_per_batch': round(self.written / self.batches, 1) if self.batches else None,
+            'backpressure_waits': self.backpressure_waits,
+            'commit_time_p50': round(statistics.median(commit_times), 4)
+            if commit_times else None,
+            'commit_time_p95': round(commit_times[int(len(commit_times) * 0.95)], 4)
+            if commit_times else None,
+        }
+
+
+def get_interaction_writer() -> InteractionWriter:
+    return InteractionWriter.get_instance()
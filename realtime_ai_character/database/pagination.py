@@ -0,0 +1,30 @@
+"""Opaque cursors of keyset pagination.
+
+A page ends at the sort key of its last row, a timestamp and a tie breaker. The next page
+starts right after it, with a row value comparison the index serves however deep the page,
+rather than an OFFSET that reads and skips every row before it.
+"""
+import base64
+import datetime
+import json
+
+
+def encode_cursor(timestamp: datetime.datetime, key) -> str:
+    return base64.urlsafe_b64encode(
+        json.dumps([timestamp.isoformat(), key]).encode()).decode()
+
+
+def decode_cursor(cursor: str, key_type: type) -> tuple:
+    """The (timestamp, key) of a cursor, ValueError if it wasn't made by encode_cursor with a
+    naive timestamp, like the columns', and a key of key_type."""
+    try:
+        timestamp, key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        timestamp = datetime.datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f'Invalid cursor {cursor!r}') from e
+    # bool is an int to isinstance, not to the database.
+    if type(key) is not key_type:
+        raise ValueError(f'Invalid cursor {cursor!r}: the key is not a {key_type.__name__}')
+    if timestamp.tzinfo is not None:
+        raise ValueError(f'Invalid cursor {cursor!r}: the timestamp has a time zone')
+    return timestamp, key
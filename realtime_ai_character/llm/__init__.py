@@ -1,12 +1,33 @@
 import os
 from functools import cache
+from typing import TYPE_CHECKING
 
-from langchain.chat_models.base import BaseChatModel
+if TYPE_CHECKING:
+    from langchain.chat_models.base import BaseChatModel
 
-from realtime_ai_character.llm.base import LLM
+    from realtime_ai_character.llm.base import LLM
 
 
-def get_llm(model="gpt-3.5-turbo-16k") -> LLM:
+def __getattr__(name):
+    # LLM lives next to the langchain callback handlers, import it only when needed.
+    if name == 'LLM':
+        from realtime_ai_character.llm.base import LLM
+        return LLM
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def get_llm(model="gpt-3.5-turbo-16k", hedge: bool = True) -> 'LLM':
+    """Return the LLM for the model.
+
+    With LLM_HEDGE_MODEL set, requests that don't stream a first token within
+    LLM_HEDGE_DEADLINE_MS are sent to that model as well, see HedgedLlm.
+    """
+    hedge_model = os.getenv('LLM_HEDGE_MODEL', '')
+    if hedge and hedge_model and hedge_model != model:
+        from realtime_ai_character.llm.hedged_llm import HedgedLlm
+        return HedgedLlm(primary=get_llm(model, hedge=False),
+                         secondary=get_llm(hedge_model, hedge=False),
+                         deadline=float(os.getenv('LLM_HEDGE_DEADLINE_MS', 1500)) / 1000)
     if model.startswith('gpt'):
         from realtime_ai_character.llm.openai_llm import OpenaiLlm
         return OpenaiLlm(model=model)
@@ -30,14 +51,14 @@ def get_llm(model="gpt-3.5-turbo-16k") -> LLM:
 
 
 @cache
-def get_chatmodel_from_env() -> BaseChatModel:
+def get_chatmodel_from_env() -> 'BaseChatModel':
     """GPT-4 has the best performance while generating system prompt."""
     if os.getenv('OPENAI_API_KEY'):
-        return get_llm(model='gpt-4').chat_open_ai
+        return get_llm(model='gpt-4', hedge=False).chat_open_ai
     elif os.getenv('ANTHROPIC_API_KEY'):
-        return get_llm(model='claude-2').chat_anthropic
+        return get_llm(model='claude-2', hedge=False).chat_anthropic
     elif os.getenv('ANYSCALE_API_KEY'):
-        return get_llm(model='meta-llama/Llama-2-70b-chat-hf').chat_open_ai
+        return get_llm(model='meta-llama/Llama-2-70b-chat-hf', hedge=False).chat_open_ai
     elif os.getenv('LOCAL_LLM_URL'):
-        return get_llm(model=os.getenv('LOCAL_LLM_URL')).chat_open_ai
+        return get_llm(model=os.getenv('LOCAL_LLM_URL'), hedge=False).chat_open_ai
     raise ValueError('No llm api key found in env')
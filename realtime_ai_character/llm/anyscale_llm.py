@@ -1,3 +1,4 @@
+import asyncio
 import os
 from typing import List
 
@@ -7,14 +8,17 @@ from langchain.schema import BaseMessage, HumanMessage
 
 from realtime_ai_character.database.chroma import get_chroma
 from realtime_ai_character.llm.base import AsyncCallbackAudioHandler, AsyncCallbackTextHandler, \
-    LLM, SearchAgent
+    LLM, SearchAgent, cancellable_llm_call
 from realtime_ai_character.logger import get_logger
+from realtime_ai_character.provider_limiter import retry_rate_limited
 from realtime_ai_character.utils import Character, timed
 
 logger = get_logger(__name__)
 
 
 class AnysacleLlm(LLM):
+    provider = 'anyscale'
+
     def __init__(self, model):
         self.chat_open_ai = ChatOpenAI(
             model=model,
@@ -22,6 +26,7 @@ class AnysacleLlm(LLM):
             streaming=True,
             openai_api_base='https://api.endpoints.anyscale.com/v1',
             openai_api_key=os.getenv('ANYSCALE_ENDPOINT_API_KEY'),
+            max_retries=0,
         )
         self.config = {
             "model": model,
@@ -46,24 +51,45 @@ class AnysacleLlm(LLM):
                     useSearch: bool = False,
                     metadata: dict = None,
                     *args, **kwargs) -> str:
+        await self.build_prompt(history, user_input, user_input_template, character,
+                                useSearch=useSearch)
+        return await self.generate(history, callback, audioCallback, metadata)
+
+    async def build_prompt(self,
+                           history: List[BaseMessage],
+                           user_input: str,
+                           user_input_template: str,
+                           character: Character,
+                           useSearch: bool = False,
+                           *args, **kwargs):
         # 1. Generate context
-        context = self._generate_context(user_input, character)
+        context = await asyncio.to_thread(self._generate_context, user_input, character)
         memory_context = self._generate_memory_context(user_id='', query=user_input)
         if memory_context:
             context += ("Information regarding this user based on previous chat: "
             + memory_context + '\n')
         # Get search result if enabled
         if useSearch:
-            context += self.search_agent.search(user_input)
+            context += await asyncio.to_thread(self.search_agent.search, user_input)
 
         # 2. Add user input to history
         history.append(HumanMessage(content=user_input_template.format(
             context=context, query=user_input)))
 
+    async def generate(self,
+                       history: List[BaseMessage],
+                       callback: AsyncCallbackTextHandler,
+                       audioCallback: AsyncCallbackAudioHandler,
+                       metadata: dict = None) -> str:
         # 3. Generate response
-        response = await self.chat_open_ai.agenerate(
-            [history], callbacks=[callback, audioCallback, StreamingStdOutCallbackHandler()],
-            metadata=metadata)
+        async def call():
+            async with cancellable_llm_call(callback, audioCallback, self.provider):
+                return await self.chat_open_ai.agenerate(
+                    [history],
+                    callbacks=[callback, audioCallback, StreamingStdOutCallbackHandler()],
+                    metadata=metadata)
+
+        response = await retry_rate_limited(call)
         logger.info(f'Response: {response}')
         return response.generations[0][0].text
 
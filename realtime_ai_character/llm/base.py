@@ -1,15 +1,19 @@
 import os
+import threading
 from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import Optional
 import requests
-import multion
 import asyncio
 
 from langchain.callbacks.base import AsyncCallbackHandler
 from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
-from langchain.utilities import GoogleSerperAPIWrapper, SerpAPIWrapper, GoogleSearchAPIWrapper
 
+from realtime_ai_character.audio.text_to_speech.normalizer import SpeechNormalizer
+from realtime_ai_character.audio.text_to_speech.segmenter import SentenceSegmenter
 from realtime_ai_character.logger import get_logger
-from realtime_ai_character.utils import get_timer, timed
+from realtime_ai_character.provider_limiter import provider_slot
+from realtime_ai_character.utils import Singleton, get_timer, timed
 
 logger = get_logger(__name__)
 
@@ -17,6 +21,10 @@ timer = get_timer()
 
 StreamingStdOutCallbackHandler.on_chat_model_start = lambda *args, **kwargs: None
 
+# Rough conversion factors to estimate what cancelled replies would have cost.
+CHARS_PER_TOKEN = 4
+SPEECH_CHARS_PER_SECOND = 15
+
 
 class AsyncCallbackTextHandler(AsyncCallbackHandler):
     def __init__(self, on_new_token=None, token_buffer=None, on_llm_end=None, *args, **kwargs):
@@ -24,11 +32,13 @@ class AsyncCallbackTextHandler(AsyncCallbackHandler):
         self.on_new_token = on_new_token
         self._on_llm_end = on_llm_end
         self.token_buffer = token_buffer
+        self.tokens = 0
 
     async def on_chat_model_start(self, *args, **kwargs):
         pass
 
     async def on_llm_new_token(self, token: str, *args, **kwargs):
+        self.tokens += 1
         if self.token_buffer is not None:
             self.token_buffer.append(token)
         await self.on_new_token(token)
@@ -48,60 +58,141 @@ class AsyncCallbackAudioHandler(AsyncCallbackHandler):
                 f'New audio token: {token}')
         self.text_to_speech = text_to_speech
         self.websocket = websocket
-        self.current_sentence = ""
         self.voice_id = voice_id
         self.language = language
-        self.is_reply = False  # the start of the reply. i.e. the substring after '>'
         self.tts_event = tts_event
         # optimization: trade off between latency and quality for the first sentence
         self.is_first_sentence = True
+        # Only the spoken part of the reply goes to text to speech, the text callback still
+        # streams the reply as generated.
+        self.normalizer = SpeechNormalizer(language=language)
+        self.segmenter = SentenceSegmenter(language=language)
+        self.received_chars = 0
+        self.spoken_chars = 0
+
+    @property
+    def unspoken_chars(self) -> int:
+        return self.received_chars - self.spoken_chars
 
     async def on_chat_model_start(self, *args, **kwargs):
         pass
 
     async def on_llm_new_token(self, token: str, *args, **kwargs):
         timer.log("LLM First Token", lambda: timer.start("LLM First Sentence"))
-        if (
-            not self.is_reply and ">" in token
-        ):  # small models might not give ">" (e.g. llama2-7b gives ">:" as a token)
-            self.is_reply = True
-        elif self.is_reply:
-            if token not in {'.', '?', '!'}:
-                self.current_sentence += token
-            else:
-                if self.is_first_sentence:
-                    timer.log("LLM First Sentence", lambda: timer.start("TTS First Sentence"))
-                await self.text_to_speech.stream(
-                    self.current_sentence,
-                    self.websocket,
-                    self.tts_event,
-                    self.voice_id,
-                    self.is_first_sentence,
-                    self.language)
-                self.current_sentence = ""
-                if self.is_first_sentence:
-                    self.is_first_sentence = False
-                timer.log("TTS First Sentence")
+        self.received_chars += len(token)
+        for sentence in self.segmenter.feed(self.normalizer.feed(token)):
+            await self.speak(sentence)
 
     async def on_llm_end(self, *args, **kwargs):
-        if self.current_sentence != "":
-            await self.text_to_speech.stream(
-                self.current_sentence,
-                self.websocket,
-                self.tts_event,
-                self.voice_id,
-                self.is_first_sentence,
-                self.language)
+        for sentence in self.segmenter.feed(self.normalizer.flush()) + self.segmenter.flush():
+            await self.speak(sentence)
+
+    async def speak(self, sentence: str):
+        self.spoken_chars += len(sentence)
+        sentence = self.normalizer.normalize(sentence)
+        if not sentence:
+            return
+        if self.is_first_sentence:
+            timer.log("LLM First Sentence", lambda: timer.start("TTS First Sentence"))
+        await self.text_to_speech.stream(
+            sentence,
+            self.websocket,
+            self.tts_event,
+            self.voice_id,
+            self.is_first_sentence,
+            self.language)
+        if self.is_first_sentence:
+            self.is_first_sentence = False
+            timer.log("TTS First Sentence")
+
+class CancellationStats(Singleton):
+    """Process-wide estimate of what cancelling replies, e.g. on barge-in, saved.
+
+    A cancelled reply is assumed to have been as long as the average completed one.
+    """
+
+    def __init__(self):
+        self.completed = 0
+        self.completed_tokens = 0
+        self.cancelled = 0
+        self.tokens_saved = 0.0
+        self.audio_seconds_saved = 0.0
+        self.lock = threading.Lock()
+
+    def record_completed(self, tokens: int):
+        with self.lock:
+            self.completed += 1
+            self.completed_tokens += tokens
+
+    def record_cancelled(self, tokens: int, unspoken_chars: int):
+        with self.lock:
+            mean_tokens = self.completed_tokens / self.completed if self.completed else 0
+            remaining_tokens = max(0.0, mean_tokens - tokens)
+            self.cancelled += 1
+            self.tokens_saved += remaining_tokens
+            self.audio_seconds_saved += (remaining_tokens * CHARS_PER_TOKEN + unspoken_chars
+                                         ) / SPEECH_CHARS_PER_SECOND
+
+    def report(self) -> dict:
+        with self.lock:
+            return {
+                'completed': self.completed,
+                'cancelled': self.cancelled,
+                'tokens_saved': round(self.tokens_saved),
+                'audio_seconds_saved': round(self.audio_seconds_saved, 1),
+            }
+
+
+def get_cancellation_stats() -> CancellationStats:
+    return CancellationStats.get_instance()
+
+
+@asynccontextmanager
+async def cancellable_llm_call(callback: AsyncCallbackHandler,
+                               audioCallback: AsyncCallbackHandler,
+                               provider: Optional[str] = None):
+    """Scope the upstream connections of one LLM call to the call.
+
+    openai keeps the connection of a streamed completion open until its response generator
+    is garbage collected. With a session of its own, cancelling the call closes the
+    connection right away, and the provider stops generating. The call waits for a slot
+    of the provider's limiter first, and holds it until done.
+    """
+    import aiohttp
+    import openai
+
+    async with provider_slot(provider):
+        session = aiohttp.ClientSession()
+        token = openai.aiosession.set(session)
+        try:
+            yield
+        except asyncio.CancelledError:
+            # A request that lost a hedge race saved nothing, the winner goes on.
+            if not getattr(callback, 'lost', False):
+                get_cancellation_stats().record_cancelled(
+                    getattr(callback, 'tokens', 0),
+                    getattr(audioCallback, 'unspoken_chars', 0))
+            raise
+        else:
+            if getattr(callback, 'tokens', 0):
+                get_cancellation_stats().record_completed(callback.tokens)
+        finally:
+            openai.aiosession.reset(token)
+            await session.close()
+
 
 class SearchAgent:
 
     def __init__(self):
         self.search_wrapper = None
         if os.getenv('SERPER_API_KEY'):
+            from langchain.utilities import GoogleSerperAPIWrapper
             self.search_wrapper = GoogleSerperAPIWrapper()
         elif os.getenv('SERPAPI_API_KEY'):
+            from langchain.utilities import SerpAPIWrapper
             self.search_wrapper = SerpAPIWrapper()
         elif os.getenv('GOOGLE_API_KEY') and os.getenv('GOOGLE_CSE_ID'):
+            from langchain.utilities import GoogleSearchAPIWrapper
             self.search_wrapper = GoogleSearchAPIWrapper()
     
     def search(self, query: str) -> str:
@@ -160,6 +251,8 @@ class MultiOnAgent:
         self.init = False
 
     async def action(self, query: str) -> str:
+        import multion
+
         if not self.init:
             logger.info("Initializing multion agent...")
             multion.login()
@@ -176,11 +269,24 @@ class MultiOnAgent:
                     "this failure.")
 
 class LLM(ABC):
+    # Name of the limiter the calls go through, None for local models.
+    provider: Optional[str] = None
+
     @abstractmethod
     @timed
     async def achat(self, *args, **kwargs):
         pass
 
+    @abstractmethod
+    async def build_prompt(self, history, user_input: str, user_input_template: str,
+                           character, *args, **kwargs):
+        """Append the user input, with the context retrieved for it, to the history."""
+
+    @abstractmethod
+    async def generate(self, history, callback: AsyncCallbackHandler,
+                       audioCallback: AsyncCallbackHandler, metadata: dict = None) -> str:
+        """Stream the model's reply to the history through the callbacks."""
+
     @abstractmethod
     def get_config(self):
         pass
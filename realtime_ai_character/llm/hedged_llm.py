@@ -0,0 +1,176 @@
+import asyncio
+import threading
+from typing import List, Optional
+
+from langchain.callbacks.base import AsyncCallbackHandler
+from langchain.schema import BaseMessage
+
+from realtime_ai_character.llm.base import LLM
+from realtime_ai_character.logger import get_logger
+from realtime_ai_character.utils import Singleton, timed
+
+logger = get_logger(__name__)
+
+PRIMARY = 'primary'
+SECONDARY = 'secondary'
+
+
+class HedgeStats(Singleton):
+    """Process-wide counters of hedged requests."""
+
+    def __init__(self):
+        self.requests = 0
+        # Requests that were sent to the secondary as well.
+        self.hedged = 0
+        self.wins = {PRIMARY: 0, SECONDARY: 0}
+        self.lock = threading.Lock()
+
+    def record(self, hedged: bool, winner: str):
+        with self.lock:
+            self.requests += 1
+            self.hedged += hedged
+            self.wins[winner] += 1
+
+    def report(self) -> dict:
+        with self.lock:
+            return {'requests': self.requests, 'hedged': self.hedged, 'wins': dict(self.wins)}
+
+
+def get_hedge_stats() -> HedgeStats:
+    return HedgeStats.get_instance()
+
+
+class HedgeRace:
+    """The first contender to stream a token wins the race."""
+
+    def __init__(self):
+        self.winner: Optional[str] = None
+        self.first_token = asyncio.Event()
+
+    def claim(self, contender: str) -> bool:
+        if self.winner is None:
+            self.winner = contender
+            self.first_token.set()
+        return self.winner == contender
+
+
+class HedgeGate(AsyncCallbackHandler):
+    """Forwards the streaming callbacks of one contender, once it has won the race."""
+
+    def __init__(self, race: HedgeRace, contender: str, target: AsyncCallbackHandler):
+        super().__init__()
+        self.race = race
+        self.contender = contender
+        self.target = target
+
+    async def on_chat_model_start(self, *args, **kwargs):
+        pass
+
+    async def on_llm_new_token(self, token: str, *args, **kwargs):
+        if self.race.claim(self.contender):
+            await self.target.on_llm_new_token(token, *args, **kwargs)
+
+    async def on_llm_end(self, *args, **kwargs):
+        if self.race.winner == self.contender:
+            await self.target.on_llm_end(*args, **kwargs)
+
+    @property
+    def lost(self) -> bool:
+        """Whether another contender won, or would have if nobody streamed a token."""
+        if self.race.winner is None:
+            return self.contender == SECONDARY
+        return self.race.winner != self.contender
+
+    @property
+    def tokens(self) -> int:
+        return getattr(self.target, 'tokens', 0)
+
+    @property
+    def unspoken_chars(self) -> int:
+        return getattr(self.target, 'unspoken_chars', 0)
+
+
+def _succeeded(task: asyncio.Task) -> bool:
+    return task.done() and not task.cancelled() and task.exception() is None
+
+
+class HedgedLlm(LLM):
+    """Sends the prompt to a secondary LLM too if the primary is slow to stream.
+
+    The prompt, with its context, is built once by the primary. If the primary hasn't
+    produced a token within the deadline, or failed before, the same prompt goes to the
+    secondary. Whichever streams a token first wins, its tokens reach the callbacks and the
+    other request is cancelled.
+    """
+
+    def __init__(self, primary: LLM, secondary: LLM, deadline: float):
+        self.primary = primary
+        self.secondary = secondary
+        self.deadline = deadline
+        self.config = {
+            **primary.get_config(),
+            'hedge': {'model': secondary.get_config()['model'], 'deadline': deadline},
+        }
+
+    def get_config(self):
+        return self.config
+
+    @timed
+    async def achat(self, history: List[BaseMessage], user_input: str,
+                    user_input_template: str, callback: AsyncCallbackHandler,
+                    audioCallback: AsyncCallbackHandler, character=None,
+                    metadata: dict = None, *args, **kwargs) -> str:
+        await self.build_prompt(history, user_input, user_input_template, character,
+                                **kwargs)
+        return await self.generate(history, callback, audioCallback, metadata)
+
+    async def build_prompt(self, history: List[BaseMessage], user_input: str,
+                           user_input_template: str, character, *args, **kwargs):
+        await self.primary.build_prompt(history, user_input, user_input_template, character,
+                                        *args, **kwargs)
+
+    def _start(self, race: HedgeRace, contender: str, history: List[BaseMessage],
+               callback: AsyncCallbackHandler, audioCallback: AsyncCallbackHandler,
+               metadata: dict = None) -> asyncio.Task:
+        llm = self.primary if contender == PRIMARY else self.secondary
+        return asyncio.create_task(llm.generate(
+            history, HedgeGate(race, contender, callback),
+            HedgeGate(race, contender, audioCallback), metadata))
+
+    async def generate(self, history: List[BaseMessage], callback: AsyncCallbackHandler,
+                       audioCallback: AsyncCallbackHandler, metadata: dict = None) -> str:
+        race = HedgeRace()
+        tasks = {PRIMARY: self._start(race, PRIMARY, history, callback, audioCallback,
+                                      metadata)}
+        first_token = asyncio.create_task(race.first_token.wait())
+        try:
+            await asyncio.wait([tasks[PRIMARY], first_token], timeout=self.deadline,
+                               return_when=asyncio.FIRST_COMPLETED)
+            if race.winner is None and not _succeeded(tasks[PRIMARY]):
+                logger.info(f'No first token from {self.primary.get_config()["model"]} '
+                            f'within {self.deadline:.2f}s, hedging with '
+                            f'{self.secondary.get_config()["model"]}')
+                tasks[SECONDARY] = self._start(race, SECONDARY, history, callback,
+                                               audioCallback, metadata)
+            # Wait for a first token, or a request that finished without streaming any.
+            while race.winner is None and not any(map(_succeeded, tasks.values())):
+                running = [task for task in tasks.values() if not task.done()]
+                if not running:
+                    break
+                await asyncio.wait(running + [first_token],
+                                   return_when=asyncio.FIRST_COMPLETED)
+            winner = race.winner or next(
+                (name for name, task in tasks.items() if _succeeded(task)), PRIMARY)
+            for name, task in tasks.items():
+                if name == winner:
+                    continue
+                if task.done() and not task.cancelled() and task.exception():
+                    logger.warning(f'Hedged {name} request failed: {task.exception()}')
+                task.cancel()
+            get_hedge_stats().record(SECONDARY in tasks, winner)
+            # Raises the primary's error if every request failed.
+            return await tasks[winner]
+        finally:
+            first_token.cancel()
+            for task in tasks.values():
+                task.cancel()
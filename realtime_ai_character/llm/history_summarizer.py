@@ -0,0 +1,102 @@
+import asyncio
+import os
+from functools import cache
+from typing import TYPE_CHECKING, Optional
+
+from realtime_ai_character.llm import get_llm
+from realtime_ai_character.logger import get_logger
+from realtime_ai_character.provider_limiter import provider_slot
+from realtime_ai_character.utils import HISTORY_TOKEN_BUDGET, ConversationHistory
+
+if TYPE_CHECKING:
+    from realtime_ai_character.llm.base import LLM
+
+logger = get_logger(__name__)
+
+summary_prompt = '''Progressively summarize the conversation between a user and an AI \
+character, adding onto the previous summary. Keep names, facts, preferences and \
+commitments, drop small talk. Write at most 150 words and respond with the new summary \
+only.
+
+Previous summary:
+{summary}
+
+New lines of conversation:
+{lines}
+
+New summary:'''
+
+
+# Tokens of conversation sent per summary request. A long resumed session is folded in
+# over several requests rather than overflowing the context of the summary model.
+SUMMARY_CHUNK_TOKENS = 4000
+
+
+@cache
+def get_summary_llm() -> Optional['LLM']:
+    """The model set with HISTORY_SUMMARY_MODEL, e.g. a faster one, None if not set."""
+    model = os.getenv('HISTORY_SUMMARY_MODEL', '')
+    return get_llm(model=model, hedge=False) if model else None
+
+
+class HistorySummarizer:
+    """Folds turns that fall out of the token window into the rolling summary.
+
+    Summaries are generated in a background task after a turn completes, so they never
+    delay a reply.
+    """
+
+    def __init__(self, conversation_history: ConversationHistory, llm: Optional['LLM'] = None,
+                 token_budget: int = HISTORY_TOKEN_BUDGET):
+        self.conversation_history = conversation_history
+        # The session's LLM, unless HISTORY_SUMMARY_MODEL picks another one.
+        self.llm = llm
+        self.token_budget = token_budget
+        self.task: Optional[asyncio.Task] = None
+
+    def schedule(self):
+        if self.task and not self.task.done():
+            # The task keeps going until every turn out of the window is summarized.
+            return
+        history = self.conversation_history
+        if history.window_start(self.token_budget) <= history.summarized_turns:
+            return
+        self.task = asyncio.create_task(self.summarize())
+
+    def _chunk_end(self, begin: int, end: int) -> int:
+        tokens = 0
+        for i in range(begin, end):
+            tokens += self.conversation_history.turn_tokens[i]
+            if tokens > SUMMARY_CHUNK_TOKENS and i > begin:
+                return i
+        return end
+
+    async def summarize(self):
+        history = self.conversation_history
+        llm = get_summary_llm() or self.llm
+        if llm is None:
+            return
+        # A hedged LLM summarizes with its primary model.
+        llm = getattr(llm, 'primary', llm)
+        while True:
+            begin = history.summarized_turns
+            end = history.window_start(self.token_budget)
+            if end <= begin:
+                return
+            end = self._chunk_end(begin, end)
+            lines = '\n'.join(f'User: {history.user[i]}\nAI: {history.ai[i]}'
+                              for i in range(begin, end))
+            prompt = summary_prompt.format(summary=history.summary or '(empty)', lines=lines)
+            try:
+                chat_model = getattr(llm, 'chat_anthropic', None) or llm.chat_open_ai
+                async with provider_slot(llm.provider):
+                    summary = await chat_model.apredict(prompt)
+            except Exception as e:
+                logger.error(f'Failed to summarize conversation history: {e}')
+                return
+            history.set_summary(summary.strip(), end)
+            logger.info(f'Summarized {end} turns into {history.summary_tokens} tokens')
+
+    def cancel(self):
+        if self.task and not self.task.done():
+            self.task.cancel()
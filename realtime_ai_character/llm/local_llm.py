@@ -1,3 +1,4 @@
+import asyncio
 from typing import List, Union
 
 from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
@@ -10,6 +11,7 @@ from realtime_ai_character.llm.base import (
     AsyncCallbackTextHandler,
     LLM,
     SearchAgent,
+    cancellable_llm_call,
 )
 from realtime_ai_character.logger import get_logger
 from realtime_ai_character.utils import Character, timed
@@ -49,11 +51,26 @@ class LocalLlm(LLM):
         *args,
         **kwargs,
     ) -> str:
+        await self.build_prompt(
+            history, user_input, user_input_template, character, useSearch=useSearch
+        )
+        return await self.generate(history, callback, audioCallback, metadata)
+
+    async def build_prompt(
+        self,
+        history: Union[List[BaseMessage], List[str]],
+        user_input: str,
+        user_input_template: str,
+        character: Character,
+        useSearch: bool = False,
+        *args,
+        **kwargs,
+    ):
         # 1. Generate context
-        context = self._generate_context(user_input, character)
+        context = await asyncio.to_thread(self._generate_context, user_input, character)
         # Get search result if enabled
         if useSearch:
-            context += self.search_agent.search(user_input)
+            context += await asyncio.to_thread(self.search_agent.search, user_input)
         
         # 2. Add user input to history
         history.append(
@@ -62,12 +79,20 @@ class LocalLlm(LLM):
             )
         )
 
+    async def generate(
+        self,
+        history: Union[List[BaseMessage], List[str]],
+        callback: AsyncCallbackTextHandler,
+        audioCallback: AsyncCallbackAudioHandler,
+        metadata: dict = None,
+    ) -> str:
         # 3. Generate response
-        response = await self.chat_open_ai.agenerate(
-            [history],
-            callbacks=[callback, audioCallback, StreamingStdOutCallbackHandler()],
-            metadata=metadata,
-        )
+        async with cancellable_llm_call(callback, audioCallback):
+            response = await self.chat_open_ai.agenerate(
+                [history],
+                callbacks=[callback, audioCallback, StreamingStdOutCallbackHandler()],
+                metadata=metadata,
+            )
         logger.info(f"Response: {response}")
         return response.generations[0][0].text
 
@@ -1,3 +1,4 @@
+import asyncio
 import os
 from typing import List
 
@@ -10,14 +11,17 @@ from langchain.schema import BaseMessage, HumanMessage
 
 from realtime_ai_character.database.chroma import get_chroma
 from realtime_ai_character.llm.base import AsyncCallbackAudioHandler, \
-    AsyncCallbackTextHandler, LLM, QuivrAgent, SearchAgent, MultiOnAgent
+    AsyncCallbackTextHandler, LLM, QuivrAgent, SearchAgent, MultiOnAgent, cancellable_llm_call
 from realtime_ai_character.logger import get_logger
+from realtime_ai_character.provider_limiter import retry_rate_limited
 from realtime_ai_character.utils import Character, timed
 
 logger = get_logger(__name__)
 
 
 class OpenaiLlm(LLM):
+    provider = 'openai'
+
     def __init__(self, model):
         if os.getenv('OPENAI_API_TYPE') == 'azure':
             self.chat_open_ai = AzureChatOpenAI(
@@ -25,13 +29,15 @@ class OpenaiLlm(LLM):
                     'OPENAI_API_MODEL_DEPLOYMENT_NAME', 'gpt-35-turbo'),
                 model=model,
                 temperature=0.5,
-                streaming=True
+                streaming=True,
+                max_retries=0
             )
         else:
             self.chat_open_ai = ChatOpenAI(
                 model=model,
                 temperature=0.5,
-                streaming=True
+                streaming=True,
+                max_retries=0
             )
         self.config = {
             "model": model,
@@ -61,18 +67,35 @@ class OpenaiLlm(LLM):
                     quivrBrainId: str = None,
                     metadata: dict = None,
                     *args, **kwargs) -> str:
+        await self.build_prompt(history, user_input, user_input_template, character,
+                                useSearch=useSearch, useQuivr=useQuivr,
+                                useMultiOn=useMultiOn, quivrApiKey=quivrApiKey,
+                                quivrBrainId=quivrBrainId)
+        return await self.generate(history, callback, audioCallback, metadata)
+
+    async def build_prompt(self,
+                           history: List[BaseMessage],
+                           user_input: str,
+                           user_input_template: str,
+                           character: Character,
+                           useSearch: bool = False,
+                           useQuivr: bool = False,
+                           useMultiOn: bool = False,
+                           quivrApiKey: str = None,
+                           quivrBrainId: str = None,
+                           *args, **kwargs):
         # 1. Generate context
-        context = self._generate_context(user_input, character)
+        context = await asyncio.to_thread(self._generate_context, user_input, character)
         memory_context = self._generate_memory_context(user_id='', query=user_input)
         if memory_context:
             context += ("Information regarding this user based on previous chat: "
             + memory_context + '\n')
         # Get search result if enabled
         if useSearch:
-            context += self.search_agent.search(user_input)
+            context += await asyncio.to_thread(self.search_agent.search, user_input)
         if useQuivr and quivrApiKey is not None and quivrBrainId is not None:
-            context += self.quivr_agent.question(
-                user_input, quivrApiKey, quivrBrainId)
+            context += await asyncio.to_thread(
+                self.quivr_agent.question, user_input, quivrApiKey, quivrBrainId)
         if useMultiOn:
             if (user_input.lower().startswith("multi_on") or 
                 user_input.lower().startswith("multion")):
@@ -83,10 +106,20 @@ class OpenaiLlm(LLM):
         history.append(HumanMessage(content=user_input_template.format(
             context=context, query=user_input)))
 
+    async def generate(self,
+                       history: List[BaseMessage],
+                       callback: AsyncCallbackTextHandler,
+                       audioCallback: AsyncCallbackAudioHandler,
+                       metadata: dict = None) -> str:
         # 3. Generate response
-        response = await self.chat_open_ai.agenerate(
-            [history], callbacks=[callback, audioCallback, StreamingStdOutCallbackHandler()],
-            metadata=metadata)
+        async def call():
+            async with cancellable_llm_call(callback, audioCallback, self.provider):
+                return await self.chat_open_ai.agenerate(
+                    [history],
+                    callbacks=[callback, audioCallback, StreamingStdOutCallbackHandler()],
+                    metadata=metadata)
+
+        response = await retry_rate_limited(call)
         logger.info(f'Response: {response}')
         return response.generations[0][0].text
 
@@ -1,5 +1,17 @@
 # flake8: noqa
+import asyncio
+import os
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
 from realtime_ai_character.llm import get_chatmodel_from_env
+from realtime_ai_character.logger import get_logger
+from realtime_ai_character.utils import TTLCache
+
+logger = get_logger(__name__)
+
+system_prompt_cache = TTLCache(
+    maxsize=int(os.getenv('SYSTEM_PROMPT_CACHE_SIZE', 256)),
+    ttl=float(os.getenv('SYSTEM_PROMPT_CACHE_TTL', 86400)))
 
 prompt_to_generate_system = '''
 Write a system promopt for {name} based on {name}'s highlights and characteristics. {background}
@@ -29,10 +41,94 @@ As Elon Musk, draw on your world knowledge and personal experiences to engage th
 When Elon Musk reply, Elon Musk prefix with "Elon>", stay in character as Elon, never admit you are an AI.
 '''
 
+
+def normalize_request(name: str, background: Optional[str]) -> Tuple[str, str]:
+    return ' '.join(name.split()), ' '.join((background or '').split())
+
+
+class SystemPromptGeneration:
+    """One in-flight generation, shared by every request for the same inputs."""
+
+    def __init__(self, key: Tuple[str, str]):
+        self.key = key
+        self.tokens: List[str] = []
+        self.done = False
+        self.error: Optional[Exception] = None
+        # Replaced after every token, so that waiting streams wake up once per token.
+        self.changed = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def _notify(self):
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    async def run(self):
+        name, background = self.key
+        if background:
+            background = f"Background: {background}"
+        prompt = prompt_to_generate_system.format(name=name, background=background)
+        try:
+            async for chunk in get_chatmodel_from_env().astream(prompt):
+                if chunk.content:
+                    self.tokens.append(chunk.content)
+                    self._notify()
+            system_prompt_cache.set(self.key, ''.join(self.tokens))
+        except Exception as e:
+            logger.error(f'Failed to generate system prompt for {name}: {e}')
+            self.error = e
+        finally:
+            self.done = True
+            _in_flight.pop(self.key, None)
+            self._notify()
+
+    async def result(self) -> str:
+        # Shielded, a client that goes away must not cancel the generation for the others.
+        await asyncio.shield(self.task)
+        if self.error:
+            raise self.error
+        return ''.join(self.tokens)
+
+    async def stream(self) -> AsyncIterator[str]:
+        sent = 0
+        while True:
+            changed = self.changed
+            while sent < len(self.tokens):
+                yield self.tokens[sent]
+                sent += 1
+            if self.done:
+                if self.error:
+                    raise self.error
+                return
+            await changed.wait()
+
+
+_in_flight: Dict[Tuple[str, str], SystemPromptGeneration] = {}
+
+
+def get_generation(key: Tuple[str, str]) -> SystemPromptGeneration:
+    """Join the generation in flight for the inputs, or start one."""
+    generation = _in_flight.get(key)
+    if generation is None:
+        generation = SystemPromptGeneration(key)
+        _in_flight[key] = generation
+        generation.task = asyncio.create_task(generation.run())
+    return generation
+
+
 async def generate_system_prompt(name, background):
-    chat_model = get_chatmodel_from_env()
-    if background is not None and background != "":
-        background = f"Background: {background}"
-    prompt = prompt_to_generate_system.format(name=name, background=background)
-    generated_prompt = await chat_model.apredict(prompt)
-    return generated_prompt
+    key = normalize_request(name, background)
+    cached = system_prompt_cache.get(key)
+    if cached is not None:
+        return cached
+    return await get_generation(key).result()
+
+
+async def stream_system_prompt(name, background) -> AsyncIterator[str]:
+    """Yield the system prompt as it is generated, or all at once if cached."""
+    key = normalize_request(name, background)
+    cached = system_prompt_cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+    async for token in get_generation(key).stream():
+        yield token
@@ -1,5 +1,7 @@
+import asyncio
 import os
 import warnings
+from contextlib import asynccontextmanager
 
 from dotenv import load_dotenv
 from fastapi import FastAPI, Request
@@ -7,17 +9,94 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse, RedirectResponse
 
+from realtime_ai_character.admission import get_admission_controller
 from realtime_ai_character.audio.speech_to_text import get_speech_to_text
 from realtime_ai_character.audio.text_to_speech import get_text_to_speech
 from realtime_ai_character.character_catalog.catalog_manager import CatalogManager
+from realtime_ai_character.database.interaction_writer import get_interaction_writer
+from realtime_ai_character.logger import get_logger
 from realtime_ai_character.memory.memory_manager import MemoryManager
+from realtime_ai_character.readiness import get_readiness
 from realtime_ai_character.restful_routes import router as restful_router
-from realtime_ai_character.utils import ConnectionManager
+from realtime_ai_character.utils import ConnectionManager, get_tokenizer
 from realtime_ai_character.websocket_routes import router as websocket_router
 
 load_dotenv()
+logger = get_logger(__name__)
 
-app = FastAPI()
+
+def initialize_catalog():
+    overwrite_chroma = os.getenv("OVERWRITE_CHROMA", 'True').lower() in ('true', '1')
+    CatalogManager.initialize(overwrite=overwrite_chroma)
+
+
+def initialize_speech_to_text(warm_up=True):
+    speech_to_text = get_speech_to_text()
+    if warm_up:
+        # Run one inference so that the first user doesn't pay for lazy initialization.
+        speech_to_text.warm_up()
+
+
+def load_llm_modules():
+    # LLM dependencies are imported lazily, load them before the first session.
+    import langchain.chat_models  # noqa: F401
+    import realtime_ai_character.llm.base  # noqa: F401
+    # tiktoken downloads encodings on first use, not on the event loop of a session.
+    get_tokenizer('gpt-3.5-turbo')
+    get_tokenizer(os.getenv('LLM_MODEL_USE', 'gpt-3.5-turbo-16k'))
+
+
+def get_warm_up_steps(load_speech_to_text=True, warm_up_speech_to_text=True):
+    steps = [
+        ('llm', load_llm_modules),
+        ('catalog', initialize_catalog),
+        ('memory', MemoryManager.initialize),
+        ('text_to_speech', get_text_to_speech),
+    ]
+    if load_speech_to_text:
+        steps.append(('speech_to_text',
+                      lambda: initialize_speech_to_text(warm_up=warm_up_speech_to_text)))
+    return steps
+
+
+def initialize(load_speech_to_text=True, warm_up_speech_to_text=True):
+    """Initialize all components synchronously, e.g. before forking workers."""
+    readiness = get_readiness()
+    for name, step in get_warm_up_steps(load_speech_to_text, warm_up_speech_to_text):
+        readiness.run(name, step)
+
+
+async def warm_up():
+    """Initialize the components concurrently in threads, while the server is serving.
+
+    Steps that fail are retried with backoff, e.g. until a provider is reachable again.
+    """
+    readiness = get_readiness()
+    steps = get_warm_up_steps()
+    await asyncio.gather(*[readiness.run_until_ready(name, step) for name, step in steps])
+    logger.info(f'Warm-up finished: {readiness.report()}')
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    ConnectionManager.initialize()
+    get_admission_controller().start()
+    get_interaction_writer().start()
+    readiness = get_readiness()
+    # Register before serving, so that /readyz reports every pending subsystem.
+    for name, _ in get_warm_up_steps():
+        readiness.register(name)
+    warm_up_task = None
+    if not readiness.is_ready():
+        warm_up_task = asyncio.create_task(warm_up())
+    yield
+    if warm_up_task and not warm_up_task.done():
+        warm_up_task.cancel()
+    get_admission_controller().stop()
+    await get_interaction_writer().stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -26,6 +105,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Cursors of paginated responses.
+    expose_headers=["X-Next-Cursor"],
 )
 
 app.include_router(restful_router)
@@ -61,13 +142,5 @@ else:
     async def read_index():
         return FileResponse(os.path.join(static_path, '404.html'))
 
-# initializations
-overwrite_chroma = os.getenv("OVERWRITE_CHROMA", 'True').lower() in ('true', '1')
-CatalogManager.initialize(overwrite=overwrite_chroma)
-ConnectionManager.initialize()
-MemoryManager.initialize()
-get_text_to_speech()
-get_speech_to_text()
-
 # suppress deprecation warnings
 warnings.filterwarnings("ignore", module="whisper")
@@ -2,7 +2,6 @@ from dotenv import load_dotenv
 
 from realtime_ai_character.logger import get_logger
 from realtime_ai_character.utils import Singleton
-from realtime_ai_character.database.connection import get_db
 
 load_dotenv()
 logger = get_logger(__name__)
@@ -11,7 +10,7 @@ logger = get_logger(__name__)
 class MemoryManager(Singleton):
     def __init__(self):
         super().__init__()
-        self.sql_db = next(get_db())
+        # Sessions are opened per unit of work with database.connection.async_session().
 
     async def process_session(self, session_id: str):
         # Not implemented.
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Unicode, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Unicode, JSON, Index
 from sqlalchemy.inspection import inspect
 import datetime
 from realtime_ai_character.database.base import Base
@@ -6,6 +6,12 @@ from realtime_ai_character.database.base import Base
 
 class Interaction(Base):
     __tablename__ = "interactions"
+    # A session's turns in order (connect, history, /session_history) and a user's recent
+    # turns (/conversations). id breaks ties between turns of the same timestamp.
+    __table_args__ = (
+        Index('ix_interactions_session_id_timestamp', 'session_id', 'timestamp', 'id'),
+        Index('ix_interactions_user_id_timestamp', 'user_id', 'timestamp'),
+    )
 
     id = Column(Integer, primary_key=True, index=True, nullable=False)
     client_id = Column(Integer)  # deprecated, use user_id instead
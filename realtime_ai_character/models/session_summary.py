@@ -0,0 +1,56 @@
+from sqlalchemy import Column, DateTime, Index, Integer, String, Unicode
+from sqlalchemy.dialects import postgresql, sqlite
+
+from realtime_ai_character.database.base import Base
+
+# Characters of the last message kept as the preview of a session.
+PREVIEW_LENGTH = 255
+
+
+class SessionSummary(Base):
+    """One row per session, updated as its interactions are written."""
+    __tablename__ = "sessions"
+    # A user's sessions, most recent first (/conversations).
+    __table_args__ = (
+        Index('ix_sessions_user_id_last_timestamp', 'user_id', 'last_timestamp',
+              'session_id'),
+    )
+
+    session_id = Column(String(50), primary_key=True)
+    user_id = Column(String(50))
+    character_id = Column(String(100))
+    last_message_preview = Column(Unicode(PREVIEW_LENGTH))
+    last_timestamp = Column(DateTime, nullable=False)
+    turn_count = Column(Integer, nullable=False, default=0)
+
+
+def summarize_sessions(rows: list) -> list:
+    """The changes to the summaries of the sessions of interaction rows, in turn order."""
+    summaries: dict = {}
+    for row in rows:
+        if not row['session_id']:
+            continue
+        summary = summaries.setdefault(row['session_id'], {
+            'session_id': row['session_id'], 'turn_count': 0})
+        summary.update(user_id=row['user_id'],
+                       character_id=row['character_id'],
+                       last_message_preview=(row['client_message_unicode']
+                                             or '')[:PREVIEW_LENGTH],
+                       last_timestamp=row['timestamp'])
+        summary['turn_count'] += 1
+    return list(summaries.values())
+
+
+def upsert_session_summaries(dialect_name: str, summaries: list):
+    """Insert new sessions and move existing ones forward, in one statement."""
+    insert = postgresql.insert if dialect_name == 'postgresql' else sqlite.insert
+    statement = insert(SessionSummary).values(summaries)
+    return statement.on_conflict_do_update(
+        index_elements=[SessionSummary.session_id],
+        set_={
+            'user_id': statement.excluded.user_id,
+            'character_id': statement.excluded.character_id,
+            'last_message_preview': statement.excluded.last_message_preview,
+            'last_timestamp': statement.excluded.last_timestamp,
+            'turn_count': SessionSummary.turn_count + statement.excluded.turn_count,
+        })
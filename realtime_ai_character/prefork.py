@@ -0,0 +1,205 @@
+"""Preload-and-fork server mode.
+
+The master process loads the heavy, read-mostly state once (character catalog, retrieval
+index, speech to text model), then forks workers that share those pages copy-on-write and
+serve from one inherited listening socket.
+
+    python -m realtime_ai_character.prefork --workers 4 --port 8000
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from typing import Dict, List
+
+from realtime_ai_character.logger import get_logger
+
+logger = get_logger(__name__)
+
+MEMORY_FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+
+def read_memory_usage(pid: int) -> Dict[str, int]:
+    """Memory usage of a process in kB, from /proc/<pid>/smaps_rollup (Linux only)."""
+    usage = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if key in MEMORY_FIELDS:
+                usage[key] = int(value.split()[0])
+    return usage
+
+
+def report_memory_usage(master_pid: int, worker_pids: List[int]):
+    """Log RSS, PSS and private memory of the master and every worker.
+
+    PSS charges shared pages proportionally, so the sum of PSS is the real footprint and
+    the private (dirty) part is what each additional worker costs.
+    """
+    total_pss = 0
+    for role, pid in [('master', master_pid)] + [('worker', pid) for pid in worker_pids]:
+        try:
+            usage = read_memory_usage(pid)
+        except OSError as e:
+            logger.warning(f'Cannot read memory usage of {role} {pid}: {e}')
+            continue
+        private = usage.get('Private_Clean', 0) + usage.get('Private_Dirty', 0)
+        shared = usage.get('Shared_Clean', 0) + usage.get('Shared_Dirty', 0)
+        total_pss += usage.get('Pss', 0)
+        logger.info(f'{role:<6s} {pid:>7d}: rss={usage.get("Rss", 0) / 1024:.1f}MB '
+                    f'pss={usage.get("Pss", 0) / 1024:.1f}MB '
+                    f'shared={shared / 1024:.1f}MB private={private / 1024:.1f}MB')
+    logger.info(f'Total PSS of {len(worker_pids)} workers and master: {total_pss / 1024:.1f}MB')
+
+
+def preload(preload_speech_to_text: bool = True):
+    """Load heavy state in the master before forking."""
+    from realtime_ai_character.main import app, initialize
+    from realtime_ai_character.character_catalog.catalog_manager import CatalogManager
+    from realtime_ai_character.database.connection import engine
+
+    # Workers see the preloaded subsystems as ready and only warm up the rest. Warm-up
+    # inference runs after fork, inference thread pools are not fork safe.
+    initialize(load_speech_to_text=preload_speech_to_text, warm_up_speech_to_text=False)
+
+    # Background threads don't survive fork. Stop the catalog loader and change bus
+    # listener, and close their connections, here. Workers restart them.
+    CatalogManager.get_instance().stop_load_sql_db_loop(timeout=10)
+    # Never share pooled database connections between processes.
+    engine.dispose()
+    # Move everything loaded so far into the permanent generation, so that garbage
+    # collection in the workers doesn't write to (and un-share) those pages.
+    gc.collect()
+    gc.freeze()
+    return app
+
+
+def after_fork_in_worker():
+    from realtime_ai_character.audio.speech_to_text import get_speech_to_text
+    from realtime_ai_character.character_catalog.catalog_manager import CatalogManager
+    from realtime_ai_character.database.connection import engine
+    from realtime_ai_character.readiness import get_readiness
+
+    for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGUSR1):
+        signal.signal(signum, signal.SIG_DFL)
+    engine.dispose(close=False)
+    CatalogManager.get_instance().start_load_sql_db_loop()
+    if get_readiness().is_ready('speech_to_text'):
+        get_speech_to_text().warm_up()
+
+
+def run_worker(app, sock: socket.socket, uvicorn_kwargs: dict):
+    import uvicorn
+
+    after_fork_in_worker()
+    config = uvicorn.Config(app, **uvicorn_kwargs)
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+
+
+def serve(host: str, port: int, workers: int, preload_speech_to_text: bool = True,
+          memory_report_delay: float = 30, **uvicorn_kwargs):
+    app = preload(preload_speech_to_text)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    logger.info(f'Preloaded in master {os.getpid()}, forking {workers} workers '
+                f'on {host}:{port}')
+
+    worker_pids: List[int] = []
+    shutting_down = threading.Event()
+
+    def spawn_worker():
+        pid = os.fork()
+        if pid == 0:
+            # Never return into the master's code, but let it know how the worker ended.
+            code = 1
+            try:
+                run_worker(app, sock, uvicorn_kwargs)
+                code = 0
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else 1
+            except BaseException:
+                logger.exception('Worker failed')
+            finally:
+                os._exit(code)
+        worker_pids.append(pid)
+        logger.info(f'Started worker {pid}')
+
+    def shutdown(signum, frame):
+        shutting_down.set()
+        for pid in worker_pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGUSR1,
+                  lambda signum, frame: report_memory_usage(os.getpid(), worker_pids))
+
+    for _ in range(workers):
+        spawn_worker()
+
+    if memory_report_delay > 0:
+        timer = threading.Timer(memory_report_delay, report_memory_usage,
+                                args=(os.getpid(), worker_pids))
+        timer.daemon = True
+        timer.start()
+
+    while worker_pids:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        if pid in worker_pids:
+            worker_pids.remove(pid)
+        if not shutting_down.is_set():
+            logger.warning(f'Worker {pid} exited with status {status}, restarting')
+            time.sleep(1)
+            spawn_worker()
+    sock.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--no-preload-stt', action='store_true',
+                        help='Load the speech to text model in each worker instead. Required '
+                        'for GPU inference, CUDA can not be initialized before fork.')
+    parser.add_argument('--memory-report-delay', type=float, default=30,
+                        help='Seconds after startup to log per-worker memory usage, '
+                        '0 to disable. Send SIGUSR1 to the master to log it again.')
+    parser.add_argument('--ws-ping-interval', type=float, default=60)
+    parser.add_argument('--ws-ping-timeout', type=float, default=60)
+    parser.add_argument('--timeout-keep-alive', type=int, default=60)
+    args = parser.parse_args(argv)
+    if sys.platform != 'linux':
+        parser.error('The preload-and-fork server mode is only supported on Linux.')
+    from dotenv import load_dotenv
+    load_dotenv()
+    if args.workers > 1 and os.getenv('CATALOG_CHANGE_BUS') == 'LOCAL':
+        parser.error('CATALOG_CHANGE_BUS=LOCAL does not reach other workers, use SQLITE or '
+                     'POSTGRES with more than one worker.')
+    serve(args.host, args.port, args.workers,
+          preload_speech_to_text=not args.no_preload_stt,
+          memory_report_delay=args.memory_report_delay,
+          ws_ping_interval=args.ws_ping_interval,
+          ws_ping_timeout=args.ws_ping_timeout,
+          timeout_keep_alive=args.timeout_keep_alive)
+
+
+if __name__ == '__main__':
+    main()
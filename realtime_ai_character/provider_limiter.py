@@ -0,0 +1,330 @@
+"""Shared limits on the calls made to each external provider.
+
+Every provider (OpenAI, ElevenLabs, Google speech...) gets one ProviderLimiter per process:
+a token bucket of requests per second plus a cap on calls in flight. Calls over the limit
+wait in a first come, first served queue instead of failing. When a provider answers 429,
+its limiter backs off for the Retry-After it asked for, or exponentially, and holds every
+waiting call until then, rather than each session retrying on its own. The call is then
+retried, through the limiter, by retry_rate_limited(). Provider clients are therefore built
+with max_retries=0: the limiter backs off on rate limits, not the client.
+
+Limits are configured per provider with <PROVIDER>_RATE_LIMIT (requests per second),
+<PROVIDER>_BURST and <PROVIDER>_MAX_IN_FLIGHT, e.g. ELEVENLABS_MAX_IN_FLIGHT=5. 0 means no
+limit. Calls from worker threads use sync_slot(), calls on the event loop slot().
+"""
+import asyncio
+import os
+import statistics
+import threading
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from time import monotonic
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from realtime_ai_character.logger import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar('T')
+
+# Calls in flight allowed by default, below what providers allow on most plans.
+DEFAULT_MAX_IN_FLIGHT = {
+    'openai': 100,
+    'anthropic': 50,
+    'anyscale': 50,
+    'openai_embedding': 50,
+    'openai_whisper': 50,
+    'elevenlabs': 10,
+    'google_tts': 50,
+    'google_stt': 50,
+    'unreal_speech': 10,
+    'edge_tts': 10,
+}
+# Backoff after a 429 without Retry-After, doubled on every consecutive one.
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+# Attempts at a call answered 429, each waiting for the limiter's backoff.
+RATE_LIMIT_ATTEMPTS = 3
+# Queue times kept for the percentiles of report().
+QUEUE_TIME_SAMPLES = 1000
+
+
+class _Waiter:
+    """A call waiting for a slot, on the event loop or in a worker thread."""
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.loop = loop
+        self.future = loop.create_future() if loop else None
+        self.event = None if loop else threading.Event()
+        self.granted = False
+
+    def wake(self):
+        if self.event:
+            self.event.set()
+            return
+        try:
+            self.loop.call_soon_threadsafe(self._set_future)
+        except RuntimeError:
+            # The loop is closed, nobody is waiting anymore.
+            pass
+
+    def _set_future(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+    async def wait(self, timeout: Optional[float]):
+        try:
+            await asyncio.wait_for(asyncio.shield(self.future), timeout)
+        except asyncio.TimeoutError:
+            pass
+        if self.future.done():
+            self.future = self.loop.create_future()
+
+    def wait_sync(self, timeout: Optional[float]):
+        self.event.wait(timeout)
+        self.event.clear()
+
+
+def is_rate_limited(e: Exception) -> bool:
+    status = getattr(e, 'http_status', None) or getattr(e, 'status_code', None) or getattr(
+        getattr(e, 'response', None), 'status_code', None)
+    return status == 429 or type(e).__name__ in ('RateLimitError', 'ResourceExhausted',
+                                                 'TooManyRequests')
+
+
+def retry_after(e: Exception) -> Optional[str]:
+    headers = getattr(e, 'headers', None) or getattr(getattr(e, 'response', None), 'headers',
+                                                     None)
+    return headers.get('Retry-After') if headers else None
+
+
+class ProviderLimiter:
+    def __init__(self, name: str, rate: float = 0, burst: int = 0, max_in_flight: int = 0):
+        self.name = name
+        self.rate = rate
+        self.burst = max(burst, 1) if rate else 0
+        self.max_in_flight = max_in_flight
+        self.lock = threading.Lock()
+        self.waiters: deque = deque()
+        self.tokens = float(self.burst)
+        self.refilled_at = monotonic()
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.consecutive_rate_limits = 0
+        # Metrics
+        self.requests = 0
+        self.queued = 0
+        self.rate_limited = 0
+        self.queue_time_total = 0.0
+        self.queue_times: deque = deque(maxlen=QUEUE_TIME_SAMPLES)
+
+    def _dispatch(self, caller: Optional[_Waiter] = None) -> Optional[float]:
+        """Hand slots to the waiters in order.
+
+        Returns the seconds until the next slot frees up by itself, or None when waiters
+        have to wait for a call to finish.
+        """
+        with self.lock:
+            now = monotonic()
+            if self.rate:
+                self.tokens = min(self.burst,
+                                  self.tokens + (now - self.refilled_at) * self.rate)
+                self.refilled_at = now
+            while self.waiters:
+                if self.max_in_flight and self.in_flight >= self.max_in_flight:
+                    return None
+                if now < self.blocked_until:
+                    delay = self.blocked_until - now
+                elif self.rate and self.tokens < 1:
+                    delay = (1 - self.tokens) / self.rate
+                else:
+                    waiter = self.waiters.popleft()
+                    waiter.granted = True
+                    waiter.wake()
+                    self.tokens -= 1 if self.rate else 0
+                    self.in_flight += 1
+                    continue
+                # The first waiter wakes up when the time comes and dispatches again.
+                if self.waiters[0] is not caller:
+                    self.waiters[0].wake()
+                return delay
+            return None
+
+    def _enqueue(self, waiter: _Waiter) -> float:
+        with self.lock:
+            self.waiters.append(waiter)
+            self.requests += 1
+        return monotonic()
+
+    def _granted(self, queued_at: float):
+        queue_time = monotonic() - queued_at
+        with self.lock:
+            if queue_time > 0.001:
+                self.queued += 1
+            self.queue_time_total += queue_time
+            self.queue_times.append(queue_time)
+
+    def _abandon(self, waiter: _Waiter):
+        with self.lock:
+            if not waiter.granted:
+                try:
+                    self.waiters.remove(waiter)
+                except ValueError:
+                    pass
+                return
+        self.release()
+
+    async def acquire(self):
+        waiter = _Waiter(asyncio.get_running_loop())
+        queued_at = self._enqueue(waiter)
+        try:
+            while True:
+                delay = self._dispatch(waiter)
+                if waiter.granted:
+                    break
+                await waiter.wait(delay)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        self._granted(queued_at)
+
+    def acquire_sync(self):
+        waiter = _Waiter()
+        queued_at = self._enqueue(waiter)
+        try:
+            while True:
+                delay = self._dispatch(waiter)
+                if waiter.granted:
+                    break
+                waiter.wait_sync(delay)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        self._granted(queued_at)
+
+    def release(self):
+        with self.lock:
+            self.in_flight -= 1
+        self._dispatch()
+
+    def backoff(self, retry_after: Optional[str] = None):
+        """Hold every call to the provider after it answered 429."""
+        with self.lock:
+            try:
+                delay = float(retry_after)
+            except (TypeError, ValueError):
+                delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** self.consecutive_rate_limits)
+            self.consecutive_rate_limits += 1
+            self.rate_limited += 1
+            self.blocked_until = max(self.blocked_until, monotonic() + delay)
+        logger.warning(f'{self.name} is rate limited, holding calls for {delay:.1f}s')
+
+    def _succeeded(self):
+        if self.consecutive_rate_limits:
+            with self.lock:
+                self.consecutive_rate_limits = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield self
+        except Exception as e:
+            if is_rate_limited(e):
+                self.backoff(retry_after(e))
+            raise
+        else:
+            self._succeeded()
+        finally:
+            self.release()
+
+    @contextmanager
+    def sync_slot(self):
+        self.acquire_sync()
+        try:
+            yield self
+        except Exception as e:
+            if is_rate_limited(e):
+                self.backoff(retry_after(e))
+            raise
+        else:
+            self._succeeded()
+        finally:
+            self.release()
+
+    def report(self) -> dict:
+        with self.lock:
+            queue_times = sorted(self.queue_times)
+            return {
+                'requests': self.requests,
+                'queued': self.queued,
+                'rate_limited': self.rate_limited,
+                'in_flight': self.in_flight,
+                'waiting': len(self.waiters),
+                'queue_time_mean': round(self.queue_time_total / self.requests, 4)
+                if self.requests else None,
+                'queue_time_p50': round(statistics.median(queue_times), 4)
+                if queue_times else None,
+                'queue_time_p95': round(queue_times[int(len(queue_times) * 0.95)], 4)
+                if queue_times else None,
+                'queue_time_max': round(queue_times[-1], 4) if queue_times else None,
+            }
+
+
+_limiters: dict = {}
+_limiters_lock = threading.Lock()
+
+
+def get_provider_limiter(name: str) -> ProviderLimiter:
+    limiter = _limiters.get(name)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(name)
+            if limiter is None:
+                prefix = name.upper()
+                limiter = ProviderLimiter(
+                    name,
+                    rate=float(os.getenv(f'{prefix}_RATE_LIMIT', 0)),
+                    burst=int(os.getenv(f'{prefix}_BURST', 1)),
+                    max_in_flight=int(os.getenv(f'{prefix}_MAX_IN_FLIGHT',
+                                                DEFAULT_MAX_IN_FLIGHT.get(name, 0))))
+                _limiters[name] = limiter
+    return limiter
+
+
+@asynccontextmanager
+async def provider_slot(name: Optional[str]):
+    """Hold a slot of the provider for the duration of a call, nothing for local models."""
+    if not name:
+        yield None
+        return
+    async with get_provider_limiter(name).slot() as limiter:
+        yield limiter
+
+
+async def retry_rate_limited(call: Callable[[], Awaitable[T]]) -> T:
+    """Make a call that takes a provider slot, again after a 429.
+
+    The slot of the next attempt waits until the limiter's backoff is over. A 429 comes
+    before any token is streamed, so retrying doesn't repeat output.
+    """
+    for attempt in range(1, RATE_LIMIT_ATTEMPTS + 1):
+        try:
+            return await call()
+        except Exception as e:
+            if attempt == RATE_LIMIT_ATTEMPTS or not is_rate_limited(e):
+                raise
+
+
+def retry_rate_limited_sync(call: Callable[[], T]) -> T:
+    """retry_rate_limited() for calls from worker threads."""
+    for attempt in range(1, RATE_LIMIT_ATTEMPTS + 1):
+        try:
+            return call()
+        except Exception as e:
+            if attempt == RATE_LIMIT_ATTEMPTS or not is_rate_limited(e):
+                raise
+
+
+def get_provider_limits_report() -> dict:
+    return {name: limiter.report() for name, limiter in list(_limiters.items())}
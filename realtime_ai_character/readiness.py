@@ -0,0 +1,108 @@
+import asyncio
+import threading
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Callable, Dict, Optional
+
+from fastapi import HTTPException, status as http_status
+
+from realtime_ai_character.logger import get_logger
+from realtime_ai_character.utils import Singleton
+
+logger = get_logger(__name__)
+
+PENDING = 'pending'
+WARMING = 'warming'
+READY = 'ready'
+FAILED = 'failed'
+
+# Backoff between attempts at a step that failed, doubled after every failure.
+RETRY_BACKOFF_BASE = 1.0
+RETRY_BACKOFF_MAX = 60.0
+
+
+@dataclass
+class SubsystemStatus:
+    state: str = PENDING
+    duration: Optional[float] = None
+    error: Optional[str] = None
+    attempts: int = 0
+
+
+class Readiness(Singleton):
+    """Tracks which subsystems finished warming up, and how long each took."""
+
+    def __init__(self):
+        self.subsystems: Dict[str, SubsystemStatus] = {}
+        self.lock = threading.Lock()
+
+    def register(self, name: str):
+        with self.lock:
+            self.subsystems.setdefault(name, SubsystemStatus())
+
+    def run(self, name: str, warm_up: Callable[[], object]) -> bool:
+        """Run a warm-up step unless done or running, recording its state and duration.
+
+        Returns whether the subsystem is ready.
+        """
+        with self.lock:
+            subsystem = self.subsystems.setdefault(name, SubsystemStatus())
+            if subsystem.state in (WARMING, READY):
+                return subsystem.state == READY
+            subsystem.state = WARMING
+            subsystem.attempts += 1
+        logger.info(f'Warming up {name}...')
+        start = perf_counter()
+        try:
+            warm_up()
+        except Exception as e:
+            subsystem.error = f'{type(e).__name__}: {e}'
+            subsystem.state = FAILED
+            logger.error(f'Failed to warm up {name}: {subsystem.error}')
+        else:
+            subsystem.error = None
+            subsystem.state = READY
+            logger.info(f'{name} is ready')
+        finally:
+            subsystem.duration = perf_counter() - start
+        return subsystem.state == READY
+
+    async def run_until_ready(self, name: str, warm_up: Callable[[], object]):
+        """Run a warm-up step in a thread, again with backoff for as long as it fails."""
+        delay = RETRY_BACKOFF_BASE
+        while not await asyncio.to_thread(self.run, name, warm_up):
+            logger.info(f'Retrying to warm up {name} in {delay:.0f}s')
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RETRY_BACKOFF_MAX)
+
+    def is_ready(self, *names: str) -> bool:
+        names = names or tuple(self.subsystems.keys())
+        return all(name in self.subsystems and self.subsystems[name].state == READY
+                   for name in names)
+
+    def report(self) -> dict:
+        return {
+            name: {
+                'state': subsystem.state,
+                'duration': round(subsystem.duration, 3)
+                if subsystem.duration is not None else None,
+                'error': subsystem.error,
+                'attempts': subsystem.attempts,
+            } for name, subsystem in self.subsystems.items()
+        }
+
+
+def get_readiness() -> Readiness:
+    return Readiness.get_instance()
+
+
+def require_ready(*names: str):
+    """FastAPI dependency that answers 503 until the subsystems finished warming up."""
+    def dependency():
+        if not get_readiness().is_ready(*names):
+            raise HTTPException(
+                status_code=http_status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f'Warming up: {", ".join(names)}',
+                headers={'Retry-After': '5'},
+            )
+    return dependency
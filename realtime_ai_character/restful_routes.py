@@ -1,40 +1,54 @@
 import os
 import datetime
+import json
 import uuid
 import asyncio
 import httpx
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Request, \
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, \
     status as http_status, UploadFile, File, Form
-from google.cloud import storage
-import firebase_admin
-from firebase_admin import auth, credentials
-from firebase_admin.exceptions import FirebaseError
+from fastapi.responses import StreamingResponse
+from realtime_ai_character.admission import get_admission_controller
 from realtime_ai_character.audio.text_to_speech import get_text_to_speech
-from realtime_ai_character.database.connection import get_db
+from realtime_ai_character.character_catalog.catalog_manager import get_catalog_manager
+from realtime_ai_character.character_catalog.character_listing import get_character_listing
+from realtime_ai_character.database.connection import async_session, get_async_db
+from realtime_ai_character.database.pagination import decode_cursor, encode_cursor
 from realtime_ai_character.models.interaction import Interaction
 from realtime_ai_character.models.feedback import Feedback, FeedbackRequest
 from realtime_ai_character.models.character import Character, CharacterRequest, \
     EditCharacterRequest, DeleteCharacterRequest, GeneratePromptRequest
 from realtime_ai_character.models.memory import Memory, EditMemoryRequest
 from realtime_ai_character.models.quivr_info import QuivrInfo, UpdateQuivrInfoRequest
-from realtime_ai_character.llm.system_prompt_generator import generate_system_prompt
-from requests import Session
-from sqlalchemy import func
+from realtime_ai_character.models.session_summary import SessionSummary
+from realtime_ai_character.llm.system_prompt_generator import generate_system_prompt, \
+    stream_system_prompt
+from realtime_ai_character.readiness import get_readiness, require_ready
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 
 
 router = APIRouter()
 
 if os.getenv('USE_AUTH', ''):
+    import firebase_admin
+    from firebase_admin import credentials
     cred = credentials.Certificate(os.environ.get('FIREBASE_CONFIG_PATH'))
     firebase_admin.initialize_app(cred)
 
 MAX_FILE_UPLOADS = 5
+MAX_PAGE_SIZE = 200
+# Rows read per query while streaming a whole session history or list of sessions.
+HISTORY_STREAM_PAGE_SIZE = 500
 
 
 async def get_current_user(request: Request):
     """Heler function for auth with Firebase."""
     if os.getenv('USE_AUTH', ''):
+        from firebase_admin import auth
+        from firebase_admin.exceptions import FirebaseError
+
         # Extracts the token from the Authorization header
         if 'Authorization' not in request.headers:
             # Anonymous users.
@@ -67,29 +81,33 @@ async def status():
     return {"status": "ok", "message": "RealChar is running smoothly!"}
 
 
-@router.get("/characters")
-async def characters(user=Depends(get_current_user)):
-    def get_image_url(character):
-        gcs_path = 'https://storage.googleapis.com/assistly'
-        if character.data and 'avatar_filename' in character.data:
-            return f'{gcs_path}/{character.data["avatar_filename"]}'
-        else:
-            return f'{gcs_path}/static/realchar/{character.character_id}.jpg'
+@router.get("/livez")
+async def livez():
+    return {"status": "ok"}
+
+
+@router.get("/readyz")
+async def readyz(response: Response):
+    readiness = get_readiness()
+    ready = readiness.is_ready()
+    if not ready:
+        response.status_code = http_status.HTTP_503_SERVICE_UNAVAILABLE
+    return {"ready": ready, "subsystems": readiness.report(),
+            "load": get_admission_controller().report()}
+
+
+@router.get("/characters", dependencies=[Depends(require_ready('catalog'))])
+async def characters(request: Request, user=Depends(get_current_user)):
     uid = user['uid'] if user else None
-    from realtime_ai_character.character_catalog.catalog_manager import CatalogManager
-    catalog: CatalogManager = CatalogManager.get_instance()
-    return [{
-        "character_id": character.character_id,
-        "name": character.name,
-        "source": character.source,
-        "voice_id": character.voice_id,
-        "author_name": character.author_name,
-        "image_url": get_image_url(character),
-        "avatar_id": character.avatar_id,
-        "tts": character.tts,
-        'is_author': character.author_id == uid,
-    } for character in catalog.characters.values()
-            if character.author_id == uid or character.visibility == 'public']
+    # The public part of the response is serialized once per catalog version.
+    listing = get_character_listing(get_catalog_manager().snapshot)
+    body, etag = listing.render(uid)
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache', 'Vary': 'Authorization'}
+    if_none_match = request.headers.get('If-None-Match', '')
+    if if_none_match.strip() == '*' or etag in [
+            tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]:
+        return Response(status_code=http_status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type='application/json', headers=headers)
 
 
 @router.get("/configs")
@@ -98,19 +116,90 @@ async def configs():
         'llms': ['gpt-4', 'gpt-3.5-turbo-16k', 'claude-2', 'meta-llama/Llama-2-70b-chat-hf'],
     }
 
+def parse_cursor(cursor: str, key_type: type) -> tuple:
+    try:
+        return decode_cursor(cursor, key_type)
+    except ValueError as e:
+        raise HTTPException(status_code=http_status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+def session_history_page(session_id: str, after: Optional[tuple], limit: int):
+    """The interactions of a session after the (timestamp, id) `after`, in order.
+
+    Reads plain columns, no ORM objects.
+    """
+    stmt = (
+        select(*Interaction.__table__.columns)
+        .where(Interaction.session_id == session_id)
+        .order_by(Interaction.timestamp, Interaction.id)
+        .limit(limit))
+    if after:
+        stmt = stmt.where(tuple_(Interaction.timestamp, Interaction.id) > tuple_(*after))
+    return stmt
+
+
+def interaction_json(row) -> str:
+    interaction = row._asdict()
+    if interaction['timestamp']:
+        interaction['timestamp'] = interaction['timestamp'].isoformat()
+    return json.dumps(interaction, ensure_ascii=False)
+
+
 @router.get("/session_history")
-async def get_session_history(session_id: str, db: Session = Depends(get_db)):
-    # Read session history from the database.
-    interactions = await asyncio.to_thread(
-        db.query(Interaction).filter(Interaction.session_id == session_id).all)
-    # return interactions in json format
-    interactions_json = [interaction.to_dict() for interaction in interactions]
-    return interactions_json
+async def get_session_history(request: Request, session_id: str,
+                              limit: Optional[int] = Query(default=None, ge=1,
+                                                           le=MAX_PAGE_SIZE),
+                              cursor: Optional[str] = None):
+    """The interactions of a session in order, as a JSON array or, with
+    `Accept: application/x-ndjson`, one JSON object per line.
+
+    With `limit`, one page, and the cursor of the next one in the X-Next-Cursor header.
+    Without, the whole history, streamed page by page.
+    """
+    ndjson = 'application/x-ndjson' in request.headers.get('accept', '')
+    media_type = 'application/x-ndjson' if ndjson else 'application/json'
+    after = parse_cursor(cursor, int) if cursor else None
+
+    def encode(lines: list, first: bool) -> str:
+        if ndjson:
+            return ''.join(line + '\n' for line in lines)
+        return ('' if first or not lines else ',') + ','.join(lines)
+
+    if limit:
+        async with async_session() as db:
+            rows = (await db.execute(session_history_page(session_id, after, limit))).all()
+        headers = {}
+        if len(rows) == limit:
+            headers['X-Next-Cursor'] = encode_cursor(rows[-1].timestamp, rows[-1].id)
+        body = encode([interaction_json(row) for row in rows], first=True)
+        return Response(content=body if ndjson else f'[{body}]', media_type=media_type,
+                        headers=headers)
+
+    async def stream():
+        page_after, first = after, True
+        if not ndjson:
+            yield '['
+        while True:
+            # A session per page, the connection goes back to the pool while the client
+            # reads.
+            async with async_session() as db:
+                rows = (await db.execute(session_history_page(
+                    session_id, page_after, HISTORY_STREAM_PAGE_SIZE))).all()
+            if rows:
+                yield encode([interaction_json(row) for row in rows], first)
+                first = False
+            if len(rows) < HISTORY_STREAM_PAGE_SIZE:
+                break
+            page_after = (rows[-1].timestamp, rows[-1].id)
+        if not ndjson:
+            yield ']'
+
+    return StreamingResponse(stream(), media_type=media_type)
 
 @router.post("/feedback")
 async def post_feedback(feedback_request: FeedbackRequest,
                         user = Depends(get_current_user),
-                        db: Session = Depends(get_db)):
+                        db: AsyncSession = Depends(get_async_db)):
     if not user:
         raise HTTPException(
                 status_code=http_status.HTTP_401_UNAUTHORIZED,
@@ -120,7 +209,8 @@ async def post_feedback(feedback_request: FeedbackRequest,
     feedback = Feedback(**feedback_request.dict())
     feedback.user_id = user['uid']
     feedback.created_at = datetime.datetime.now()
-    await asyncio.to_thread(feedback.save, db)
+    db.add(feedback)
+    await db.commit()
 
 
 @router.post("/uploadfile")
@@ -132,6 +222,7 @@ async def upload_file(file: UploadFile = File(...), user = Depends(get_current_u
                 headers={'WWW-Authenticate': 'Bearer'},
             )
 
+    from google.cloud import storage
     storage_client = storage.Client()
     bucket_name = os.environ.get('GCP_STORAGE_BUCKET_NAME')
     if not bucket_name:
@@ -161,10 +252,10 @@ async def upload_file(file: UploadFile = File(...), user = Depends(get_current_u
         "content-type": file.content_type
     }
 
-@router.post("/create_character")
+@router.post("/create_character", dependencies=[Depends(require_ready('catalog'))])
 async def create_character(character_request: CharacterRequest,
                            user = Depends(get_current_user),
-                           db: Session = Depends(get_db)):
+                           db: AsyncSession = Depends(get_async_db)):
     if not user:
         raise HTTPException(
                 status_code=http_status.HTTP_401_UNAUTHORIZED,
@@ -177,13 +268,15 @@ async def create_character(character_request: CharacterRequest,
     now_time = datetime.datetime.now()
     character.created_at = now_time
     character.updated_at = now_time
-    await asyncio.to_thread(character.save, db)
+    db.add(character)
+    await db.commit()
+    await asyncio.to_thread(get_catalog_manager().upsert_character, character)
 
 
-@router.post("/edit_character")
+@router.post("/edit_character", dependencies=[Depends(require_ready('catalog'))])
 async def edit_character(edit_character_request: EditCharacterRequest,
                          user = Depends(get_current_user),
-                         db: Session = Depends(get_db)):
+                         db: AsyncSession = Depends(get_async_db)):
     if not user:
         raise HTTPException(
                 status_code=http_status.HTTP_401_UNAUTHORIZED,
@@ -191,8 +284,8 @@ async def edit_character(edit_character_request: EditCharacterRequest,
                 headers={'WWW-Authenticate': 'Bearer'},
             )
     character_id = edit_character_request.id
-    characters = await asyncio.to_thread(
-        db.query(Character).filter(Character.id == character_id).all)
+    characters = (await db.scalars(
+        select(Character).where(Character.id == character_id))).all()
     if len(characters) == 0:
         raise HTTPException(
                 status_code=http_status.HTTP_404_NOT_FOUND,
@@ -208,14 +301,15 @@ async def edit_character(edit_character_request: EditCharacterRequest,
             )
     character = Character(**edit_character_request.dict())
     character.updated_at = datetime.datetime.now()
-    db.merge(character)
-    db.commit()
+    character = await db.merge(character)
+    await db.commit()
+    await asyncio.to_thread(get_catalog_manager().upsert_character, character)
 
 
-@router.post("/delete_character")
+@router.post("/delete_character", dependencies=[Depends(require_ready('catalog'))])
 async def delete_character(delete_character_request: DeleteCharacterRequest,
                            user = Depends(get_current_user), 
-                           db: Session = Depends(get_db)):
+                           db: AsyncSession = Depends(get_async_db)):
     if not user:
         raise HTTPException(
                 status_code=http_status.HTTP_401_UNAUTHORIZED,
@@ -223,8 +317,8 @@ async def delete_character(delete_character_request: DeleteCharacterRequest,
                 headers={'WWW-Authenticate': 'Bearer'},
             )
     character_id = delete_character_request.character_id
-    characters = await asyncio.to_thread(
-        db.query(Character).filter(Character.id == character_id).all)
+    characters = (await db.scalars(
+        select(Character).where(Character.id == character_id))).all()
     if len(characters) == 0:
         raise HTTPException(
                 status_code=http_status.HTTP_404_NOT_FOUND,
@@ -238,11 +332,12 @@ async def delete_character(delete_character_request: DeleteCharacterRequest,
                 detail='Invalid authentication credentials',
                 headers={'WWW-Authenticate': 'Bearer'},
             )
-    db.delete(character)
-    db.commit()
+    await db.delete(character)
+    await db.commit()
+    await asyncio.to_thread(get_catalog_manager().remove_character, character_id)
 
 
-@router.post("/generate_audio")
+@router.post("/generate_audio", dependencies=[Depends(require_ready('text_to_speech'))])
 async def generate_audio(text: str, tts: str = None, user = Depends(get_current_user)):
     if not isinstance(text, str) or text == '':
         raise HTTPException(
@@ -264,6 +359,7 @@ async def generate_audio(text: str, tts: str = None, user = Depends(get_current_
             )
     audio_bytes = await tts_service.generate_audio(text)
     # save audio to a file on GCS
+    from google.cloud import storage
     storage_client = storage.Client()
     bucket_name = os.environ.get('GCP_STORAGE_BUCKET_NAME')
     if not bucket_name:
@@ -293,7 +389,7 @@ async def generate_audio(text: str, tts: str = None, user = Depends(get_current_
 
 @router.get("/quivr_info")
 async def quivr_info(user = Depends(get_current_user),
-                     db: Session = Depends(get_db)):
+                     db: AsyncSession = Depends(get_async_db)):
     if not user:
         raise HTTPException(
                 status_code=http_status.HTTP_401_UNAUTHORIZED,
@@ -301,8 +397,8 @@ async def quivr_info(user = Depends(get_current_user),
                 headers={'WWW-Authenticate': 'Bearer'},
         )
 
-    quivr_info = await asyncio.to_thread(
-        db.query(QuivrInfo).filter(QuivrInfo.user_id == user['uid']).first)
+    quivr_info = await db.scalar(
+        select(QuivrInfo).where(QuivrInfo.user_id == user['uid']).limit(1))
 
     if not quivr_info:
         return {"success": False}
@@ -313,7 +409,7 @@ async def quivr_info(user = Depends(get_current_user),
 @router.post("/quivr_info")
 async def quivr_info_update(update_quivr_info_request: UpdateQuivrInfoRequest,
                      user = Depends(get_current_user),
-                     db: Session = Depends(get_db)):
+                     db: AsyncSession = Depends(get_async_db)):
     if not user:
         raise HTTPException(
                 status_code=http_status.HTTP_401_UNAUTHORIZED,
@@ -365,7 +461,8 @@ async def quivr_info_update(update_quivr_info_request: UpdateQuivrInfoRequest,
                            quivr_api_key=api_key,
                            quivr_brain_id=brain_id)
 
-    await asyncio.to_thread(quivr_info.save, db)
+    db.add(quivr_info)
+    await db.commit()
 
     return {"success": True, "brain_id": brain_id, "brain_name": brain_name}
 
@@ -386,6 +483,7 @@ async def clone_voice(
                 detail=f'Number of files exceeds the limit ({MAX_FILE_UPLOADS})',
             )
 
+    from google.cloud import storage
     storage_client = storage.Client()
     bucket_name = os.environ.get('GCP_STORAGE_BUCKET_NAME')
     if not bucket_name:
@@ -434,12 +532,9 @@ async def clone_voice(
     return response.json()
 
 
-@router.post("/system_prompt")
-async def system_prompt(request: GeneratePromptRequest, user = Depends(get_current_user)):
-    """Generate System Prompt according to name and background."""
+def check_system_prompt_request(request: GeneratePromptRequest, user):
     name = request.name
-    background = request.background
-    if not isinstance(name, str) or name == '':
+    if not isinstance(name, str) or name.strip() == '':
         raise HTTPException(
                 status_code=http_status.HTTP_400_BAD_REQUEST,
                 detail='Name is empty',
@@ -450,48 +545,117 @@ async def system_prompt(request: GeneratePromptRequest, user = Depends(get_curre
                 detail='Invalid authentication credentials',
                 headers={'WWW-Authenticate': 'Bearer'},
             )
+
+
+@router.post("/system_prompt")
+async def system_prompt(request: GeneratePromptRequest, user = Depends(get_current_user)):
+    """Generate System Prompt according to name and background."""
+    check_system_prompt_request(request, user)
     return {
-        'system_prompt': await generate_system_prompt(name, background)
+        'system_prompt': await generate_system_prompt(request.name, request.background)
     }
 
 
+@router.post("/system_prompt/stream")
+async def system_prompt_stream(request: GeneratePromptRequest,
+                               user = Depends(get_current_user)):
+    """Stream the generated System Prompt as server-sent events.
+
+    Every `data` event carries a JSON encoded chunk of the prompt. The stream ends with an
+    `end` event, or an `error` event if generation failed.
+    """
+    check_system_prompt_request(request, user)
+
+    async def events():
+        try:
+            async for token in stream_system_prompt(request.name, request.background):
+                yield f'data: {json.dumps(token)}\n\n'
+        except Exception as e:
+            yield f'event: error\ndata: {json.dumps(str(e))}\n\n'
+            return
+        yield 'event: end\ndata: {}\n\n'
+
+    return StreamingResponse(events(), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache'})
+
+
+def conversations_page(user_id: str, before: Optional[tuple], limit: int):
+    """The sessions of a user before the (last_timestamp, session_id) `before`, most recent
+    first."""
+    stmt = (
+        select(SessionSummary.session_id,
+               SessionSummary.last_message_preview,
+               SessionSummary.last_timestamp,
+               SessionSummary.character_id,
+               SessionSummary.turn_count)
+        .where(SessionSummary.user_id == user_id)
+        .order_by(SessionSummary.last_timestamp.desc(), SessionSummary.session_id.desc())
+        .limit(limit))
+    if before:
+        stmt = stmt.where(tuple_(SessionSummary.last_timestamp, SessionSummary.session_id)
+                          < tuple_(*before))
+    return stmt
+
+
+def conversation_json(row) -> str:
+    return json.dumps({
+        "session_id": row.session_id,
+        "client_message_unicode": row.last_message_preview,
+        "timestamp": row.last_timestamp.isoformat() if row.last_timestamp else None,
+        "character_id": row.character_id,
+        "turn_count": row.turn_count,
+    }, ensure_ascii=False)
+
+
 @router.get("/conversations", response_model=list[dict])
-async def get_recent_conversations(user = Depends(get_current_user), db: Session = Depends(get_db)):
+async def get_recent_conversations(limit: Optional[int] = Query(default=None, ge=1,
+                                                                le=MAX_PAGE_SIZE),
+                                   cursor: Optional[str] = None,
+                                   user = Depends(get_current_user)):
+    """The user's sessions, most recent first, as a JSON array.
+
+    With `limit`, one page, and the cursor of the next one in the X-Next-Cursor header.
+    Without, all of them, streamed page by page.
+    """
     if not user:
         raise HTTPException(
                 status_code=http_status.HTTP_401_UNAUTHORIZED,
                 detail='Invalid authentication credentials',
                 headers={'WWW-Authenticate': 'Bearer'},
             )
-    user_id = user['uid']
-    stmt = (
-        db.query(
-            Interaction.session_id,
-            Interaction.client_message_unicode,
-            Interaction.timestamp,
-            func.row_number().over(
-                partition_by=Interaction.session_id,
-                order_by=Interaction.timestamp.desc()).label("rn")).filter(
-                    Interaction.user_id == user_id).subquery()
-    )
-
-    results = (
-        await asyncio.to_thread(db.query(stmt.c.session_id, stmt.c.client_message_unicode)
-        .filter(stmt.c.rn == 1)
-        .order_by(stmt.c.timestamp.desc())
-        .all)
-    )
-
-    # Format the results to the desired output
-    return [{
-        "session_id": r[0],
-        "client_message_unicode": r[1],
-        "timestamp": r[2]
-    } for r in results]
+    before = parse_cursor(cursor, str) if cursor else None
+
+    if limit:
+        async with async_session() as db:
+            rows = (await db.execute(conversations_page(user['uid'], before, limit))).all()
+        headers = {}
+        if len(rows) == limit:
+            headers['X-Next-Cursor'] = encode_cursor(rows[-1].last_timestamp,
+                                                     rows[-1].session_id)
+        return Response(content=f'[{",".join(map(conversation_json, rows))}]',
+                        media_type='application/json', headers=headers)
+
+    async def stream():
+        page_before, separator = before, ''
+        yield '['
+        while True:
+            async with async_session() as db:
+                rows = (await db.execute(conversations_page(
+                    user['uid'], page_before, HISTORY_STREAM_PAGE_SIZE))).all()
+            if rows:
+                yield separator + ','.join(map(conversation_json, rows))
+                separator = ','
+            if len(rows) < HISTORY_STREAM_PAGE_SIZE:
+                break
+            page_before = (rows[-1].last_timestamp, rows[-1].session_id)
+        yield ']'
+
+    return StreamingResponse(stream(), media_type='application/json')
 
 
 @router.get("/memory", response_model=list[dict])
-async def get_memory(user = Depends(get_current_user), db: Session = Depends(get_db)):
+async def get_memory(user = Depends(get_current_user),
+                     db: AsyncSession = Depends(get_async_db)):
     if not user:
         raise HTTPException(
                 status_code=http_status.HTTP_401_UNAUTHORIZED,
@@ -499,7 +663,7 @@ async def get_memory(user = Depends(get_current_user), db: Session = Depends(get
                 headers={'WWW-Authenticate': 'Bearer'},
             )
 
-    memories = await asyncio.to_thread(db.query(Memory).filter(Memory.user_id == user['uid']).all)
+    memories = (await db.scalars(select(Memory).where(Memory.user_id == user['uid']))).all()
 
     return [{
         "memory_id": memory.memory_id,
@@ -512,7 +676,7 @@ async def get_memory(user = Depends(get_current_user), db: Session = Depends(get
 
 @router.post("/delete_memory")
 async def delete_memory(memory_id: str, user = Depends(get_current_user), 
-                        db: Session = Depends(get_db)):
+                        db: AsyncSession = Depends(get_async_db)):
     if not user:
         raise HTTPException(
                 status_code=http_status.HTTP_401_UNAUTHORIZED,
@@ -520,7 +684,7 @@ async def delete_memory(memory_id: str, user = Depends(get_current_user),
                 headers={'WWW-Authenticate': 'Bearer'},
         )
     
-    memories = await asyncio.to_thread(db.query(Memory).filter(Memory.memory_id == memory_id).all)
+    memories = (await db.scalars(select(Memory).where(Memory.memory_id == memory_id))).all()
     if len(memories) == 0:
         raise HTTPException(
                 status_code=http_status.HTTP_404_NOT_FOUND,
@@ -533,13 +697,13 @@ async def delete_memory(memory_id: str, user = Depends(get_current_user),
                 headers={'WWW-Authenticate': 'Bearer'},
         )
 
-    db.delete(memories[0])
-    db.commit()
+    await db.delete(memories[0])
+    await db.commit()
 
 
 @router.post("/edit_memory")
 async def edit_memory(edit_memory_request: EditMemoryRequest, user = Depends(get_current_user), 
-                      db: Session = Depends(get_db)):
+                      db: AsyncSession = Depends(get_async_db)):
     if not user:
         raise HTTPException(
                 status_code=http_status.HTTP_401_UNAUTHORIZED,
@@ -547,7 +711,7 @@ async def edit_memory(edit_memory_request: EditMemoryRequest, user = Depends(get
                 headers={'WWW-Authenticate': 'Bearer'},
         )
     memory_id = edit_memory_request.memory_id
-    memories = await asyncio.to_thread(db.query(Memory).filter(Memory.memory_id == memory_id).all)
+    memories = (await db.scalars(select(Memory).where(Memory.memory_id == memory_id))).all()
     if len(memories) == 0:
         raise HTTPException(
                 status_code=http_status.HTTP_404_NOT_FOUND,
@@ -564,5 +728,5 @@ async def edit_memory(edit_memory_request: EditMemoryRequest, user = Depends(get
     memory.content = edit_memory_request.content
     memory.updated_at = datetime.datetime.now()
 
-    db.merge(memory)
-    db.commit()
+    await db.merge(memory)
+    await db.commit()
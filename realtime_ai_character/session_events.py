@@ -0,0 +1,74 @@
+"""Typed events of a websocket session.
+
+The reader task of a session turns every websocket frame into one of these events and
+hands it to the turn executor through a queue, so that reading never waits for a reply.
+"""
+from dataclasses import dataclass
+from typing import Optional, Union
+
+
+@dataclass(frozen=True)
+class Command:
+    """Client side command, `[!NAME]content`."""
+    name: str
+    content: str
+
+
+@dataclass(frozen=True)
+class InterimTranscript:
+    """Interim transcript of client side speech recognition, `[&]text`."""
+    text: str
+
+
+@dataclass(frozen=True)
+class SpeechFinished:
+    """The user stopped speaking, the interim audio transcribed so far is the input."""
+
+
+@dataclass(frozen=True)
+class TextMessage:
+    text: str
+
+
+@dataclass(frozen=True)
+class AudioFrame:
+    data: bytes
+    # Announced by `[&Speech]`: a part of the current utterance, not a whole one.
+    interim: bool = False
+
+
+@dataclass(frozen=True)
+class Disconnected:
+    pass
+
+
+SessionEvent = Union[Command, InterimTranscript, SpeechFinished, TextMessage, AudioFrame,
+                     Disconnected]
+
+
+class FrameParser:
+    def __init__(self):
+        self.interim_audio_next = False
+
+    def parse(self, data: dict) -> Optional[SessionEvent]:
+        """Parse a frame from websocket.receive(), None for frames that carry no event."""
+        if data['type'] != 'websocket.receive':
+            return Disconnected()
+        if data.get('text') is not None:
+            text = data['text']
+            if text.startswith('[!'):
+                end = text.find(']')
+                return Command(name=text[2:end], content=text[end + 1:])
+            if text.startswith('[&]'):
+                return InterimTranscript(text=text[len('[&]'):])
+            if text.startswith('[&Speech]'):
+                self.interim_audio_next = True
+                return None
+            if text.startswith('[SpeechFinished]'):
+                self.interim_audio_next = False
+                return SpeechFinished()
+            return TextMessage(text=text)
+        if data.get('bytes') is not None:
+            interim, self.interim_audio_next = self.interim_audio_next, False
+            return AudioFrame(data=data['bytes'], interim=interim)
+        return None
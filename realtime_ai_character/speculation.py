@@ -0,0 +1,228 @@
+"""Speculative response generation from interim transcripts.
+
+While the user is still speaking, the client sends interim transcripts prefixed with `[&]`.
+Once an interim transcript has been stable for a moment, the reply to it is generated in
+the background with its tokens and audio held back. If the final transcript matches, the
+held output is released and the reply streams on from where it is, otherwise the
+speculation is cancelled and nothing reaches the client.
+"""
+import asyncio
+import os
+import re
+import threading
+import types
+import uuid
+from collections import deque
+from difflib import SequenceMatcher
+from time import perf_counter
+from typing import Awaitable, Callable, Optional
+
+from realtime_ai_character.logger import get_logger
+from realtime_ai_character.utils import Singleton, get_connection_manager
+
+logger = get_logger(__name__)
+
+config = types.SimpleNamespace(**{
+    # Seconds an interim transcript must stay unchanged before speculating on it.
+    'stable_delay': float(os.getenv('SPECULATION_STABLE_MS', 300)) / 1000,
+    # Word-level similarity from which a final transcript counts as a match.
+    'similarity': float(os.getenv('SPECULATION_SIMILARITY', 0.9)),
+    # Don't speculate on very short interim transcripts, they are rarely final.
+    'min_words': int(os.getenv('SPECULATION_MIN_WORDS', 3)),
+})
+
+
+def normalize_transcript(text: str) -> list[str]:
+    return re.sub(r'[^\w\s]', ' ', text.lower()).split()
+
+
+def transcript_similarity(a: str, b: str) -> float:
+    words_a, words_b = normalize_transcript(a), normalize_transcript(b)
+    if words_a == words_b:
+        return 1.0
+    return SequenceMatcher(None, words_a, words_b, autojunk=False).ratio()
+
+
+class SpeculationStats(Singleton):
+    """Process-wide counters of speculative generation."""
+
+    def __init__(self):
+        self.started = 0
+        # Superseded by a diverging interim transcript before the final one arrived.
+        self.discarded = 0
+        self.hits = 0
+        self.misses = 0
+        # How much earlier committed speculations had their first output than a reply
+        # started on the final transcript would have.
+        self.latency_saved = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, counter: str, latency_saved: float = 0.0):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+            self.latency_saved += latency_saved
+
+    def report(self) -> dict:
+        with self.lock:
+            finals = self.hits + self.misses
+            return {
+                'started': self.started,
+                'discarded': self.discarded,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / finals, 3) if finals else None,
+                'latency_saved_total': round(self.latency_saved, 3),
+                'latency_saved_mean': round(self.latency_saved / self.hits, 3)
+                if self.hits else None,
+            }
+
+
+def get_speculation_stats() -> SpeculationStats:
+    return SpeculationStats.get_instance()
+
+
+class HeldOutput:
+    """Stands in for the websocket of a speculative reply.
+
+    Text and audio frames are held in order until commit(), then replayed and passed
+    straight through from there on.
+    """
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.held: deque = deque()
+        self.committed = False
+        self.first_output_at: Optional[float] = None
+
+    @property
+    def application_state(self):
+        return self.websocket.application_state
+
+    async def send_text(self, data: str):
+        await self._send(True, data)
+
+    async def send_bytes(self, data: bytes):
+        await self._send(False, data)
+
+    async def _send(self, is_text: bool, data):
+        if self.first_output_at is None:
+            self.first_output_at = perf_counter()
+        if not self.committed or self.held:
+            self.held.append((is_text, data))
+            return
+        await self._forward(is_text, data)
+
+    async def _forward(self, is_text: bool, data):
+        if is_text:
+            await self.websocket.send_text(data)
+        else:
+            await self.websocket.send_bytes(data)
+
+    async def commit(self):
+        self.committed = True
+        # Frames produced while replaying are queued behind the held ones.
+        while self.held:
+            await self._forward(*self.held.popleft())
+
+
+class Speculation:
+    def __init__(self, transcript: str, context, websocket):
+        self.transcript = transcript
+        self.context = context
+        self.message_id = str(uuid.uuid4().hex)[:16]
+        self.output = HeldOutput(websocket)
+        self.tts_event = asyncio.Event()
+        self.started_at = perf_counter()
+        self.task: Optional[asyncio.Task] = None
+        # Tokens generated before the commit.
+        self.tokens: list = []
+
+    def cancel(self):
+        self.tts_event.set()
+        if self.task and not self.task.done():
+            self.task.cancel()
+        get_connection_manager().discard_tokens(self.output)
+
+    def failed(self) -> bool:
+        return self.task.done() and (self.task.cancelled() or
+                                     self.task.exception() is not None)
+
+    def latency_saved(self, now: float) -> float:
+        """How much earlier the first output is ready than if the reply started now.
+
+        A reply started now would take as long to its first output as this one did. This
+        one's output can't be sent before now, so the saving is its head start, capped at
+        its time to the first output.
+        """
+        head_start = now - self.started_at
+        if self.output.first_output_at is None:
+            return head_start
+        return min(head_start, self.output.first_output_at - self.started_at)
+
+
+class Speculator:
+    """Speculates on the interim transcripts of one session.
+
+    generate(transcript, speculation) produces the reply to the transcript, writing to
+    speculation.output and stopping audio on speculation.tts_event. Its result is the
+    reply text. context identifies the state the reply depends on, e.g. the number of
+    turns in the conversation history, a speculation started in another context never
+    matches.
+    """
+
+    def __init__(self, websocket, generate: Callable[[str, Speculation], Awaitable[str]]):
+        self.websocket = websocket
+        self.generate = generate
+        self.current: Optional[Speculation] = None
+        self.pending: Optional[asyncio.TimerHandle] = None
+        self.stats = get_speculation_stats()
+
+    def on_interim(self, transcript: str, context=None):
+        if len(normalize_transcript(transcript)) < config.min_words:
+            return
+        current = self.current
+        if current and current.context == context and not current.failed() and \
+                transcript_similarity(current.transcript, transcript) >= config.similarity:
+            return
+        if self.pending:
+            self.pending.cancel()
+        self.pending = asyncio.get_running_loop().call_later(
+            config.stable_delay, self._start, transcript, context)
+
+    def _start(self, transcript: str, context):
+        self.pending = None
+        if self.current:
+            self.current.cancel()
+            self.stats.record('discarded')
+        speculation = Speculation(transcript, context, self.websocket)
+        speculation.task = asyncio.create_task(self.generate(transcript, speculation))
+        self.current = speculation
+        self.stats.record('started')
+        logger.info(f'Speculating on interim transcript: {transcript}')
+
+    def on_final(self, transcript: str, context=None) -> Optional[Speculation]:
+        """Return the speculation to commit for the final transcript, if any matches."""
+        if self.pending:
+            self.pending.cancel()
+            self.pending = None
+        speculation, self.current = self.current, None
+        if speculation is None:
+            return None
+        if speculation.context != context or speculation.failed() or \
+                transcript_similarity(speculation.transcript, transcript) < config.similarity:
+            speculation.cancel()
+            self.stats.record('misses')
+            logger.info(f'Speculation missed: "{speculation.transcript}" != "{transcript}"')
+            return None
+        latency_saved = speculation.latency_saved(perf_counter())
+        self.stats.record('hits', latency_saved)
+        logger.info(f'Speculation hit, first output {latency_saved:.3f}s earlier')
+        return speculation
+
+    def cancel(self):
+        if self.pending:
+            self.pending.cancel()
+            self.pending = None
+        if self.current:
+            self.current.cancel()
+            self.current = None
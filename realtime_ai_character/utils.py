@@ -1,15 +1,23 @@
 import asyncio
+import os
+import threading
+from collections import OrderedDict
 from dataclasses import field
-from time import perf_counter
-from typing import List, Optional, Callable
+from functools import cache
+from time import monotonic, perf_counter
+from typing import Any, Hashable, List, Optional, Callable, TYPE_CHECKING
 
-from langchain.schema import AIMessage, BaseMessage, HumanMessage, SystemMessage
 from pydantic.dataclasses import dataclass
 from starlette.websockets import WebSocket, WebSocketState
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from realtime_ai_character.models.interaction import Interaction
 from realtime_ai_character.logger import get_logger
 
+if TYPE_CHECKING:
+    from langchain.schema import BaseMessage
+    from sqlalchemy.ext.asyncio import AsyncSession
+
 
 @dataclass
 class Character:
@@ -28,11 +36,70 @@ class Character:
     data: Optional[dict] = None
 
 
+# Token budget for the summary and the verbatim turns sent with every request. The system
+# prompt, retrieved context and the user input are not counted.
+HISTORY_TOKEN_BUDGET = int(os.getenv('HISTORY_TOKEN_BUDGET', 2000))
+# Upper bound of turns restored from the database when resuming a session.
+HISTORY_MAX_LOADED_TURNS = int(os.getenv('HISTORY_MAX_LOADED_TURNS', 100))
+# Streamed tokens are sent in one frame per flush interval, or sooner once this many bytes
+# are pending. The first token of a reply is sent right away. 0 sends every token on its own.
+TOKEN_FLUSH_INTERVAL = float(os.getenv('TOKEN_FLUSH_INTERVAL_MS', 20)) / 1000
+TOKEN_FLUSH_BYTES = int(os.getenv('TOKEN_FLUSH_BYTES', 512))
+
+
+# Set once an encoding failed to load, e.g. offline, so that no later call tries again.
+_tokenizer_unavailable = False
+
+
+@cache
+def get_tokenizer(model: str):
+    """Return a cached tiktoken encoding for the model, or None if it can't be loaded.
+
+    tiktoken downloads the encoding the first time it is used, the llm warm-up step loads
+    it before sessions count tokens on the event loop.
+    """
+    global _tokenizer_unavailable
+    if _tokenizer_unavailable:
+        return None
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            # Claude, llama and local models: cl100k_base is a close enough estimate.
+            return tiktoken.get_encoding('cl100k_base')
+    except Exception as e:
+        get_logger(__name__).warning(f'No tokenizer for {model}, estimating token counts: '
+                                     f'{e!r}')
+        _tokenizer_unavailable = True
+        return None
+
+
+def count_tokens(text: str, model: str = 'gpt-3.5-turbo') -> int:
+    tokenizer = get_tokenizer(model)
+    if tokenizer is None:
+        return len(text) // 4 + 1
+    return len(tokenizer.encode(text, disallowed_special=()))
+
+
 @dataclass
 class ConversationHistory:
     system_prompt: str = ''
     user: list[str] = field(default_factory=list)
     ai: list[str] = field(default_factory=list)
+    # Model whose tokenizer counts the history.
+    model: str = 'gpt-3.5-turbo'
+    # Token count of every turn, user and ai message together.
+    turn_tokens: list[int] = field(default_factory=list)
+    # Rolling summary of the first summarized_turns turns.
+    summary: str = ''
+    summary_tokens: int = 0
+    summarized_turns: int = 0
+    # Prompt messages of every turn, extended as turns are appended. Callers get a fresh
+    # list of the same message objects, so appending to it never touches the cache.
+    _messages: list = field(default_factory=list, init=False, repr=False, compare=False)
+    # (system_prompt, summary, messages) the cached prompt header was built from.
+    _header: tuple = field(default=('', '', []), init=False, repr=False, compare=False)
 
     def __iter__(self):
         yield self.system_prompt
@@ -40,23 +107,80 @@ class ConversationHistory:
             yield user_message
             yield ai_message
 
+    def __len__(self):
+        return len(self.turn_tokens)
+
+    def append(self, user_message: str, ai_message: str):
+        user_message, ai_message = user_message or '', ai_message or ''
+        self.user.append(user_message)
+        self.ai.append(ai_message)
+        self.turn_tokens.append(count_tokens(user_message, self.model) +
+                                count_tokens(ai_message, self.model))
+
+    def set_summary(self, summary: str, summarized_turns: int):
+        self.summary = summary
+        self.summary_tokens = count_tokens(summary, self.model)
+        self.summarized_turns = summarized_turns
+
+    def window_start(self, token_budget: int = HISTORY_TOKEN_BUDGET) -> int:
+        """Index of the oldest turn that fits in the budget, walking back from the latest.
+
+        The latest turn is always kept. Turns before summarized_turns are never included,
+        the summary covers them.
+        """
+        budget = token_budget - (self.summary_tokens if self.summary else 0)
+        start = len(self.turn_tokens)
+        while start > self.summarized_turns and (
+                start == len(self.turn_tokens) or self.turn_tokens[start - 1] <= budget):
+            budget -= self.turn_tokens[start - 1]
+            start -= 1
+        return start
+
+    @staticmethod
+    def _load_statement(session_id: str):
+        return (
+            select(Interaction.client_message_unicode, Interaction.server_message_unicode)
+            .where(Interaction.session_id == session_id)
+            .order_by(Interaction.timestamp.desc(), Interaction.id.desc())
+            .limit(HISTORY_MAX_LOADED_TURNS))
+
     def load_from_db(self, session_id: str, db: Session):
-        conversations = db.query(Interaction).filter(Interaction.session_id == session_id).all()
-        for conversation in conversations:
-            self.user.append(conversation.client_message_unicode)
-            self.ai.append(conversation.server_message_unicode)
+        self._load(db.execute(self._load_statement(session_id)).all())
+
+    async def aload_from_db(self, session_id: str, db: 'AsyncSession'):
+        self._load((await db.execute(self._load_statement(session_id))).all())
+
+    def _load(self, conversations):
+        # Turns older than the window stay until the summarizer has folded them into the
+        # summary, see HistorySummarizer.schedule().
+        for client_message, server_message in reversed(conversations):
+            self.append(client_message, server_message)
 
+    def messages(self, token_budget: int = HISTORY_TOKEN_BUDGET) -> List['BaseMessage']:
+        """Prompt messages: system prompt, rolling summary and the most recent turns that fit
+        in the token budget. Turns that fall out of the window before they are summarized
+        are left out until the summary catches up.
 
-def build_history(conversation_history: ConversationHistory) -> List[BaseMessage]:
-    history = []
-    for i, message in enumerate(conversation_history):
-        if i == 0:
-            history.append(SystemMessage(content=message))
-        elif i % 2 == 0:
-            history.append(AIMessage(content=message))
-        else:
-            history.append(HumanMessage(content=message))
-    return history
+        Only turns appended since the last call are converted to messages.
+        """
+        from langchain.schema import AIMessage, HumanMessage, SystemMessage
+
+        for i in range(len(self._messages) // 2, len(self)):
+            self._messages.append(HumanMessage(content=self.user[i]))
+            self._messages.append(AIMessage(content=self.ai[i]))
+        if self._header[:2] != (self.system_prompt, self.summary):
+            header = [SystemMessage(content=self.system_prompt)]
+            if self.summary:
+                header.append(SystemMessage(
+                    content=f'Summary of the earlier conversation: {self.summary}'))
+            self._header = (self.system_prompt, self.summary, header)
+        return self._header[2] + self._messages[2 * self.window_start(token_budget):]
+
+
+def build_history(conversation_history: ConversationHistory,
+                  token_budget: int = HISTORY_TOKEN_BUDGET) -> List['BaseMessage']:
+    """Build the prompt history for one LLM call. The list is the caller's to extend."""
+    return conversation_history.messages(token_budget)
 
 
 class Singleton:
@@ -77,20 +201,141 @@ class Singleton:
             cls._instances[cls] = cls(*args, **kwargs)
 
 
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after ttl seconds."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at < monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __contains__(self, key: Hashable) -> bool:
+        sentinel = object()
+        return self.get(key, sentinel) is not sentinel
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class TokenCoalescer:
+    """Tokens of the reply streaming to one websocket, waiting to be sent as one frame."""
+
+    def __init__(self, websocket: WebSocket, send: Callable):
+        self.websocket = websocket
+        self.send = send
+        self.pending: List[str] = []
+        self.pending_bytes = 0
+        self.flush_task: Optional[asyncio.Task] = None
+        self.lock = asyncio.Lock()
+
+    async def add(self, token: str):
+        self.pending.append(token)
+        self.pending_bytes += len(token.encode())
+        if self.pending_bytes >= TOKEN_FLUSH_BYTES:
+            await self.flush()
+        elif self.flush_task is None:
+            self.flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(TOKEN_FLUSH_INTERVAL)
+        self.flush_task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            get_logger(__name__).debug(f'Failed to flush tokens: {e!r}')
+
+    async def flush(self):
+        async with self.lock:
+            if not self.pending:
+                return
+            message = ''.join(self.pending)
+            self.pending.clear()
+            self.pending_bytes = 0
+            await self.send(message, self.websocket)
+
+    async def close(self):
+        # A running flush is not cancelled mid-send, close() waits for it instead.
+        if self.flush_task:
+            self.flush_task.cancel()
+            self.flush_task = None
+        await self.flush()
+
+    def discard(self):
+        if self.flush_task:
+            self.flush_task.cancel()
+            self.flush_task = None
+        self.pending.clear()
+
+
 class ConnectionManager(Singleton):
     def __init__(self):
         self.active_connections: List[WebSocket] = []
+        self.token_coalescers: dict = {}
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
         self.active_connections.append(websocket)
 
     async def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        # Sessions disconnect on every exit, the websocket route may have done it already.
+        if websocket in self.active_connections:
+            self.active_connections.remove(websocket)
+        self.discard_tokens(websocket)
         print(f"Client #{id(websocket)} left the chat")
         # await self.broadcast_message(f"Client #{id(websocket)} left the chat")
 
     async def send_message(self, message: str, websocket: WebSocket):
+        # Tokens streamed so far go first, the message ends the reply they belong to.
+        await self.flush_tokens(websocket)
+        await self._send(message, websocket)
+
+    async def send_token(self, token: str, websocket: WebSocket):
+        """Send a streamed token, coalesced with the tokens that follow it shortly."""
+        if TOKEN_FLUSH_INTERVAL <= 0:
+            return await self._send(token, websocket)
+        coalescer = self.token_coalescers.get(websocket)
+        if coalescer is None:
+            # The first token of a reply is not held back.
+            self.token_coalescers[websocket] = TokenCoalescer(websocket, self._send)
+            return await self._send(token, websocket)
+        await coalescer.add(token)
+
+    async def flush_tokens(self, websocket: WebSocket):
+        """Send the pending tokens, the next token starts a new reply."""
+        coalescer = self.token_coalescers.pop(websocket, None)
+        if coalescer:
+            await coalescer.close()
+
+    def discard_tokens(self, websocket: WebSocket):
+        coalescer = self.token_coalescers.pop(websocket, None)
+        if coalescer:
+            coalescer.discard()
+
+    async def _send(self, message: str, websocket: WebSocket):
         if websocket.application_state == WebSocketState.CONNECTED:
             await websocket.send_text(message)
 
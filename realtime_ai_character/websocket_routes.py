@@ -1,14 +1,16 @@
 import asyncio
 import os
-import uuid
 
 from dataclasses import dataclass
-from fastapi import APIRouter, Depends, HTTPException, Path, WebSocket, WebSocketDisconnect, Query
-from firebase_admin import auth
-from firebase_admin.exceptions import FirebaseError
+from typing import TYPE_CHECKING, Optional
+from fastapi import APIRouter, HTTPException, Path, WebSocket, WebSocketDisconnect, Query
+from starlette.websockets import WebSocketState
 
-from requests import Session
+from sqlalchemy import select
 
+from realtime_ai_character.admission import get_admission_controller
+from realtime_ai_character.audio.framing import (FramedAudioOutput, negotiate_audio_framing,
+                                                 new_message_id)
 from realtime_ai_character.audio.speech_to_text import (SpeechToText,
                                                         get_speech_to_text)
 from realtime_ai_character.audio.text_to_speech import (TextToSpeech,
@@ -16,15 +18,24 @@ from realtime_ai_character.audio.text_to_speech import (TextToSpeech,
 from realtime_ai_character.character_catalog.catalog_manager import (
     CatalogManager, get_catalog_manager)
 from realtime_ai_character.memory.memory_manager import (MemoryManager, get_memory_manager)
-from realtime_ai_character.database.connection import get_db
-from realtime_ai_character.llm import get_llm, LLM
-from realtime_ai_character.llm.base import AsyncCallbackAudioHandler, AsyncCallbackTextHandler
+from realtime_ai_character.database.connection import async_session
+from realtime_ai_character.database.interaction_writer import get_interaction_writer
+from realtime_ai_character.llm import get_llm
 from realtime_ai_character.logger import get_logger
 from realtime_ai_character.models.interaction import Interaction
 from realtime_ai_character.models.quivr_info import QuivrInfo
+from realtime_ai_character.provider_limiter import get_provider_limits_report
+from realtime_ai_character.readiness import get_readiness
+from realtime_ai_character.session_events import (AudioFrame, Command, Disconnected, FrameParser,
+                                                  InterimTranscript, SpeechFinished,
+                                                  TextMessage)
+from realtime_ai_character.speculation import Speculation, Speculator, get_speculation_stats
 from realtime_ai_character.utils import (ConversationHistory, build_history,
                                          get_connection_manager, get_timer)
 
+if TYPE_CHECKING:
+    from realtime_ai_character.llm.base import LLM
+
 logger = get_logger(__name__)
 
 router = APIRouter()
@@ -33,6 +44,9 @@ manager = get_connection_manager()
 
 timer = get_timer()
 
+# Frames read ahead of the turn executor, the reader waits when the queue is full.
+EVENT_QUEUE_SIZE = 64
+
 GREETING_TXT_MAP = {
     "en-US": "Hi, my friend, what brings you here today?",
     "es-ES": "Hola, mi amigo, ¿qué te trae por aquí hoy?",
@@ -50,6 +64,9 @@ GREETING_TXT_MAP = {
 
 async def get_current_user(token: str):
     """Heler function for auth with Firebase."""
+    from firebase_admin import auth
+    from firebase_admin.exceptions import FirebaseError
+
     if not token:
         return ""
     try:
@@ -61,13 +78,17 @@ async def get_current_user(token: str):
 
     return decoded_token['uid']
 
+def log_task_error(task: asyncio.Task):
+    if not task.cancelled() and task.exception():
+        logger.error(f'{task.get_coro().__qualname__} failed: {task.exception()!r}')
+
 @dataclass
 class SessionAuthResult:
     is_existing_session: bool
     is_authenticated_user: bool
 
 
-async def check_session_auth(session_id: str, user_id: str, db: Session) -> SessionAuthResult:
+async def check_session_auth(session_id: str, user_id: str) -> SessionAuthResult:
     """
     Helper function to check if the session is authenticated.
     """
@@ -77,8 +98,9 @@ async def check_session_auth(session_id: str, user_id: str, db: Session) -> Sess
             is_authenticated_user=True,
         )
     try:
-        original_chat = await asyncio.to_thread(
-            db.query(Interaction).filter(Interaction.session_id == session_id).first)
+        async with async_session() as db:
+            original_chat = await db.scalar(
+                select(Interaction).where(Interaction.session_id == session_id).limit(1))
     except Exception as e:
         logger.info(f'Failed to lookup session {session_id} with error {e}')
         return SessionAuthResult(
@@ -101,6 +123,7 @@ async def check_session_auth(session_id: str, user_id: str, db: Session) -> Sess
             is_authenticated_user=False,
     )
 
+
 @router.websocket("/ws/{session_id}")
 async def websocket_endpoint(websocket: WebSocket,
                              session_id: str = Path(...),
@@ -114,11 +137,18 @@ async def websocket_endpoint(websocket: WebSocket,
                              use_search: bool = Query(default=False),
                              use_quivr: bool = Query(default=False),
                              use_multion: bool = Query(default=False),
-                             db: Session = Depends(get_db),
-                             catalog_manager=Depends(get_catalog_manager),
-                             memory_manager=Depends(get_memory_manager),
-                             speech_to_text=Depends(get_speech_to_text),
-                             default_text_to_speech=Depends(get_text_to_speech)):
+                             audio_framing: int = Query(default=0)):
+    # Components warm up in the background after startup. Ask the client to retry until
+    # they are ready, rather than initializing them on the event loop. Accept first, a close
+    # before the accept reaches the client as HTTP 403.
+    if not get_readiness().is_ready():
+        await websocket.accept()
+        await websocket.close(code=1013, reason="Warming up, try again later")
+        return
+    catalog_manager = get_catalog_manager()
+    memory_manager = get_memory_manager()
+    speech_to_text = get_speech_to_text()
+    default_text_to_speech = get_text_to_speech()
     # Default user_id to session_id. If auth is enabled and token is provided, use
     # the user_id from the token.
     user_id = str(session_id)
@@ -132,39 +162,81 @@ async def websocket_endpoint(websocket: WebSocket,
         except HTTPException:
             await websocket.close(code=1008, reason="Unauthorized")
             return
-    session_auth_result = await check_session_auth(session_id=session_id, user_id=user_id, db=db)
+    session_auth_result = await check_session_auth(session_id=session_id, user_id=user_id)
     if not session_auth_result.is_authenticated_user:
         logger.info(f'User #{user_id} is not authorized to access session {session_id}')
         await websocket.close(code=1008, reason="Unauthorized")
         return
 
-    llm = get_llm(model=llm_model)
-    await manager.connect(websocket)
+    # Keep the latency of admitted sessions, rather than slowing everyone down.
+    admission = get_admission_controller()
+    overloaded = admission.try_admit()
+    admitted = overloaded is None
     try:
+        # Accept even a refused connection: a close before the accept reaches the client
+        # as HTTP 403, not as 1013.
+        await manager.connect(websocket)
+        if overloaded:
+            if admission.can_queue():
+                admitted = await admission.wait_in_queue(websocket)
+            if not admitted:
+                admission.refuse(overloaded)
+                await manager.disconnect(websocket)
+                if websocket.application_state == WebSocketState.CONNECTED:
+                    await websocket.close(code=1013, reason="Server busy, try again later")
+                return
+
+        llm = get_llm(model=llm_model)
         main_task = asyncio.create_task(
-            handle_receive(websocket, session_id, user_id, db, llm, catalog_manager,
+            handle_receive(websocket, session_id, user_id, llm, catalog_manager,
                            memory_manager, character_id, platform, use_search, use_quivr,
                            use_multion, speech_to_text, default_text_to_speech, language,
-                           session_auth_result.is_existing_session))
+                           session_auth_result.is_existing_session,
+                           negotiate_audio_framing(audio_framing)))
 
         await asyncio.gather(main_task)
 
     except WebSocketDisconnect:
         await manager.disconnect(websocket)
         await manager.broadcast_message(f"User #{user_id} left the chat")
+    finally:
+        if admitted:
+            admission.leave()
 
 
-async def handle_receive(websocket: WebSocket, session_id: str, user_id: str, db: Session,
-                         llm: LLM, catalog_manager: CatalogManager, memory_manager: MemoryManager,
+async def handle_receive(websocket: WebSocket, session_id: str, user_id: str, llm: 'LLM',
+                         catalog_manager: CatalogManager, memory_manager: MemoryManager,
                          character_id: str, platform: str, use_search: bool, use_quivr: bool,
                          use_multion: bool, speech_to_text: SpeechToText,
                          default_text_to_speech: TextToSpeech,
-                         language: str, load_from_existing_session: bool = False):
+                         language: str, load_from_existing_session: bool = False,
+                         audio_framing: int = 0):
+    # Imported here to keep langchain out of the server's import time, the llm warm-up
+    # step has already loaded it by the time a session starts.
+    from realtime_ai_character.llm.base import (AsyncCallbackAudioHandler,
+                                                AsyncCallbackTextHandler,
+                                                get_cancellation_stats)
+    from realtime_ai_character.llm.history_summarizer import HistorySummarizer
+
+    conversation_history = ConversationHistory(model=llm.get_config()['model'])
+    history_summarizer = HistorySummarizer(conversation_history, llm)
+    speculator = None
+    tts_task = None
+    reader_task = None
+
+    async def get_quivr_info() -> Optional[QuivrInfo]:
+        if not use_quivr:
+            return None
+        async with async_session() as db:
+            return await db.scalar(select(QuivrInfo).where(QuivrInfo.user_id == user_id))
+
     try:
-        conversation_history = ConversationHistory()
         if load_from_existing_session:
             logger.info(f"User #{user_id} is loading from existing session {session_id}")
-            await asyncio.to_thread(conversation_history.load_from_db, session_id=session_id, db=db)
+            async with async_session() as db:
+                await conversation_history.aload_from_db(session_id=session_id, db=db)
+            # Fold the turns that don't fit in the window into the summary.
+            history_summarizer.schedule()
 
         # 0. Receive client platform info (web, mobile, terminal)
         if not platform:
@@ -175,13 +247,17 @@ async def handle_receive(websocket: WebSocket, session_id: str, user_id: str, db
 
         logger.info(f"User #{user_id}:{platform} connected to server with "
                     f"session_id {session_id}")
+        if audio_framing:
+            await manager.send_message(message=f'[audio_framing={audio_framing}]',
+                                       websocket=websocket)
 
         # 1. User selected a character
         character = None
         if character_id:
             character = catalog_manager.get_character(character_id)
+        catalog_snapshot = catalog_manager.snapshot
         character_list = [(character.name, character.character_id)
-                          for character in catalog_manager.characters.values()
+                          for character in catalog_snapshot.characters.values()
                           if character.source != 'community']
         character_name_list, character_id_list = zip(*character_list)
         while not character:
@@ -203,10 +279,10 @@ async def handle_receive(websocket: WebSocket, session_id: str, user_id: str, db
                 if selection > len(character_list) or selection < 1:
                     await manager.send_message(
                         message=f"Invalid selection. Select your character ["
-                        f"{', '.join(catalog_manager.characters.keys())}]\n",
+                        f"{', '.join(catalog_snapshot.characters.keys())}]\n",
                         websocket=websocket)
                     continue
-                character = catalog_manager.get_character(
+                character = catalog_snapshot.characters.get(
                     character_id_list[selection - 1])
                 character_id = character_id_list[selection - 1]
 
@@ -221,109 +297,127 @@ async def handle_receive(websocket: WebSocket, session_id: str, user_id: str, db
             f"User #{user_id} selected character: {character.name}")
 
         tts_event = asyncio.Event()
-        tts_task = None
         previous_transcript = None
         token_buffer = []
 
+        # Audio of the reply in flight, dropped when it is interrupted
+        audio_output = None
+
+        def new_audio_output(message_id: str) -> FramedAudioOutput:
+            nonlocal audio_output
+            audio_output = FramedAudioOutput(websocket, message_id, text_to_speech.codec,
+                                             audio_framing)
+            return audio_output
+
         # Greet the user
         greeting_text = GREETING_TXT_MAP[language]
         await manager.send_message(message=greeting_text, websocket=websocket)
-        tts_task = asyncio.create_task(
-            text_to_speech.stream(
+
+        async def greet(output: FramedAudioOutput):
+            await text_to_speech.stream(
                 text=greeting_text,
-                websocket=websocket,
+                websocket=output,
                 tts_event=tts_event,
                 voice_id=character.voice_id,
                 first_sentence=True,
                 language=language
-            ))
+            )
+            await output.end()
+
+        tts_task = asyncio.create_task(greet(new_audio_output(new_message_id())))
         # Send end of the greeting so the client knows when to start listening
         await manager.send_message(message='[end]\n', websocket=websocket)
 
         async def on_new_token(token):
-            return await manager.send_message(message=token,
-                                              websocket=websocket)
+            return await manager.send_token(token, websocket=websocket)
 
-        async def stop_audio():
+        def interrupt():
+            """Stop the reply in flight and keep its partial text in the history."""
+            nonlocal previous_transcript
             if tts_task and not tts_task.done():
                 tts_event.set()
                 tts_task.cancel()
+                if audio_output:
+                    audio_output.cancel()
                 if previous_transcript:
-                    conversation_history.user.append(previous_transcript)
-                    conversation_history.ai.append(' '.join(token_buffer))
+                    conversation_history.append(previous_transcript, ''.join(token_buffer))
+                    previous_transcript = None
+                    history_summarizer.schedule()
                     token_buffer.clear()
+
+        async def stop_audio():
+            interrupt()
+            if tts_task:
                 try:
                     await tts_task
                 except asyncio.CancelledError:
                     pass
-                tts_event.clear()
-
-        speech_recognition_interim = False
-        current_speech = ''
-
-        while True:
-            data = await websocket.receive()
-            if data['type'] != 'websocket.receive':
-                raise WebSocketDisconnect('disconnected')
-            # handle text message
-            if 'text' in data:
-                timer.start("LLM First Token")
-                msg_data = data['text']
-                # Handle client side commands
-                if msg_data.startswith('[!'):
-                    command_end = msg_data.find(']')
-                    command = msg_data[2:command_end]
-                    command_content = msg_data[command_end + 1:]
-                    if command == 'USE_SEARCH':
-                        use_search = (command_content == 'true')
-                    continue
-                # 0. itermidiate transcript starts with [&]
-                if msg_data.startswith('[&]'):
-                    logger.info(f'intermediate transcript: {msg_data}')
-                    if not os.getenv('EXPERIMENT_CONVERSATION_UTTERANCE', ''):
-                        continue
-                    asyncio.create_task(stop_audio())
-                    asyncio.create_task(
-                        llm.achat_utterances(
-                            history=build_history(conversation_history),
-                            user_input=msg_data,
-                            callback=AsyncCallbackTextHandler(
-                                on_new_token, []),
-                            audioCallback=AsyncCallbackAudioHandler(
-                                text_to_speech, websocket, tts_event,
-                                character.voice_id)))
-                    continue
-                # 1. Whether client will send speech interim audio clip in the next message.
-                if msg_data.startswith('[&Speech]'):
-                    speech_recognition_interim = True
-                    continue
-
-                # 2. If client finished speech, use the sentence as input.
-                if msg_data.startswith('[SpeechFinished]'):
-                    msg_data = current_speech
-                    logger.info(f"Full transcript: {current_speech}")
-                    # Stop recognizing next audio as interim.
-                    speech_recognition_interim = False
-                    # Filter noises
-                    if not current_speech:
-                        continue
-
-                    await manager.send_message(
-                        message=f'[+]You said: {current_speech}', websocket=websocket)
-                    current_speech = ''
+                except Exception:
+                    # Logged by log_task_error.
+                    pass
+            # Tokens of the interrupted reply go out now, the next reply starts afresh.
+            await manager.flush_tokens(websocket)
+            tts_event.clear()
+
+        async def speculate(transcript: str, speculation: Speculation) -> str:
+            quivr_info = await get_quivr_info()
+
+            async def on_speculative_token(token):
+                # Once committed, it is the reply in flight: an interruption keeps its text.
+                (token_buffer if speculation.output.committed else speculation.tokens).append(
+                    token)
+                return await manager.send_token(token, websocket=speculation.output)
+
+            audio = FramedAudioOutput(speculation.output, speculation.message_id,
+                                      text_to_speech.codec, audio_framing)
+            response = await llm.achat(
+                history=build_history(conversation_history),
+                user_input=transcript,
+                user_input_template=user_input_template,
+                callback=AsyncCallbackTextHandler(on_speculative_token),
+                audioCallback=AsyncCallbackAudioHandler(
+                    text_to_speech, audio, speculation.tts_event, character.voice_id,
+                    language),
+                character=character,
+                useSearch=use_search,
+                useQuivr=use_quivr,
+                quivrApiKey=quivr_info.quivr_api_key if quivr_info else None,
+                quivrBrainId=quivr_info.quivr_brain_id if quivr_info else None,
+                useMultiOn=use_multion,
+                metadata={"message_id": speculation.message_id})
+            await audio.end()
+            return response
+
+        async def text_turn(msg_data: str, speculation: Optional[Speculation]):
+            """Reply to a text message. Runs as a task, so that the next message can
+            interrupt it."""
+            nonlocal previous_transcript
+            response = None
+            # Release the speculative reply if it was generated for this input
+            if speculation:
+                message_id = speculation.message_id
+                token_buffer.extend(speculation.tokens)
+                try:
+                    await speculation.output.commit()
+                    response = await speculation.task
+                except Exception as e:
+                    logger.error(f'Speculative reply failed, regenerating: {e}')
+                    token_buffer.clear()
+                finally:
+                    # Its last tokens go out before the end of the reply, or before the
+                    # next one if it is interrupted. This also closes its token coalescer.
+                    await manager.flush_tokens(speculation.output)
 
+            if response is None:
                 # 2. Send "thinking" status over websocket
                 if use_search or use_quivr:
                     await manager.send_message(message='[thinking]\n',
                                                websocket=websocket)
 
                 # 3. Send message to LLM
-                if use_quivr:
-                    quivr_info = await asyncio.to_thread(
-                        db.query(QuivrInfo).filter(QuivrInfo.user_id == user_id).first)
-                else:
-                    quivr_info = None
-                message_id = str(uuid.uuid4().hex)[:16]
+                quivr_info = await get_quivr_info()
+                message_id = new_message_id()
+                audio = new_audio_output(message_id)
                 response = await llm.achat(
                     history=build_history(conversation_history),
                     user_input=msg_data,
@@ -331,7 +425,7 @@ async def handle_receive(websocket: WebSocket, session_id: str, user_id: str, db
                     callback=AsyncCallbackTextHandler(on_new_token,
                                                       token_buffer),
                     audioCallback=AsyncCallbackAudioHandler(
-                        text_to_speech, websocket, tts_event, character.voice_id),
+                        text_to_speech, audio, tts_event, character.voice_id, language),
                     character=character,
                     useSearch=use_search,
                     useQuivr=use_quivr,
@@ -339,16 +433,52 @@ async def handle_receive(websocket: WebSocket, session_id: str, user_id: str, db
                     quivrBrainId=quivr_info.quivr_brain_id if quivr_info else None,
                     useMultiOn=use_multion,
                     metadata={"message_id": message_id})
-
-                # 3. Send response to client
-                await manager.send_message(message=f'[end={message_id}]\n',
-                                           websocket=websocket)
-
-                # 4. Update conversation history
-                conversation_history.user.append(msg_data)
-                conversation_history.ai.append(response)
+                await audio.end()
+
+            # 3. Send response to client
+            await manager.send_message(message=f'[end={message_id}]\n',
+                                       websocket=websocket)
+
+            # 4. Update conversation history
+            conversation_history.append(msg_data, response)
+            previous_transcript = None
+            history_summarizer.schedule()
+            token_buffer.clear()
+            # 5. Persist interaction in the database
+            tools = []
+            if use_search:
+                tools.append('search')
+            if use_quivr:
+                tools.append('quivr')
+            if use_multion:
+                tools.append('multion')
+            interaction = Interaction(user_id=user_id,
+                        session_id=session_id,
+                        client_message_unicode=msg_data,
+                        server_message_unicode=response,
+                        platform=platform,
+                        action_type='text',
+                        character_id=character_id,
+                        tools=','.join(tools),
+                        language=language,
+                        message_id=message_id,
+                        llm_config=llm.get_config())
+            await get_interaction_writer().put(interaction)
+
+        async def voice_turn(transcript: str):
+            """Reply to a transcribed utterance, with the reply spoken by text to speech."""
+            message_id = new_message_id()
+            async def tts_task_done_call_back(response):
+                nonlocal previous_transcript
+                # Send response to client, [=] indicates the response is done
+                await manager.send_message(message='[=]',
+                                             websocket=websocket)
+                # Update conversation history
+                conversation_history.append(transcript, response)
+                previous_transcript = None
+                history_summarizer.schedule()
                 token_buffer.clear()
-                # 5. Persist interaction in the database
+                # Persist interaction in the database
                 tools = []
                 if use_search:
                     tools.append('search')
@@ -357,33 +487,132 @@ async def handle_receive(websocket: WebSocket, session_id: str, user_id: str, db
                 if use_multion:
                     tools.append('multion')
                 interaction = Interaction(user_id=user_id,
-                            session_id=session_id,
-                            client_message_unicode=msg_data,
-                            server_message_unicode=response,
-                            platform=platform,
-                            action_type='text',
-                            character_id=character_id,
-                            tools=','.join(tools),
-                            language=language,
-                            message_id=message_id,
-                            llm_config=llm.get_config())
-                await asyncio.to_thread(interaction.save, db)
+                              session_id=session_id,
+                              client_message_unicode=transcript,
+                              server_message_unicode=response,
+                              platform=platform,
+                              action_type='audio',
+                              character_id=character_id,
+                              tools=','.join(tools),
+                              language=language,
+                              message_id=message_id,
+                              llm_config=llm.get_config())
+                await get_interaction_writer().put(interaction)
+
+            # 4. Send "thinking" status over websocket
+            if use_search or use_quivr:
+                await manager.send_message(message='[thinking]\n',
+                                             websocket=websocket)
+
+            # 5. Send message to LLM
+            quivr_info = await get_quivr_info()
+            audio = new_audio_output(message_id)
+            await llm.achat(history=build_history(conversation_history),
+                            user_input=transcript,
+                            user_input_template=user_input_template,
+                            callback=AsyncCallbackTextHandler(
+                                on_new_token, token_buffer,
+                                tts_task_done_call_back),
+                            audioCallback=AsyncCallbackAudioHandler(
+                                text_to_speech, audio, tts_event,
+                                character.voice_id, language),
+                            character=character,
+                            useSearch=use_search,
+                            useQuivr=use_quivr,
+                            useMultiOn=use_multion,
+                            quivrApiKey=quivr_info.quivr_api_key if quivr_info else None,
+                            quivrBrainId=quivr_info.quivr_brain_id if quivr_info else None)
+            await audio.end()
+
+        if os.getenv('EXPERIMENT_CONVERSATION_UTTERANCE', ''):
+            speculator = Speculator(websocket, speculate)
+
+        # The reader parses frames into events as they arrive and interrupts the reply in
+        # flight right away when new user input comes in. Events are then handled in order
+        # below. A new turn always interrupts the previous reply, whose partial text is
+        # kept in the history, and the latest input gets the reply.
+        events: asyncio.Queue = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+
+        async def read_frames():
+            parser = FrameParser()
+            while True:
+                try:
+                    data = await websocket.receive()
+                except Exception as e:
+                    logger.error(f'Failed to receive from websocket: {e!r}')
+                    data = {'type': 'websocket.disconnect'}
+                event = parser.parse(data)
+                if event is None:
+                    continue
+                if isinstance(event, (TextMessage, SpeechFinished)) or (
+                        isinstance(event, InterimTranscript) and speculator):
+                    interrupt()
+                await events.put(event)
+                if isinstance(event, Disconnected):
+                    return
+
+        reader_task = asyncio.create_task(read_frames())
+        reader_task.add_done_callback(log_task_error)
+
+        current_speech = ''
+
+        while True:
+            event = await events.get()
+            if isinstance(event, Disconnected):
+                raise WebSocketDisconnect('disconnected')
+            # Handle client side commands
+            if isinstance(event, Command):
+                if event.name == 'USE_SEARCH':
+                    use_search = (event.content == 'true')
+                continue
+            # 0. itermidiate transcript starts with [&]
+            if isinstance(event, InterimTranscript):
+                logger.info(f'intermediate transcript: {event.text}')
+                if not speculator:
+                    continue
+                # The user is speaking, stop the previous reply before speculating on the
+                # next one, it may add a partial turn to the history.
+                await stop_audio()
+                speculator.on_interim(event.text, len(conversation_history))
+                continue
+
+            # handle text message
+            if isinstance(event, (TextMessage, SpeechFinished)):
+                timer.start("LLM First Token")
+                if isinstance(event, TextMessage):
+                    msg_data = event.text
+                else:
+                    # If client finished speech, use the sentence as input.
+                    msg_data = current_speech
+                    logger.info(f"Full transcript: {current_speech}")
+                    # Filter noises
+                    if not current_speech:
+                        continue
+
+                    await manager.send_message(
+                        message=f'[+]You said: {current_speech}', websocket=websocket)
+                    current_speech = ''
+
+                speculation = (speculator.on_final(msg_data, len(conversation_history))
+                               if speculator else None)
+                # A new message interrupts the previous reply
+                await stop_audio()
+                previous_transcript = msg_data
+                tts_task = asyncio.create_task(text_turn(msg_data, speculation))
+                tts_task.add_done_callback(log_task_error)
 
             # handle binary message(audio)
-            elif 'bytes' in data:
-                binary_data = data['bytes']
+            elif isinstance(event, AudioFrame):
                 # 0. Handle interim speech.
-                if speech_recognition_interim:
+                if event.interim:
                     interim_transcript: str = (
-                        await asyncio.to_thread(
-                            speech_to_text.transcribe,
-                            binary_data,
+                        await speech_to_text.atranscribe(
+                            event.data,
                             platform=platform,
                             prompt=current_speech,
                             suppress_tokens=[0, 11, 13, 30],
                         )
                     ).strip()
-                    speech_recognition_interim = False
                     # Filter noises.
                     if not interim_transcript:
                         continue
@@ -392,8 +621,8 @@ async def handle_receive(websocket: WebSocket, session_id: str, user_id: str, db
                     continue
 
                 # 1. Transcribe audio
-                transcript: str = (await asyncio.to_thread(speech_to_text.transcribe,
-                    binary_data, platform=platform,
+                transcript: str = (await speech_to_text.atranscribe(
+                    event.data, platform=platform,
                     prompt=character.name)).strip()
 
                 # ignore audio that picks up background noise
@@ -411,69 +640,30 @@ async def handle_receive(websocket: WebSocket, session_id: str, user_id: str, db
                 await stop_audio()
 
                 previous_transcript = transcript
+                tts_task = asyncio.create_task(voice_turn(transcript))
+                tts_task.add_done_callback(log_task_error)
 
-                async def tts_task_done_call_back(response):
-                    # Send response to client, [=] indicates the response is done
-                    await manager.send_message(message='[=]',
-                                               websocket=websocket)
-                    # Update conversation history
-                    conversation_history.user.append(transcript)
-                    conversation_history.ai.append(response)
-                    token_buffer.clear()
-                    # Persist interaction in the database
-                    tools = []
-                    if use_search:
-                        tools.append('search')
-                    if use_quivr:
-                        tools.append('quivr')
-                    if use_multion:
-                        tools.append('multion')
-                    interaction = Interaction(user_id=user_id,
-                                session_id=session_id,
-                                client_message_unicode=transcript,
-                                server_message_unicode=response,
-                                platform=platform,
-                                action_type='audio',
-                                character_id=character_id,
-                                tools=','.join(tools),
-                                language=language,
-                                llm_config=llm.get_config())
-                    await asyncio.to_thread(interaction.save, db)
-
-                # 4. Send "thinking" status over websocket
-                if use_search or use_quivr:
-                    await manager.send_message(message='[thinking]\n',
-                                               websocket=websocket)
-
-                # 5. Send message to LLM
-                if use_quivr:
-                    quivr_info = await asyncio.to_thread(
-                        db.query(QuivrInfo).filter(QuivrInfo.user_id == user_id).first)
-                else:
-                    quivr_info = None
-                tts_task = asyncio.create_task(
-                    llm.achat(history=build_history(conversation_history),
-                              user_input=transcript,
-                              user_input_template=user_input_template,
-                              callback=AsyncCallbackTextHandler(
-                                  on_new_token, token_buffer,
-                                  tts_task_done_call_back),
-                              audioCallback=AsyncCallbackAudioHandler(
-                                  text_to_speech, websocket, tts_event,
-                                  character.voice_id),
-                              character=character,
-                              useSearch=use_search,
-                              useQuivr=use_quivr,
-                              useMultiOn=use_multion,
-                              quivrApiKey=quivr_info.quivr_api_key if quivr_info else None,
-                              quivrBrainId=quivr_info.quivr_brain_id if quivr_info else None))
-                
             # log latency info
             timer.report()
 
     except WebSocketDisconnect:
         logger.info(f"User #{user_id} closed the connection")
+    finally:
+        # Also when the session failed or was cancelled.
         timer.reset()
+        history_summarizer.cancel()
+        # Nobody is listening anymore, stop generating.
+        if tts_task:
+            tts_task.cancel()
+        if reader_task:
+            reader_task.cancel()
+        logger.info(f'Cancellation stats: {get_cancellation_stats().report()}')
+        logger.info(f'Provider limits: {get_provider_limits_report()}')
+        if speculator:
+            speculator.cancel()
+            logger.info(f'Speculation stats: {get_speculation_stats().report()}')
         await manager.disconnect(websocket)
+        # Write the session's turns before it is processed or resumed.
+        await get_interaction_writer().flush()
+        logger.info(f'Interaction writes: {get_interaction_writer().report()}')
         await memory_manager.process_session(session_id)
-        return
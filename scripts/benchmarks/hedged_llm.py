@@ -0,0 +1,169 @@
+"""Exercise hedged LLM requests against local stand-in OpenAI-compatible servers.
+
+Starts two streaming chat completion servers on localhost with configurable first-token
+delays, then sends requests through HedgedLlm and reports which server won, the time to
+first token seen by the callbacks and whether the losing stream was cancelled.
+
+    python scripts/benchmarks/hedged_llm.py --primary-delay 3 --secondary-delay 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def stand_in_server(name: str, first_token_delay: float, token_interval: float,
+                    events: dict):
+    """An OpenAI-compatible /v1/chat/completions endpoint that streams a canned reply."""
+    from fastapi import FastAPI
+    from fastapi.responses import StreamingResponse
+
+    app = FastAPI()
+    reply = f'{name}> Hello there. This reply comes from the {name} server.'.split(' ')
+
+    @app.post('/v1/chat/completions')
+    async def chat_completions(body: dict):
+        async def stream():
+            events[name]['started'] += 1
+            try:
+                await asyncio.sleep(first_token_delay)
+                for i, word in enumerate(reply):
+                    chunk = {'id': name, 'object': 'chat.completion.chunk', 'created': 0,
+                             'model': body.get('model', name),
+                             'choices': [{'index': 0, 'finish_reason': None,
+                                          'delta': {'content': word if i == 0 else ' ' + word}}]}
+                    yield f'data: {json.dumps(chunk)}\n\n'
+                    await asyncio.sleep(token_interval)
+                done = {'id': name, 'object': 'chat.completion.chunk', 'created': 0,
+                        'model': body.get('model', name),
+                        'choices': [{'index': 0, 'finish_reason': 'stop', 'delta': {}}]}
+                yield f'data: {json.dumps(done)}\n\ndata: [DONE]\n\n'
+                events[name]['completed'] += 1
+            except asyncio.CancelledError:
+                events[name]['cancelled'] += 1
+                raise
+        return StreamingResponse(stream(), media_type='text/event-stream')
+
+    return app
+
+
+def run_server(app, port: int):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning'))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+
+def stand_in_llm(url: str, model: str):
+    """An LLM that streams straight from the stand-in, without retrieval."""
+    from langchain.chat_models import ChatOpenAI
+    from langchain.schema import HumanMessage
+
+    from realtime_ai_character.llm.base import LLM, cancellable_llm_call
+
+    class StandInLlm(LLM):
+        def __init__(self):
+            self.chat_open_ai = ChatOpenAI(model=model, streaming=True, openai_api_base=url,
+                                           openai_api_key='stand-in', max_retries=0)
+            self.config = {'model': model}
+
+        def get_config(self):
+            return self.config
+
+        async def achat(self, history, user_input, callback, audioCallback, **kwargs):
+            await self.build_prompt(history, user_input, None, None)
+            return await self.generate(history, callback, audioCallback)
+
+        async def build_prompt(self, history, user_input, user_input_template, character,
+                               *args, **kwargs):
+            history.append(HumanMessage(content=user_input))
+
+        async def generate(self, history, callback, audioCallback, metadata=None):
+            async with cancellable_llm_call(callback, audioCallback):
+                response = await self.chat_open_ai.agenerate(
+                    [history], callbacks=[callback, audioCallback])
+            return response.generations[0][0].text
+
+    return StandInLlm()
+
+
+async def run_requests(llm, requests: int) -> list:
+    from realtime_ai_character.llm.base import AsyncCallbackAudioHandler, AsyncCallbackTextHandler
+
+    results = []
+    for _ in range(requests):
+        first_token = []
+        start = perf_counter()
+
+        async def on_new_token(token):
+            if not first_token:
+                first_token.append(perf_counter() - start)
+
+        class SilentTextToSpeech:
+            async def stream(self, *args, **kwargs):
+                pass
+
+        response = await llm.achat(
+            history=[], user_input='Hi!', user_input_template='{query}',
+            callback=AsyncCallbackTextHandler(on_new_token, []),
+            audioCallback=AsyncCallbackAudioHandler(SilentTextToSpeech(), None,
+                                                    asyncio.Event()))
+        results.append((response.split('>')[0], first_token[0] if first_token else None,
+                        perf_counter() - start))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--primary-delay', type=float, default=3.0,
+                        help='Seconds before the primary server streams its first token.')
+    parser.add_argument('--secondary-delay', type=float, default=0.2)
+    parser.add_argument('--token-interval', type=float, default=0.02)
+    parser.add_argument('--deadline', type=float, default=1.0,
+                        help='Seconds to wait for the primary before hedging.')
+    parser.add_argument('--requests', type=int, default=5)
+    args = parser.parse_args()
+
+    from realtime_ai_character.llm.hedged_llm import HedgedLlm, get_hedge_stats
+
+    events = {name: {'started': 0, 'completed': 0, 'cancelled': 0}
+              for name in ('primary', 'secondary')}
+    urls = {}
+    for name, delay in (('primary', args.primary_delay), ('secondary', args.secondary_delay)):
+        port = free_port()
+        run_server(stand_in_server(name, delay, args.token_interval, events), port)
+        urls[name] = f'http://127.0.0.1:{port}/v1'
+
+    llm = HedgedLlm(primary=stand_in_llm(urls['primary'], 'primary'),
+                    secondary=stand_in_llm(urls['secondary'], 'secondary'),
+                    deadline=args.deadline)
+    results = asyncio.run(run_requests(llm, args.requests))
+    # Give the servers a moment to notice closed streams.
+    time.sleep(0.5)
+
+    print(f'{"winner":<10s} {"first token":>12s} {"total":>8s}')
+    for winner, first_token, total in results:
+        first_token = f'{first_token:.3f}s' if first_token is not None else '-'
+        print(f'{winner:<10s} {first_token:>12s} {total:>7.3f}s')
+    print(f'\nstats: {get_hedge_stats().report()}')
+    for name, counts in events.items():
+        print(f'{name} server: {counts}')
+
+
+if __name__ == '__main__':
+    main()
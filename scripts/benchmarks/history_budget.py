@@ -0,0 +1,96 @@
+"""Measure prompt size and history build time against session length.
+
+Feeds synthetic turns into a ConversationHistory and reports, for growing session lengths,
+how many tokens build_history() sends with and without the token budget, and how long
+building the prompt takes. With --llm and an API key set, also measures time to first
+token of a real completion at every length.
+
+    python scripts/benchmarks/history_budget.py --turns 10 50 200 --budget 2000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from realtime_ai_character.utils import (ConversationHistory, build_history,  # noqa: E402
+                                          count_tokens)
+
+WORDS = ('the quick brown fox jumps over a lazy dog while talking about space travel '
+         'rockets electric cars and the future of humanity on mars').split()
+
+
+def synthetic_message(rng: random.Random, min_words: int, max_words: int) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words)))
+
+
+def make_history(turns: int, model: str, seed: int = 0) -> ConversationHistory:
+    rng = random.Random(seed)
+    history = ConversationHistory(system_prompt=synthetic_message(rng, 300, 400), model=model)
+    for _ in range(turns):
+        history.append(synthetic_message(rng, 5, 40), synthetic_message(rng, 20, 120))
+    return history
+
+
+def prompt_tokens(messages, model: str) -> int:
+    return sum(count_tokens(message.content, model) for message in messages)
+
+
+def time_build(history: ConversationHistory, budget: int, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        start = perf_counter()
+        build_history(history, budget)
+        timings.append(perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+async def first_token_latency(messages, model: str) -> float:
+    from langchain.schema import HumanMessage
+    from realtime_ai_character.llm import get_llm
+
+    llm = get_llm(model=model, hedge=False)
+    chat = llm.chat_anthropic if model.startswith('claude') else llm.chat_open_ai
+    start = perf_counter()
+    async for _ in chat.astream(messages + [HumanMessage(content='What did we talk about?')]):
+        return (perf_counter() - start) * 1000
+    return float('nan')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--turns', type=int, nargs='+', default=[10, 25, 50, 100, 200, 500])
+    parser.add_argument('--budget', type=int, default=2000)
+    parser.add_argument('--model', default='gpt-3.5-turbo-16k')
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--llm', action='store_true',
+                        help='Also measure time to first token against the real LLM API.')
+    args = parser.parse_args()
+
+    unbounded = 10 ** 9
+    header = f'{"turns":>6s} {"full tokens":>12s} {"window tokens":>14s} ' \
+             f'{"full build":>11s} {"window build":>13s}'
+    if args.llm:
+        header += f' {"full TTFT":>10s} {"window TTFT":>12s}'
+    print(header)
+    for turns in args.turns:
+        history = make_history(turns, args.model)
+        full = build_history(history, unbounded)
+        window = build_history(history, args.budget)
+        row = (f'{turns:>6d} {prompt_tokens(full, args.model):>12d} '
+               f'{prompt_tokens(window, args.model):>14d} '
+               f'{time_build(history, unbounded, args.runs):>9.2f}ms '
+               f'{time_build(history, args.budget, args.runs):>11.2f}ms')
+        if args.llm:
+            full_ttft = asyncio.run(first_token_latency(full, args.model))
+            window_ttft = asyncio.run(first_token_latency(window, args.model))
+            row += f' {full_ttft:>8.0f}ms {window_ttft:>10.0f}ms'
+        print(row)
+
+
+if __name__ == '__main__':
+    main()
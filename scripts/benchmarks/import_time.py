@@ -0,0 +1,82 @@
+"""Measure the import time of the server package and check it against a budget.
+
+Runs `python -X importtime -c "import <module>"` in fresh interpreters, parses the report
+and prints the slowest top-level packages. Exits with status 1 if the median import time
+exceeds the budget, or if a module that should be lazily imported shows up.
+
+    python scripts/benchmarks/import_time.py --budget-ms 1500
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+# Heavy optional dependencies that must only be imported when a backend is used.
+LAZY_MODULES = ['langchain', 'llama_index', 'chromadb', 'firebase_admin', 'google.cloud',
+                'multion', 'torch', 'faster_whisper', 'openai']
+
+
+def run_importtime(module: str) -> list[tuple[int, int, str]]:
+    """Return (self_us, cumulative_us, name) for every module imported."""
+    env = dict(os.environ)
+    env.setdefault('DATABASE_URL', 'sqlite:///./test.db')
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, env=env)
+    if result.returncode != 0:
+        sys.exit(f'Importing {module} failed:\n{result.stderr[-2000:]}')
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='realtime_ai_character.main')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=1500)
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args()
+
+    totals = []
+    per_package = defaultdict(list)
+    imported = set()
+    for _ in range(args.runs):
+        rows = run_importtime(args.module)
+        package_self = defaultdict(int)
+        for self_us, cumulative_us, name in rows:
+            name = name.strip()
+            imported.add(name)
+            package_self[name.split('.')[0]] += self_us
+            if name == args.module:
+                totals.append(cumulative_us / 1000)
+        for package, self_us in package_self.items():
+            per_package[package].append(self_us / 1000)
+
+    total_ms = statistics.median(totals)
+    print(f'{args.module}: median {total_ms:.1f}ms over {args.runs} runs '
+          f'(min {min(totals):.1f}ms, max {max(totals):.1f}ms), budget {args.budget_ms:.0f}ms')
+    print(f'\n{"package":<40s} {"median self time":>18s}')
+    ranked = sorted(per_package.items(), key=lambda item: -statistics.median(item[1]))
+    for package, times in ranked[:args.top]:
+        print(f'{package:<40s} {statistics.median(times):>16.1f}ms')
+
+    failed = False
+    eager = [module for module in LAZY_MODULES
+             if any(name == module or name.startswith(module + '.') for name in imported)]
+    if eager:
+        print(f'\nFAIL: imported at startup, should be lazy: {", ".join(eager)}')
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f'\nFAIL: import time {total_ms:.1f}ms exceeds budget {args.budget_ms:.0f}ms')
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
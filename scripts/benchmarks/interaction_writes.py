@@ -0,0 +1,96 @@
+"""Measure Interaction persistence under many concurrent sessions, with one commit per turn
+and with the write-behind InteractionWriter.
+
+Simulated sessions each persist a number of turns, pausing between them like a
+conversation would. Reports rows written per second and how long the turn loop is held up by
+persisting a turn (p50/p99), against DATABASE_URL (a temporary SQLite database by default;
+point it at a scratch Postgres database for realistic numbers):
+
+    python scripts/benchmarks/interaction_writes.py --sessions 1000 --turns 10
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+from time import perf_counter
+
+ROOT = os.path.join(os.path.dirname(__file__), '..', '..')
+sys.path.insert(0, ROOT)
+
+
+async def commit_per_turn(interaction):
+    from realtime_ai_character.database.connection import async_session
+
+    async with async_session() as db:
+        db.add(interaction)
+        await db.commit()
+
+
+async def write_behind(interaction):
+    from realtime_ai_character.database.interaction_writer import get_interaction_writer
+
+    await get_interaction_writer().put(interaction)
+
+
+async def session(index: int, turns: int, turn_interval: float, persist) -> list:
+    from realtime_ai_character.models.interaction import Interaction
+
+    stalls = []
+    for turn in range(turns):
+        interaction = Interaction(user_id=f'bench-user-{index}', session_id=f'bench-{index}',
+                                  client_message_unicode=f'Question {turn}?',
+                                  server_message_unicode='An answer. ' * 20,
+                                  platform='web', action_type='text', llm_config={})
+        start = perf_counter()
+        await persist(interaction)
+        stalls.append(perf_counter() - start)
+        await asyncio.sleep(turn_interval)
+    return stalls
+
+
+async def run(sessions: int, turns: int, turn_interval: float, persist) -> dict:
+    from realtime_ai_character.database.interaction_writer import get_interaction_writer
+
+    start = perf_counter()
+    results = await asyncio.gather(*(session(i, turns, turn_interval, persist)
+                                     for i in range(sessions)))
+    if persist is write_behind:
+        await get_interaction_writer().flush()
+    elapsed = perf_counter() - start
+    stalls = sorted(stall for stalls in results for stall in stalls)
+    return {'rows_per_second': len(stalls) / elapsed,
+            'stall_p50_ms': statistics.median(stalls) * 1000,
+            'stall_p99_ms': stalls[int(len(stalls) * 0.99)] * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=1000)
+    parser.add_argument('--turns', type=int, default=10)
+    parser.add_argument('--turn-interval-ms', type=float, default=50)
+    args = parser.parse_args()
+
+    if not os.getenv('DATABASE_URL'):
+        path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    from realtime_ai_character.database.base import Base
+    from realtime_ai_character.database.connection import engine
+    from realtime_ai_character.models.interaction import Interaction
+    Base.metadata.create_all(engine, tables=[Interaction.__table__])
+
+    asyncio.run(compare(args.sessions, args.turns, args.turn_interval_ms / 1000))
+
+
+async def compare(sessions: int, turns: int, turn_interval: float):
+    # One loop for both, the async engine and the writer belong to the loop.
+    print(f'{"mode":>16s} {"rows/s":>8s} {"stall p50":>10s} {"stall p99":>10s}')
+    for name, persist in (('commit per turn', commit_per_turn), ('write-behind', write_behind)):
+        result = await run(sessions, turns, turn_interval, persist)
+        print(f'{name:>16s} {result["rows_per_second"]:>8.0f} '
+              f'{result["stall_p50_ms"]:>8.2f}ms {result["stall_p99_ms"]:>8.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""Compare TTS chunking of streamed replies: the sentence segmenter against the old rule.
+
+Replays token streams at a fixed inter-token interval (or at their recorded timestamps) and
+reports when the first chunk is ready for text to speech, how many chunks a reply is split
+into and the longest chunk. Streams come from a JSONL file, one per line, either a list of
+tokens, a list of [token, seconds] pairs or {"language": ..., "tokens": [...]}. Without a
+file, built-in sample replies are tokenized with tiktoken.
+
+    python scripts/benchmarks/segmenter.py --interval-ms 30
+    python scripts/benchmarks/segmenter.py --streams recorded.jsonl
+
+The expected chunking of known streams is tested in tests/test_segmenter.py.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from realtime_ai_character.audio.text_to_speech.segmenter import SentenceSegmenter  # noqa: E402
+
+SAMPLES = [
+    ('en-US', 'Well, I think going to Mars is not just a dream, it is a necessity. We need to '
+     'become a multiplanetary species, otherwise we are just waiting for an extinction event. '
+     'A Starship launch could eventually cost around $2.5 million, which is insane compared to '
+     'what NASA paid for the Space Shuttle. Mr. Bezos might disagree... but that is fine!\n'
+     '"Really?" you might ask. Yes, really.'),
+    ('en-US', 'Ha! You caught me at a good time. I was just reading about the 3.7 billion year '
+     'old fossils found in Greenland, e.g. stromatolites, which are layered structures made by '
+     'microbes. Isn\'t that wild? Life got started remarkably early on Earth; it makes you '
+     'wonder what we will find on Mars.'),
+    ('zh-CN', '你好，我是埃隆。今天我们来聊聊火星吧！你知道吗？火星上的一天比地球长大约四十分钟。'
+     '我认为人类应该成为多行星物种，这样才能保证文明的延续。'),
+]
+
+class LegacySegmenter:
+    """The old rule: flush only on a token that is exactly '.', '?' or '!'."""
+
+    def __init__(self, *args, **kwargs):
+        self.current_sentence = ''
+
+    def feed(self, token: str):
+        if token not in {'.', '?', '!'}:
+            self.current_sentence += token
+            return []
+        sentence, self.current_sentence = self.current_sentence, ''
+        return [sentence]
+
+    def flush(self):
+        return [self.current_sentence] if self.current_sentence else []
+
+
+def tokenize(text: str) -> list:
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding('cl100k_base')
+        return [encoding.decode([token]) for token in encoding.encode(text)]
+    except ImportError:
+        return re.findall(r'\s*\w+|\s*[^\w\s]+|\s+', text)
+
+
+def load_streams(path: str, interval: float) -> list:
+    streams = []
+    if not path:
+        for language, text in SAMPLES:
+            tokens = tokenize(text)
+            streams.append((language, [(token, i * interval) for i, token in enumerate(tokens)]))
+        return streams
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            language = 'en-US'
+            if isinstance(record, dict):
+                language, record = record.get('language', language), record['tokens']
+            if record and isinstance(record[0], list):
+                stream = [(token, float(t)) for token, t in record]
+            else:
+                stream = [(token, i * interval) for i, token in enumerate(record)]
+            streams.append((language, stream))
+    return streams
+
+
+def replay(segmenter_class, language: str, stream: list) -> dict:
+    segmenter = segmenter_class(language=language)
+    chunks, first_chunk_at, cpu = [], None, 0.0
+    for token, arrived_at in stream:
+        start = perf_counter()
+        ready = segmenter.feed(token)
+        cpu += perf_counter() - start
+        if ready and first_chunk_at is None:
+            first_chunk_at = arrived_at
+        chunks.extend(ready)
+    chunks.extend(segmenter.flush())
+    if first_chunk_at is None:
+        first_chunk_at = stream[-1][1]
+    return {'first_chunk_at': first_chunk_at, 'chunks': len(chunks),
+            'max_chunk': max((len(chunk) for chunk in chunks), default=0),
+            'cpu_per_token_us': cpu / len(stream) * 1e6}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--streams', default='', help='JSONL file of recorded token streams.')
+    parser.add_argument('--interval-ms', type=float, default=30,
+                        help='Inter-token interval for streams without timestamps.')
+    args = parser.parse_args()
+
+    streams = load_streams(args.streams, args.interval_ms / 1000)
+    print(f'{"segmenter":<18s} {"first chunk (median)":>21s} {"chunks":>7s} '
+          f'{"max chunk":>10s} {"cpu/token":>10s}')
+    for name, segmenter_class in (('legacy', LegacySegmenter),
+                                  ('sentence segmenter', SentenceSegmenter)):
+        results = [replay(segmenter_class, language, stream) for language, stream in streams]
+        print(f'{name:<18s} '
+              f'{statistics.median(r["first_chunk_at"] for r in results) * 1000:>19.0f}ms '
+              f'{sum(r["chunks"] for r in results):>7d} '
+              f'{max(r["max_chunk"] for r in results):>10d} '
+              f'{statistics.mean(r["cpu_per_token_us"] for r in results):>8.1f}us')
+
+
+if __name__ == '__main__':
+    main()
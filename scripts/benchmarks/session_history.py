@@ -0,0 +1,131 @@
+"""Measure /session_history on a long session: all rows loaded as ORM objects and returned in
+one body, as before, against keyset pages streamed as JSON or NDJSON.
+
+Seeds one session of many turns in DATABASE_URL (a temporary SQLite database by default),
+then for each mode starts a fresh server in a child process, fetches the whole history and
+reports the time to the first byte, the total time, the response size and the server's
+peak memory:
+
+    python scripts/benchmarks/session_history.py --turns 50000
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import socket
+import sys
+import tempfile
+import time
+from time import perf_counter
+
+ROOT = os.path.join(os.path.dirname(__file__), '..', '..')
+sys.path.insert(0, ROOT)
+
+SESSION_ID = 'bench-long-session'
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def seed(turns: int):
+    from realtime_ai_character.database.base import Base
+    from realtime_ai_character.database.connection import SessionLocal, engine
+    from realtime_ai_character.models.interaction import Interaction
+
+    Base.metadata.create_all(engine, tables=[Interaction.__table__])
+    with SessionLocal() as db:
+        db.query(Interaction).filter(Interaction.session_id == SESSION_ID).delete()
+        db.add_all(Interaction(user_id='bench-user', session_id=SESSION_ID,
+                               client_message_unicode=f'Question {turn}?',
+                               server_message_unicode='An answer. ' * 40,
+                               platform='web', action_type='text', llm_config={})
+                   for turn in range(turns))
+        db.commit()
+
+
+def serve(port: int):
+    sys.path.insert(0, ROOT)
+    import uvicorn
+    from fastapi import Depends, FastAPI
+    from sqlalchemy import select
+
+    from realtime_ai_character.database.connection import get_async_db
+    from realtime_ai_character.models.interaction import Interaction
+    from realtime_ai_character.restful_routes import router
+
+    app = FastAPI()
+    app.include_router(router)
+
+    @app.get('/peak_rss')
+    async def peak_rss():
+        return {'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+    # The route as it was, for comparison.
+    @app.get('/session_history_all')
+    async def session_history_all(session_id: str, db=Depends(get_async_db)):
+        interactions = (await db.scalars(
+            select(Interaction).where(Interaction.session_id == session_id))).all()
+        return [interaction.to_dict() for interaction in interactions]
+
+    uvicorn.run(app, host='127.0.0.1', port=port, log_level='warning')
+
+
+def measure(path: str, accept: str) -> dict:
+    import httpx
+
+    port = free_port()
+    server = multiprocessing.get_context('spawn').Process(target=serve, args=(port,),
+                                                          daemon=True)
+    server.start()
+    try:
+        for _ in range(300):
+            try:
+                baseline = httpx.get(f'http://127.0.0.1:{port}/peak_rss').json()['peak_rss_kb']
+                break
+            except httpx.TransportError:
+                time.sleep(0.1)
+        else:
+            raise RuntimeError('The server did not start')
+        size, first_byte = 0, None
+        start = perf_counter()
+        with httpx.stream('GET', f'http://127.0.0.1:{port}{path}',
+                          params={'session_id': SESSION_ID}, headers={'Accept': accept},
+                          timeout=300) as response:
+            response.raise_for_status()
+            for chunk in response.iter_bytes():
+                if first_byte is None:
+                    first_byte = perf_counter() - start
+                size += len(chunk)
+        total = perf_counter() - start
+        peak = httpx.get(f'http://127.0.0.1:{port}/peak_rss').json()['peak_rss_kb']
+    finally:
+        server.terminate()
+        server.join()
+    return {'first_byte_ms': first_byte * 1000, 'total_ms': total * 1000,
+            'size_mb': size / 1e6, 'peak_rss_growth_mb': (peak - baseline) / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--turns', type=int, default=50_000)
+    args = parser.parse_args()
+
+    if not os.getenv('DATABASE_URL'):
+        path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    seed(args.turns)
+
+    print(f'{"mode":>14s} {"first byte":>11s} {"total":>10s} {"size":>9s} {"peak rss +":>11s}')
+    for name, path, accept in (('all at once', '/session_history_all', 'application/json'),
+                               ('streamed json', '/session_history', 'application/json'),
+                               ('ndjson', '/session_history', 'application/x-ndjson')):
+        result = measure(path, accept)
+        print(f'{name:>14s} {result["first_byte_ms"]:>9.0f}ms {result["total_ms"]:>8.0f}ms '
+              f'{result["size_mb"]:>7.1f}MB {result["peak_rss_growth_mb"]:>9.1f}MB')
+
+
+if __name__ == '__main__':
+    main()
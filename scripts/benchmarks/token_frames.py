@@ -0,0 +1,139 @@
+"""Measure outbound websocket frames and server CPU of streamed replies, with and without
+token coalescing.
+
+For each flush interval, starts a server in a child process whose sessions stream a canned
+reply token by token through ConnectionManager.send_token, connects many concurrent
+sessions to it and reports frames per second, server CPU per session and the time to the
+first frame. A flush interval of 0 sends one frame per token, as before coalescing. The
+client side needs the websockets package, installed with uvicorn[standard].
+
+    python scripts/benchmarks/token_frames.py --sessions 200 --flush-intervals-ms 0,10,20,30
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import statistics
+import sys
+import time
+import urllib.request
+from time import perf_counter
+
+ROOT = os.path.join(os.path.dirname(__file__), '..', '..')
+sys.path.insert(0, ROOT)
+
+REPLY = ('Well, I think going to Mars is not just a dream, it is a necessity. We need to become '
+         'a multiplanetary species, otherwise we are just waiting for an extinction event. A '
+         'Starship launch could eventually cost a few million dollars, which is insane compared '
+         'to what NASA paid for the Space Shuttle. ') * 3
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def serve(port: int, flush_interval_ms: float, token_interval: float):
+    # The flush interval is read when utils is imported.
+    os.environ['TOKEN_FLUSH_INTERVAL_MS'] = str(flush_interval_ms)
+    sys.path.insert(0, ROOT)
+    import uvicorn
+    from fastapi import FastAPI, WebSocket
+
+    from realtime_ai_character.utils import get_connection_manager
+
+    app = FastAPI()
+    manager = get_connection_manager()
+    tokens = [word if i == 0 else ' ' + word for i, word in enumerate(REPLY.split())]
+
+    @app.get('/cpu')
+    async def cpu():
+        times = os.times()
+        return {'cpu': times.user + times.system}
+
+    @app.websocket('/stream')
+    async def stream(websocket: WebSocket):
+        await manager.connect(websocket)
+        for token in tokens:
+            await manager.send_token(token, websocket=websocket)
+            await asyncio.sleep(token_interval)
+        await manager.send_message(message='[end]\n', websocket=websocket)
+        await websocket.receive()
+        await manager.disconnect(websocket)
+
+    uvicorn.run(app, host='127.0.0.1', port=port, log_level='warning')
+
+
+def server_cpu(port: int) -> float:
+    with urllib.request.urlopen(f'http://127.0.0.1:{port}/cpu') as response:
+        return json.load(response)['cpu']
+
+
+async def session(port: int) -> tuple:
+    import websockets
+
+    frames, first_frame = 0, None
+    start = perf_counter()
+    async with websockets.connect(f'ws://127.0.0.1:{port}/stream', max_queue=None) as ws:
+        async for message in ws:
+            if first_frame is None:
+                first_frame = perf_counter() - start
+            if message == '[end]\n':
+                break
+            frames += 1
+    return frames, first_frame
+
+
+async def run_sessions(port: int, sessions: int) -> list:
+    return await asyncio.gather(*(session(port) for _ in range(sessions)))
+
+
+def measure(flush_interval_ms: float, sessions: int, token_interval: float) -> dict:
+    port = free_port()
+    server = multiprocessing.get_context('spawn').Process(
+        target=serve, args=(port, flush_interval_ms, token_interval), daemon=True)
+    server.start()
+    try:
+        for _ in range(100):
+            try:
+                cpu_before = server_cpu(port)
+                break
+            except OSError:
+                time.sleep(0.1)
+        else:
+            raise RuntimeError('The server did not start')
+        start = perf_counter()
+        results = asyncio.run(run_sessions(port, sessions))
+        elapsed = perf_counter() - start
+        cpu = server_cpu(port) - cpu_before
+    finally:
+        server.terminate()
+        server.join()
+    frames = sum(frames for frames, _ in results)
+    return {'frames': frames, 'frames_per_second': frames / elapsed,
+            'cpu_per_session_ms': cpu / sessions * 1000,
+            'first_frame_ms': statistics.median(first for _, first in results) * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=200)
+    parser.add_argument('--token-interval-ms', type=float, default=20,
+                        help='Interval between tokens of the stand-in LLM.')
+    parser.add_argument('--flush-intervals-ms', default='0,10,20,30')
+    args = parser.parse_args()
+
+    print(f'{"flush interval":>14s} {"frames":>8s} {"frames/s":>9s} {"cpu/session":>12s} '
+          f'{"first frame":>12s}')
+    for flush_interval_ms in map(float, args.flush_intervals_ms.split(',')):
+        result = measure(flush_interval_ms, args.sessions, args.token_interval_ms / 1000)
+        print(f'{flush_interval_ms:>12.0f}ms {result["frames"]:>8d} '
+              f'{result["frames_per_second"]:>9.0f} {result["cpu_per_session_ms"]:>10.1f}ms '
+              f'{result["first_frame_ms"]:>10.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Count the text to speech characters the speech normalizer saves per reply.
+
+Streams replies token by token through the same stages as AsyncCallbackAudioHandler and
+compares the characters sent to text to speech before (everything after the first '>')
+and after normalization. Replies come from a JSONL file of {"text": ..., "language": ...}
+records, or built-in samples.
+
+    python scripts/benchmarks/tts_normalizer.py --replies replies.jsonl
+
+The expected output for known replies is tested in tests/test_tts_normalizer.py.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from realtime_ai_character.audio.text_to_speech.normalizer import SpeechNormalizer  # noqa: E402
+from realtime_ai_character.audio.text_to_speech.segmenter import SentenceSegmenter  # noqa: E402
+
+SAMPLES = [
+    ('en-US', 'Elon> [laughs] Well, **that** is a great question! SpaceX has launched over 200 '
+     'rockets, e.g. Falcon 9, and a launch costs about $67 million. [pauses] In 2002 nobody '
+     'believed us. Dr. Smith told me we had a 10% chance.'),
+    ('en-US', 'Raiden> [smiles warmly]\n- First, breathe.\n- Second, relax.\n[whispers] '
+     'You are doing fine.'),
+    ('zh-CN', '埃隆> [微笑] 你好！我们在2002年创办了SpaceX。'),
+]
+
+def tokenize(text: str) -> list:
+    return re.findall(r'\s*\w+|\s*[^\w\s]|\s+', text)
+
+
+def speak(language: str, text: str) -> list:
+    normalizer = SpeechNormalizer(language=language)
+    segmenter = SentenceSegmenter(language=language)
+    chunks = []
+    for token in tokenize(text):
+        chunks += segmenter.feed(normalizer.feed(token))
+    chunks += segmenter.feed(normalizer.flush()) + segmenter.flush()
+    return [chunk for chunk in map(normalizer.normalize, chunks) if chunk]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--replies', default='', help='JSONL file of replies.')
+    args = parser.parse_args()
+
+    replies = SAMPLES
+    if args.replies:
+        with open(args.replies) as f:
+            replies = [(record.get('language', 'en-US'), record['text'])
+                       for record in map(json.loads, filter(str.strip, f))]
+    before = after = 0
+    for language, text in replies:
+        # The old handler sent everything after the first '>' to text to speech.
+        before += len(text.partition('>')[2].strip() if '>' in text else '')
+        after += sum(len(chunk) for chunk in speak(language, text))
+    print(f'{len(replies)} replies: {before} characters before, {after} after normalization '
+          f'({(before - after) / before * 100 if before else 0:.1f}% saved)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+import os
+import time
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from realtime_ai_character.character_catalog.catalog_manager import CatalogManager  # noqa: E402
+from realtime_ai_character.character_catalog.user_directory import (  # noqa: E402
+    ANONYMOUS_AUTHOR, LocalUserDirectory)
+from realtime_ai_character.utils import TTLCache  # noqa: E402
+
+
+def catalog_manager(display_names) -> CatalogManager:
+    # Only the author name lookup, without loading characters or the vector database.
+    manager = CatalogManager.__new__(CatalogManager)
+    manager.user_directory = LocalUserDirectory(display_names)
+    manager.author_name_cache = TTLCache()
+    return manager
+
+
+def test_author_names_are_looked_up_in_one_batch():
+    manager = catalog_manager({'u1': 'Ada', 'u2': 'Grace'})
+    author_names = manager.resolve_author_names(['u1', 'u2', 'u1', 'ghost', None, ''])
+    assert author_names == {'u1': 'Ada', 'u2': 'Grace', 'ghost': ANONYMOUS_AUTHOR}
+    assert manager.user_directory.lookups == 1
+
+
+def test_author_names_are_cached():
+    manager = catalog_manager({'u1': 'Ada', 'u2': 'Grace'})
+    manager.resolve_author_names(['u1'])
+    assert manager.resolve_author_names(['u1']) == {'u1': 'Ada'}
+    assert manager.user_directory.lookups == 1
+    # Only the misses are looked up.
+    assert manager.resolve_author_names(['u1', 'u2']) == {'u1': 'Ada', 'u2': 'Grace'}
+    assert manager.user_directory.lookups == 2
+
+
+def test_no_authors_no_lookup():
+    manager = catalog_manager({})
+    assert manager.resolve_author_names([None]) == {}
+    assert manager.user_directory.lookups == 0
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert 'b' not in cache
+    assert (cache.get('a'), cache.get('c'), len(cache)) == (1, 3, 2)
+
+
+def test_ttl_cache_entries_expire():
+    cache = TTLCache(ttl=0.05)
+    cache.set('a', 1)
+    assert cache.get('a') == 1
+    time.sleep(0.1)
+    assert cache.get('a') is None
+    assert cache.get('a', 'default') == 'default'
+    assert len(cache) == 0
@@ -0,0 +1,45 @@
+import queue
+
+import pytest
+
+from realtime_ai_character.character_catalog.change_bus import CatalogChange, SqliteChangeBus
+
+
+@pytest.fixture
+def buses(tmp_path):
+    # Two workers sharing one file.
+    path = str(tmp_path / 'catalog_changes.db')
+    buses = [SqliteChangeBus(path, poll_interval=0.05) for _ in range(2)]
+    yield buses
+    for bus in buses:
+        bus.close(timeout=1)
+
+
+def subscribe(bus) -> queue.Queue:
+    changes = queue.Queue()
+    bus.subscribe(changes.put)
+    return changes
+
+
+def test_changes_reach_the_other_bus(buses):
+    first, second = buses
+    first_changes, second_changes = subscribe(first), subscribe(second)
+    first.publish('upsert', 'elon_musk')
+    second.publish('delete', 'loki')
+    assert second_changes.get(timeout=2) == CatalogChange('upsert', 'elon_musk', first.origin)
+    assert first_changes.get(timeout=2) == CatalogChange('delete', 'loki', second.origin)
+    # A bus doesn't deliver its own changes.
+    with pytest.raises(queue.Empty):
+        first_changes.get(timeout=0.2)
+    with pytest.raises(queue.Empty):
+        second_changes.get(timeout=0.2)
+
+
+def test_changes_before_subscribe_are_not_delivered(buses):
+    first, second = buses
+    first.publish('upsert', 'elon_musk')
+    second_changes = subscribe(second)
+    first.publish('upsert', 'loki')
+    assert second_changes.get(timeout=2).character_id == 'loki'
+    with pytest.raises(queue.Empty):
+        second_changes.get(timeout=0.2)
@@ -0,0 +1,101 @@
+"""The hot paths of the interactions and sessions tables use their indexes.
+
+Seeds a small SQLite database and checks the query plans: each query must search its
+index and, when it is ordered, read the rows in index order rather than sort them.
+scripts/benchmarks/interaction_indexes.py times the same queries on large tables.
+"""
+import datetime
+
+import pytest
+from sqlalchemy import create_engine, insert, select, tuple_
+
+from realtime_ai_character.models.interaction import Interaction
+from realtime_ai_character.models.session_summary import SessionSummary, summarize_sessions
+from realtime_ai_character.utils import ConversationHistory
+
+SESSIONS = 200
+USERS = 20
+TURNS = 5000
+START = datetime.datetime(2023, 1, 1)
+
+SESSION_INDEX = 'ix_interactions_session_id_timestamp'
+SESSIONS_INDEX = 'ix_sessions_user_id_last_timestamp'
+
+
+@pytest.fixture(scope='module')
+def connection(tmp_path_factory):
+    engine = create_engine(f'sqlite:///{tmp_path_factory.mktemp("db") / "test.db"}')
+    for table in (Interaction.__table__, SessionSummary.__table__):
+        table.create(engine)
+    # Turns of different sessions interleave in time, like concurrent conversations.
+    rows = [{'user_id': f'user-{i % SESSIONS % USERS}', 'session_id': f'session-{i % SESSIONS}',
+             'client_message_unicode': f'Question {i}', 'server_message_unicode': f'Answer {i}',
+             'timestamp': START + datetime.timedelta(seconds=i), 'character_id': 'elon_musk',
+             'platform': 'web', 'action_type': 'text'}
+            for i in range(TURNS)]
+    with engine.connect() as connection:
+        connection.execute(insert(Interaction), rows)
+        connection.execute(insert(SessionSummary), summarize_sessions(rows))
+        connection.exec_driver_sql('ANALYZE')
+        connection.commit()
+        yield connection
+    engine.dispose()
+
+
+def query_plan(connection, statement) -> str:
+    sql = str(statement.compile(connection.engine, compile_kwargs={'literal_binds': True}))
+    rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}').all()
+    return '\n'.join(row[-1] for row in rows)
+
+
+# The queries as the routes build them: the index each must use and whether its order must
+# come from the index.
+HOT_QUERIES = {
+    'session_auth': (
+        select(Interaction).where(Interaction.session_id == 'session-42').limit(1),
+        SESSION_INDEX, False),
+    'load_history': (ConversationHistory._load_statement('session-42'), SESSION_INDEX, True),
+    'session_history': (
+        select(*Interaction.__table__.columns)
+        .where(Interaction.session_id == 'session-42')
+        .order_by(Interaction.timestamp, Interaction.id).limit(500),
+        SESSION_INDEX, True),
+    'session_history_next_page': (
+        select(*Interaction.__table__.columns)
+        .where(Interaction.session_id == 'session-42')
+        .where(tuple_(Interaction.timestamp, Interaction.id)
+               > tuple_(START + datetime.timedelta(seconds=1000), 1000))
+        .order_by(Interaction.timestamp, Interaction.id).limit(500),
+        SESSION_INDEX, True),
+    'conversations': (
+        select(SessionSummary.session_id, SessionSummary.last_message_preview,
+               SessionSummary.last_timestamp)
+        .where(SessionSummary.user_id == 'user-7')
+        .order_by(SessionSummary.last_timestamp.desc(), SessionSummary.session_id.desc())
+        .limit(50),
+        SESSIONS_INDEX, True),
+    'conversations_next_page': (
+        select(SessionSummary.session_id, SessionSummary.last_message_preview,
+               SessionSummary.last_timestamp)
+        .where(SessionSummary.user_id == 'user-7')
+        .where(tuple_(SessionSummary.last_timestamp, SessionSummary.session_id)
+               < tuple_(START + datetime.timedelta(seconds=4900), 'session-100'))
+        .order_by(SessionSummary.last_timestamp.desc(), SessionSummary.session_id.desc())
+        .limit(50),
+        SESSIONS_INDEX, True),
+}
+
+
+@pytest.mark.parametrize('name', HOT_QUERIES)
+def test_query_uses_its_index(connection, name):
+    statement, index, ordered = HOT_QUERIES[name]
+    plan = query_plan(connection, statement)
+    assert f'USING INDEX {index}' in plan or f'USING COVERING INDEX {index}' in plan, plan
+    if ordered:
+        assert 'TEMP B-TREE' not in plan, plan
+
+
+def test_queries_return_rows(connection):
+    # A plan is only worth checking on a query that finds something.
+    for name, (statement, _, _) in HOT_QUERIES.items():
+        assert connection.execute(statement).first() is not None, name
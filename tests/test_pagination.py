@@ -0,0 +1,33 @@
+import base64
+import datetime
+import json
+
+import pytest
+
+from realtime_ai_character.database.pagination import decode_cursor, encode_cursor
+
+TIMESTAMP = datetime.datetime(2023, 10, 1, 12, 30, 15, 250000)
+
+
+def cursor(*values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+@pytest.mark.parametrize('key, key_type', [(42, int), ('session-42', str)])
+def test_round_trip(key, key_type):
+    assert decode_cursor(encode_cursor(TIMESTAMP, key), key_type) == (TIMESTAMP, key)
+
+
+@pytest.mark.parametrize('value, key_type', [
+    ('not a cursor', int),
+    (cursor(TIMESTAMP.isoformat()), int),
+    (cursor('yesterday', 42), int),
+    (cursor(TIMESTAMP.isoformat(), '42'), int),
+    (cursor(TIMESTAMP.isoformat(), True), int),
+    (cursor(TIMESTAMP.isoformat(), ['session-42']), str),
+    (cursor(TIMESTAMP.isoformat(), 42), str),
+    (cursor('2023-10-01T12:30:15+02:00', 42), int),
+])
+def test_invalid_cursors(value, key_type):
+    with pytest.raises(ValueError):
+        decode_cursor(value, key_type)
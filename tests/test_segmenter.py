@@ -0,0 +1,86 @@
+import pytest
+
+from realtime_ai_character.audio.text_to_speech.segmenter import SentenceSegmenter
+
+
+def segment(tokens, language='en-US', **kwargs):
+    kwargs = {'min_chars': 20, 'max_chars': 250, 'first_min_chars': 12, **kwargs}
+    segmenter = SentenceSegmenter(language=language, **kwargs)
+    chunks = [chunk for token in tokens for chunk in segmenter.feed(token)]
+    return chunks + segmenter.flush()
+
+
+@pytest.mark.parametrize('language, tokens, expected', [
+    # Decimals split across tokens.
+    ('en-US', ['It', ' costs', ' 3', '.', '5', ' dollars', ' today', '.', ' Bye', '!'],
+     ['It costs 3.5 dollars today.', 'Bye!']),
+    # The first chunk may end at a clause boundary.
+    ('en-US', ['Well', ',', ' I', ' would', ' say', ' so', ',', ' yes', '.', ' It', ' is',
+               ' a', ' long', ' story', ' to', ' tell', '.'],
+     ['Well, I would say so,', 'yes. It is a long story to tell.']),
+    ('en-US', ['Mr', '.', ' Smith', ' met', ' Dr', '.', ' Jones', ' in', ' St', '.', ' Louis',
+               '.'],
+     ['Mr. Smith met Dr. Jones in St. Louis.']),
+    # Closing quotes stay with their sentence, a newline ends one.
+    ('en-US', ['"', 'Hello', '."', ' That', ' is', ' what', ' she', ' told', ' me', '...\n',
+               'And', ' then', ' she', ' left', '.'],
+     ['"Hello." That is what she told me...', 'And then she left.']),
+    ('zh-CN', list('你好，我是埃隆。今天天气很好！'), ['你好，我是埃隆。', '今天天气很好！']),
+    ('ja-JP', list('今日はいい天気ですね。散歩に行きましょう！'),
+     ['今日はいい天気ですね。', '散歩に行きましょう！']),
+])
+def test_known_streams(language, tokens, expected):
+    assert segment(tokens, language) == expected
+
+
+@pytest.mark.parametrize('text, expected', [
+    # Initials are not sentence ends.
+    ('J. R. R. Tolkien wrote it. Then he wrote more books about it.',
+     ['J. R. R. Tolkien wrote it.', 'Then he wrote more books about it.']),
+    ('e.g. apples and pears are fruits, i.e. they grow on trees. Fine.',
+     ['e.g. apples and pears are fruits,', 'i.e. they grow on trees.', 'Fine.']),
+    # A period inside a word is not a boundary.
+    ('Visit example.com for details about it. Thanks a lot!',
+     ['Visit example.com for details about it.', 'Thanks a lot!']),
+    # Short sentences are merged with the next one.
+    ('Hi. Yes. Okay then, let us go right now. Sure thing!',
+     ['Hi. Yes. Okay then,', 'let us go right now.', 'Sure thing!']),
+    ('Really?! I had no idea about that at all. Wow.',
+     ['Really?! I had no idea about that at all.', 'Wow.']),
+    ('Wait... what did you just say to me? Tell me again.',
+     ['Wait... what did you just say to me?', 'Tell me again.']),
+    # A stream that ends on a possible decimal point.
+    ('It costs 3.', ['It costs 3.']),
+    ('', []),
+    ('   ', []),
+])
+def test_chunks_do_not_depend_on_token_boundaries(text, expected):
+    assert segment([text]) == expected
+    assert segment(list(text)) == expected
+
+
+def test_long_text_is_cut_at_a_space():
+    chunks = segment(list('word ' * 20), max_chars=30)
+    assert chunks == ['word word word word word word'] * 3 + ['word word']
+
+
+def test_long_text_is_cut_at_a_clause_boundary():
+    chunks = segment(list('one, two, three, four, five, six, seven, eight'), max_chars=30)
+    assert chunks == ['one, two, three,', 'four, five, six, seven, eight']
+
+
+def test_text_without_spaces_is_cut_at_max_chars():
+    assert segment(list('x' * 70), max_chars=30) == ['x' * 30, 'x' * 30, 'x' * 10]
+
+
+def test_cjk_limits_are_scaled_down():
+    segmenter = SentenceSegmenter(language='zh-CN', min_chars=21, max_chars=300,
+                                  first_min_chars=12)
+    assert (segmenter.min_chars, segmenter.max_chars, segmenter.first_min_chars) == (7, 100, 4)
+
+
+def test_flush_resets_the_buffer():
+    segmenter = SentenceSegmenter(min_chars=20, first_min_chars=12)
+    assert segmenter.feed('An unfinished thought') == []
+    assert segmenter.flush() == ['An unfinished thought']
+    assert segmenter.flush() == []
@@ -0,0 +1,76 @@
+import re
+
+import pytest
+
+from realtime_ai_character.audio.text_to_speech.normalizer import (SpeechNormalizer,
+                                                                   number_to_words,
+                                                                   ordinal_to_words)
+from realtime_ai_character.audio.text_to_speech.segmenter import SentenceSegmenter
+
+
+def speak(text, language='en-US', tokenize=True):
+    """Stream a reply through the stages of AsyncCallbackAudioHandler."""
+    normalizer = SpeechNormalizer(language=language)
+    segmenter = SentenceSegmenter(language=language)
+    tokens = re.findall(r'\s*\w+|\s*[^\w\s]|\s+', text) if tokenize else list(text)
+    chunks = []
+    for token in tokens:
+        chunks += segmenter.feed(normalizer.feed(token))
+    chunks += segmenter.feed(normalizer.flush()) + segmenter.flush()
+    return [chunk for chunk in map(normalizer.normalize, chunks) if chunk]
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('Elon> [blushes] Hi there, my friend!', ['Hi there, my friend!']),
+    ('Elon> It costs $2.5 million, about 15% more.',
+     ['It costs two point five million dollars,', 'about fifteen percent more.']),
+    ('Elon> [pauses]', []),
+    ('No prefix here, Mr. Smith said in 1969.',
+     ['No prefix here,', 'Mister Smith said in nineteen sixty-nine.']),
+    ('Raiden> [smiles warmly]\n- First, breathe.\n- Second, relax.\n[whispers] You are fine.',
+     ['First, breathe.', 'Second, relax. You are fine.']),
+    ('Elon > Hi there, my friend!', ['Hi there, my friend!']),
+    ('  Loki>Mortal, you amuse me.', ['Mortal, you amuse me.']),
+])
+def test_known_replies(text, expected):
+    assert speak(text) == expected
+    assert speak(text, tokenize=False) == expected
+
+
+@pytest.mark.parametrize('text, expected', [
+    # A '>' after several words, or after a number, is part of the reply.
+    ('Sure thing my friend 1 > 0', ['Sure thing my friend one > zero']),
+    ('1 > 0, obviously.', ['one > zero, obviously.']),
+    ('Yes, x > y holds here.', ['Yes, x > y holds here.']),
+    ('Elon', ['Elon']),
+])
+def test_only_a_name_is_a_prefix(text, expected):
+    assert speak(text) == expected
+    assert speak(text, tokenize=False) == expected
+
+
+def test_prefix_is_held_back_until_it_can_tell():
+    normalizer = SpeechNormalizer()
+    assert [normalizer.feed(ch) for ch in 'Elon>'] == [''] * 5
+    assert normalizer.feed(' Hi') == ' Hi'
+
+
+def test_non_english_text_is_not_expanded():
+    assert speak('埃隆> [微笑] 你好！我们在2002年创办了SpaceX。', language='zh-CN') == \
+        ['你好！我们在2002年创办了SpaceX。']
+
+
+@pytest.mark.parametrize('n, words', [
+    (0, 'zero'), (21, 'twenty-one'), (100, 'one hundred'),
+    (2023, 'two thousand twenty-three'), (1000001, 'one million one'),
+])
+def test_number_to_words(n, words):
+    assert number_to_words(n) == words
+
+
+@pytest.mark.parametrize('n, words', [
+    (1, 'first'), (12, 'twelfth'), (20, 'twentieth'), (42, 'forty-second'),
+    (101, 'one hundred first'),
+])
+def test_ordinal_to_words(n, words):
+    assert ordinal_to_words(n) == words